@@ -0,0 +1,156 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import asyncio
+import functools
+import threading
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from container_service_extension.consumer import MessageConsumer
+from container_service_extension.logger import SERVER_LOGGER as LOGGER
+
+# Time to wait for the AMQP connection to close while stopping the consumer
+STOP_TIMEOUT_SECONDS = 30
+
+
+class AsyncMessageConsumer(MessageConsumer):
+    """Consume CSE requests on a single asyncio event loop.
+
+    Unlike MessageConsumer, which needs one thread and one AMQP connection
+    per listener, this consumer multiplexes all listeners as channels of a
+    single AsyncioConnection. The event loop only does AMQP I/O; requests
+    are processed on a shared thread pool, and acknowledgements and replies
+    are scheduled back on the event loop.
+    """
+
+    def __init__(self,
+                 host,
+                 port,
+                 ssl,
+                 vhost,
+                 username,
+                 password,
+                 exchange,
+                 routing_key,
+                 num_channels,
+                 num_processors,
+                 late_ack=False,
+                 late_ack_mutating_requests=False):
+        super().__init__(host, port, ssl, vhost, username, password,
+                         exchange, routing_key,
+                         num_processors=max(num_processors, num_channels),
+                         late_ack=late_ack,
+                         late_ack_mutating_requests=late_ack_mutating_requests)
+        self.num_channels = num_channels
+        # Spread the prefetch window over all channels so that the total
+        # number of unacknowledged messages stays within num_processors.
+        self.prefetch_count = max(self.num_processors // num_channels, 1)
+        self._loop = None
+        self._consumer_channels = {}
+        self._stopped = threading.Event()
+
+    def connect(self):
+        LOGGER.info(f"Connecting to {self.host}:{self.port}")
+        credentials = pika.PlainCredentials(self.username, self.password)
+        parameters = pika.ConnectionParameters(
+            self.host,
+            self.port,
+            self.vhost,
+            credentials,
+            ssl=self.ssl,
+            connection_attempts=3,
+            retry_delay=2,
+            socket_timeout=5)
+        return AsyncioConnection(
+            parameters, self.on_connection_open,
+            on_open_error_callback=self.on_connection_open_error,
+            stop_ioloop_on_close=False, custom_ioloop=self._loop)
+
+    def on_connection_open_error(self, unused_connection, err):
+        # Errors raised in asyncio callbacks don't unwind the event loop, so
+        # unlike MessageConsumer, failed connections are retried here.
+        if self._closing:
+            self._loop.stop()
+        else:
+            LOGGER.warning(f"Connection failed, retrying in 5 seconds: "
+                           f"{err}")
+            self._loop.call_later(5, self.reconnect)
+
+    def on_connection_closed(self, connection, reply_code, reply_text):
+        self._consumer_channels = {}
+        super().on_connection_closed(connection, reply_code, reply_text)
+
+    def reconnect(self):
+        # The event loop keeps running, only the connection is replaced.
+        if not self._closing:
+            self._connection = self.connect()
+
+    def on_bindok(self, unused_frame):
+        # Exchange and queue have been set up on self._channel, all other
+        # channels only consume from the queue.
+        LOGGER.debug("Queue bound")
+        for _ in range(self.num_channels):
+            self._connection.channel(
+                on_open_callback=self.on_consumer_channel_open)
+
+    def on_consumer_channel_open(self, channel):
+        LOGGER.debug(f"Consumer channel {channel.channel_number} opened")
+        channel.add_on_close_callback(self.on_channel_closed)
+        channel.basic_qos(
+            functools.partial(self.on_consumer_channel_qos_ok, channel),
+            prefetch_count=self.prefetch_count)
+
+    def on_consumer_channel_qos_ok(self, channel, unused_frame):
+        LOGGER.debug(f"Issuing consumer related RPC commands on channel "
+                     f"{channel.channel_number}")
+        channel.add_on_cancel_callback(self.on_consumer_cancelled)
+        consumer_tag = channel.basic_consume(self.on_message, self.queue)
+        self._consumer_channels[consumer_tag] = channel
+
+    def stop_consuming(self):
+        if not self._consumer_channels:
+            self.close_connection()
+            return
+        LOGGER.info("Sending Basic.Cancel RPC commands to RabbitMQ")
+        for consumer_tag, channel in list(self._consumer_channels.items()):
+            channel.basic_cancel(
+                functools.partial(self.on_consumer_cancelok, consumer_tag),
+                consumer_tag)
+
+    def close_connection(self):
+        if not self._connection.is_open:
+            # still connecting or waiting to reconnect
+            self._loop.stop()
+            return
+        super().close_connection()
+
+    def on_consumer_cancelok(self, consumer_tag, unused_frame):
+        LOGGER.debug(f"RabbitMQ acknowledged the cancellation of consumer "
+                     f"{consumer_tag}")
+        self._consumer_channels.pop(consumer_tag, None)
+        if not self._consumer_channels:
+            self.close_connection()
+
+    def run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._connection = self.connect()
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+            self._stopped.set()
+
+    def stop(self):
+        LOGGER.info("Stopping")
+        self._closing = True
+        # pika connections are not thread safe, the shutdown sequence has to
+        # be driven from the event loop's thread.
+        self._connection.add_callback_threadsafe(self.stop_consuming)
+        if not self._stopped.wait(STOP_TIMEOUT_SECONDS):
+            LOGGER.warning("Timed out waiting for AMQP connection to close")
+        self._ctpe.shutdown(wait=False)
+        LOGGER.info("Stopped")
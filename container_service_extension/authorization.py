@@ -31,14 +31,13 @@ def secure(required_rights=[]):
                     and required_rights is not None
                     and len(required_rights) > 0):
                 class_instance: abstract_broker.AbstractBroker = args[0]
-                user_rights = class_instance.context.user.rights
-
-                missing_rights = []
-                for right_name in required_rights:
-                    namespaced_name = f'{{{CSE_SERVICE_NAMESPACE}}}' \
-                                      f':{right_name}'
-                    if namespaced_name not in user_rights:
-                        missing_rights.append(namespaced_name)
+                user = class_instance.context.user
+                missing_rights = _get_missing_rights(user.rights,
+                                                     required_rights)
+                # Rights added to the role since they were cached
+                if len(missing_rights) > 0 and user.refresh_rights():
+                    missing_rights = _get_missing_rights(user.rights,
+                                                         required_rights)
 
                 if len(missing_rights) > 0:
                     LOGGER.debug(f"Authorization failed for user "
@@ -51,3 +50,12 @@ def secure(required_rights=[]):
             return func(*args, **kwargs)
         return decorator_wrapper
     return decorator_secure
+
+
+def _get_missing_rights(user_rights, required_rights):
+    missing_rights = []
+    for right_name in required_rights:
+        namespaced_name = f'{{{CSE_SERVICE_NAMESPACE}}}:{right_name}'
+        if namespaced_name not in user_rights:
+            missing_rights.append(namespaced_name)
+    return missing_rights
@@ -3,6 +3,8 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 from container_service_extension.client.response_processor import process_response # noqa: E501
+from container_service_extension.shared_constants import CSE_PAGINATION_DEFAULT_PAGE_SIZE  # noqa: E501
+from container_service_extension.shared_constants import PaginationKey
 from container_service_extension.shared_constants import RequestKey
 from container_service_extension.shared_constants import RequestMethod
 
@@ -23,15 +25,47 @@ class LegacyNativeCluster:
         return process_response(response)
 
     def get_clusters(self, vdc=None, org=None):
+        return list(self.iter_clusters(vdc=vdc, org=org))
+
+    def iter_clusters(self, vdc=None, org=None,
+                      page_size=CSE_PAGINATION_DEFAULT_PAGE_SIZE):
+        """Yield clusters, fetching them from the server one page at a time.
+
+        Servers that do not support pagination return all clusters in the
+        first response.
+        """
+        for clusters in self.iter_cluster_pages(vdc=vdc, org=org,
+                                                page_size=page_size):
+            yield from clusters
+
+    def iter_cluster_pages(self, vdc=None, org=None,
+                           page_size=CSE_PAGINATION_DEFAULT_PAGE_SIZE):
+        """Yield pages of clusters, fetching them from the server as needed.
+
+        Servers that do not support pagination return all clusters in a
+        single page.
+        """
         method = RequestMethod.GET
         uri = f"{self._uri}/clusters"
-        response = self.client._do_request_prim(
-            method,
-            uri,
-            self.client._session,
-            accept_type='application/json',
-            params={RequestKey.ORG_NAME: org, RequestKey.OVDC_NAME: vdc})
-        return process_response(response)
+        page = 1
+        while True:
+            response = self.client._do_request_prim(
+                method,
+                uri,
+                self.client._session,
+                accept_type='application/json',
+                params={RequestKey.ORG_NAME: org,
+                        RequestKey.OVDC_NAME: vdc,
+                        RequestKey.PAGE: page,
+                        RequestKey.PAGE_SIZE: page_size})
+            result = process_response(response)
+            if isinstance(result, list):
+                yield result
+                return
+            yield result[PaginationKey.VALUES]
+            if page >= result[PaginationKey.PAGE_COUNT]:
+                return
+            page += 1
 
     def get_cluster_info(self, name, org=None, vdc=None):
         method = RequestMethod.GET
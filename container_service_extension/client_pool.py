@@ -0,0 +1,221 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import collections
+import threading
+import time
+
+from container_service_extension.logger import SERVER_LOGGER as LOGGER
+
+
+# Idle entries of the pool: logged in client and timestamps in seconds.
+_PooledClient = collections.namedtuple(
+    '_PooledClient', ['client', 'created_at', 'last_checked_at'])
+
+
+class ClientPool(object):
+    """Thread safe pool of long lived, logged in vCD clients.
+
+    Clients are created on demand with @client_factory. Once released, up to
+    @size clients are kept logged in for reuse, extra clients are logged out.
+    A borrowed client is used exclusively by the borrower until it is
+    released, so pyvcloud clients never get shared across threads.
+
+    Idle clients are kept alive by keepalive(), which touches their vCD
+    session before it times out and replaces them once they are older than
+    @max_age, so that sessions are refreshed before they expire.
+    """
+
+    def __init__(self, client_factory, size, max_age, health_check_interval,
+                 name='vCD client'):
+        """Initialize ClientPool object.
+
+        :param function client_factory: function that returns a new logged
+            in pyvcloud client.
+        :param int size: max number of idle clients to keep. If 0, clients
+            are logged out as soon as they are released.
+        :param int max_age: time in seconds after which a client is logged
+            out and replaced by a new one.
+        :param int health_check_interval: time in seconds after which an
+            idle client's session is verified before it is handed out.
+        :param str name: name of the pool, used for logging.
+        """
+        self._client_factory = client_factory
+        self.size = size
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._idle = collections.deque()
+        # id of borrowed client -> creation time of the client
+        self._borrowed = {}
+        self._closed = threading.Event()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def borrow(self):
+        """Get a logged in client from the pool.
+
+        :return: logged in client, which should be given back to the pool by
+            calling release().
+
+        :rtype: pyvcloud.vcd.client.Client
+        """
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                break
+            if self._is_healthy(pooled):
+                with self._lock:
+                    self._borrowed[id(pooled.client)] = pooled.created_at
+                    self.reused += 1
+                return pooled.client
+            self._discard(pooled.client)
+
+        client = self._client_factory()
+        with self._lock:
+            self._borrowed[id(client)] = time.time()
+            self.created += 1
+        return client
+
+    def release(self, client):
+        """Give a client back to the pool.
+
+        :param pyvcloud.vcd.client.Client client: client obtained from
+            borrow().
+        """
+        if client is None:
+            return
+        now = time.time()
+        with self._lock:
+            created_at = self._borrowed.pop(id(client), None)
+            keep = created_at is not None and \
+                not self._closed.is_set() and \
+                len(self._idle) < self.size and \
+                now - created_at < self.max_age
+            if keep:
+                # The client was in use till now, hence its session is alive.
+                self._idle.append(_PooledClient(client, created_at, now))
+        if not keep:
+            self._logout(client)
+
+    def discard(self, client):
+        """Log out a borrowed client instead of giving it back to the pool.
+
+        Should be called when the session of the client is found to be no
+        longer valid.
+
+        :param client: client obtained from borrow().
+        """
+        if client is None:
+            return
+        with self._lock:
+            self._borrowed.pop(id(client), None)
+        self._discard(client)
+
+    def keepalive(self):
+        """Refresh idle clients that are due for a health check.
+
+        Clients older than max_age are replaced, others have their session
+        touched, so vCD does not expire them for being idle.
+        """
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+
+        now = time.time()
+        refreshed = []
+        for pooled in idle:
+            if now - pooled.last_checked_at < self.health_check_interval:
+                refreshed.append(pooled)
+                continue
+            if self._is_healthy(pooled):
+                refreshed.append(pooled._replace(last_checked_at=time.time()))
+                continue
+            self._discard(pooled.client)
+            try:
+                refreshed.append(_PooledClient(
+                    self._client_factory(), time.time(), time.time()))
+                with self._lock:
+                    self.created += 1
+            except Exception as err:
+                LOGGER.warning(f"Failed to log in new {self.name}: {err}")
+
+        extra = []
+        with self._lock:
+            for pooled in refreshed:
+                if len(self._idle) < self.size and not self._closed.is_set():
+                    self._idle.append(pooled)
+                else:
+                    extra.append(pooled)
+        for pooled in extra:
+            self._logout(pooled.client)
+
+    def run_keepalive(self):
+        """Call keepalive() periodically till the pool is closed.
+
+        Blocks the calling thread, should be run in a daemon thread.
+        """
+        interval = max(self.health_check_interval // 2, 1)
+        while not self._closed.wait(interval):
+            try:
+                self.keepalive()
+            except Exception as err:
+                LOGGER.warning(f"{self.name} pool keepalive failed: {err}")
+
+    def close(self):
+        """Log out idle clients and stop keeping clients alive.
+
+        Clients that are borrowed at this point are logged out on release.
+        """
+        self._closed.set()
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for pooled in idle:
+            self._logout(pooled.client)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'borrowed': len(self._borrowed),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded
+            }
+
+    def _is_healthy(self, pooled):
+        now = time.time()
+        if now - pooled.created_at >= self.max_age:
+            return False
+        if now - pooled.last_checked_at < self.health_check_interval:
+            return True
+        try:
+            self._check_session(pooled.client)
+            return True
+        except Exception as err:
+            LOGGER.debug(f"Discarding {self.name} with stale session: {err}")
+            return False
+
+    def _check_session(self, client):
+        """Raise an exception if the session of a client is not alive.
+
+        Pools of other kinds of clients override this and _logout().
+        """
+        # A cheap GET on the session also resets vCD's idle timer.
+        client.get_resource(f"{client.get_api_uri()}/session")
+
+    def _discard(self, client):
+        with self._lock:
+            self.discarded += 1
+        self._logout(client)
+
+    def _logout(self, client):
+        try:
+            client.logout()
+        except Exception:
+            pass
@@ -4,6 +4,7 @@
 
 from copy import deepcopy
 import json
+import logging
 
 import requests
 
@@ -107,13 +108,15 @@ class CloudApiClient(object):
                 verify=self._verify_ssl)
         self._last_response = response
 
-        self.LOGGER_WIRE.debug("Request headers :"
-                               f" {response.request.headers}")
-        self.LOGGER_WIRE.debug(f"Request body : {response.request.body}")
+        if self.LOGGER_WIRE.isEnabledFor(logging.DEBUG):
+            self.LOGGER_WIRE.debug("Request headers :"
+                                   f" {response.request.headers}")
+            self.LOGGER_WIRE.debug(f"Request body : {response.request.body}")
 
-        self.LOGGER_WIRE.debug(f"Response status code: {response.status_code}")
-        self.LOGGER_WIRE.debug(f"Response headers : {response.headers}")
-        self.LOGGER_WIRE.debug(f"Response body : {response.text}")
+            self.LOGGER_WIRE.debug("Response status code: "
+                                   f"{response.status_code}")
+            self.LOGGER_WIRE.debug(f"Response headers : {response.headers}")
+            self.LOGGER_WIRE.debug(f"Response body : {response.text}")
 
         response.raise_for_status()
 
@@ -0,0 +1,228 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import collections
+import copy
+import threading
+import time
+
+from container_service_extension.logger import SERVER_LOGGER as LOGGER
+from container_service_extension.server_constants import SYSTEM_ORG_NAME
+from container_service_extension.utils import run_async
+
+
+# Cluster data dictionary, as returned by vcdbroker.get_all_clusters(),
+# along with the name of the org of the cluster.
+InventoryCluster = collections.namedtuple(
+    'InventoryCluster', ['org_name', 'cluster'])
+
+_CLUSTER_INVENTORY = None
+_CLUSTER_INVENTORY_LOCK = threading.Lock()
+
+
+class ClusterInventory(object):
+    """Thread safe in-process inventory of native clusters.
+
+    The inventory is rebuilt by periodic sweeps of all clusters, which are
+    run by run_sweeps(). Clusters changed by CSE itself are updated right
+    away with update_cluster(), and such updates are not overwritten by a
+    sweep that started before them.
+
+    Lookups are answered only while the last sweep is at most
+    @max_staleness seconds old, callers are expected to query vCD
+    otherwise.
+    """
+
+    def __init__(self, fetch_clusters, refresh_interval, max_staleness):
+        """Initialize ClusterInventory object.
+
+        :param function fetch_clusters: function that takes a sysadmin
+            client and a cluster id, and returns a list of InventoryCluster.
+            All clusters are returned if the cluster id is None.
+        :param int refresh_interval: time in seconds between sweeps.
+        :param int max_staleness: time in seconds after the last sweep,
+            after which lookups are no longer answered.
+        """
+        self._fetch_clusters = fetch_clusters
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        # vApp id -> InventoryCluster
+        self._clusters = {}
+        # cluster id -> time of the last update by update_cluster()
+        self._updated_at = {}
+        self._swept_at = None
+        self._stopped = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.sweeps = 0
+        self.sweep_failures = 0
+        self.last_sweep_duration = None
+
+    def find_clusters(self, cluster_name=None, cluster_id=None,
+                      org_name=None, ovdc_name=None):
+        """Find clusters in the inventory.
+
+        :param str cluster_name: restrict clusters to this name.
+        :param str cluster_id: restrict clusters to this cluster id.
+        :param str org_name: restrict clusters to this org, all orgs if None
+            or the system org.
+        :param str ovdc_name: restrict clusters to this org vdc name.
+
+        :return: copies of the matching clusters, or None if the inventory
+            is older than max_staleness.
+
+        :rtype: list
+        """
+        if org_name is not None and \
+                org_name.lower() == SYSTEM_ORG_NAME.lower():
+            org_name = None
+        with self._lock:
+            if self._swept_at is None or \
+                    time.monotonic() - self._swept_at > self.max_staleness:
+                return None
+            entries = list(self._clusters.values())
+
+        matches = []
+        for entry in entries:
+            cluster = entry.cluster
+            if cluster_name is not None and cluster['name'] != cluster_name:
+                continue
+            if cluster_id is not None and cluster['cluster_id'] != cluster_id:
+                continue
+            if ovdc_name is not None and cluster['vdc_name'] != ovdc_name:
+                continue
+            if org_name is not None and (entry.org_name or '').lower() != org_name.lower(): # noqa: E501
+                continue
+            matches.append(InventoryCluster(entry.org_name,
+                                            copy.deepcopy(cluster)))
+        return matches
+
+    def record_lookup(self, hit):
+        """Count a lookup, as answered by the inventory or by vCD."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def update_cluster(self, sysadmin_client, cluster_id):
+        """Fetch a cluster changed by CSE and update it in the inventory.
+
+        The cluster is removed from the inventory if it no longer exists.
+
+        :param pyvcloud.vcd.client.Client sysadmin_client:
+        :param str cluster_id: id of the cluster that was changed.
+        """
+        entries = self._fetch_clusters(sysadmin_client, cluster_id)
+        with self._lock:
+            for vapp_id, entry in list(self._clusters.items()):
+                if entry.cluster['cluster_id'] == cluster_id:
+                    del self._clusters[vapp_id]
+            for entry in entries:
+                self._clusters[entry.cluster['vapp_id']] = entry
+            self._updated_at[cluster_id] = time.monotonic()
+
+    def sweep(self, sysadmin_client):
+        """Rebuild the inventory from all clusters in vCD.
+
+        :param pyvcloud.vcd.client.Client sysadmin_client:
+        """
+        started_at = time.monotonic()
+        entries = self._fetch_clusters(sysadmin_client, None)
+        with self._lock:
+            # Keep clusters updated by CSE while the sweep was running.
+            recently_updated = {
+                cluster_id for cluster_id, updated_at
+                in self._updated_at.items() if updated_at >= started_at}
+            clusters = {
+                vapp_id: entry for vapp_id, entry in self._clusters.items()
+                if entry.cluster['cluster_id'] in recently_updated}
+            for entry in entries:
+                if entry.cluster['cluster_id'] not in recently_updated:
+                    clusters[entry.cluster['vapp_id']] = entry
+            self._clusters = clusters
+            self._updated_at = {
+                cluster_id: self._updated_at[cluster_id]
+                for cluster_id in recently_updated}
+            self._swept_at = started_at
+            self.sweeps += 1
+            self.last_sweep_duration = time.monotonic() - started_at
+
+    def run_sweeps(self, client_factory):
+        """Call sweep() every refresh_interval seconds till stopped.
+
+        Blocks the calling thread, should be run in a daemon thread.
+
+        :param function client_factory: function that returns a context
+            manager yielding a logged in sysadmin client.
+        """
+        while not self._stopped.is_set():
+            try:
+                with client_factory() as sysadmin_client:
+                    self.sweep(sysadmin_client)
+            except Exception as err:
+                with self._lock:
+                    self.sweep_failures += 1
+                LOGGER.warning(f"Cluster inventory sweep failed: {err}")
+            self._stopped.wait(self.refresh_interval)
+
+    def stop(self):
+        self._stopped.set()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'size': len(self._clusters),
+                'age': time.monotonic() - self._swept_at
+                if self._swept_at is not None else None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'sweeps': self.sweeps,
+                'sweep_failures': self.sweep_failures,
+                'last_sweep_duration': self.last_sweep_duration
+            }
+
+
+def start_cluster_inventory(fetch_clusters, client_factory, refresh_interval,
+                            max_staleness):
+    """Create the server wide cluster inventory and start sweeping.
+
+    :param function fetch_clusters: see ClusterInventory.
+    :param function client_factory: see ClusterInventory.run_sweeps().
+    :param int refresh_interval: time in seconds between sweeps.
+    :param int max_staleness: time in seconds after the last sweep, after
+        which the inventory is not used.
+
+    :return: the cluster inventory.
+
+    :rtype: ClusterInventory
+    """
+    global _CLUSTER_INVENTORY
+    with _CLUSTER_INVENTORY_LOCK:
+        if _CLUSTER_INVENTORY is None:
+            inventory = ClusterInventory(fetch_clusters, refresh_interval,
+                                         max_staleness)
+            run_async(inventory.run_sweeps)(client_factory)
+            _CLUSTER_INVENTORY = inventory
+        return _CLUSTER_INVENTORY
+
+
+def get_cluster_inventory():
+    """Get the server wide cluster inventory.
+
+    :return: the cluster inventory, or None if it is disabled.
+
+    :rtype: ClusterInventory
+    """
+    return _CLUSTER_INVENTORY
+
+
+def stop_cluster_inventory():
+    """Stop sweeping and drop the server wide cluster inventory."""
+    global _CLUSTER_INVENTORY
+    with _CLUSTER_INVENTORY_LOCK:
+        if _CLUSTER_INVENTORY is not None:
+            _CLUSTER_INVENTORY.stop()
+            _CLUSTER_INVENTORY = None
@@ -741,11 +741,14 @@ class ComputePolicyManager:
                     org_href=org_href,
                 )
 
-                task_monitor = self._sysadmin_client.get_task_monitor()
+                # Started on all VMs before waiting, so that they run
+                # concurrently in vCD.
+                vm_tasks = []
                 for vm_resource in target_vms:
                     vm = VM(self._sysadmin_client,
                             href=vm_resource.get('href'))
-                    _task = vm.update_compute_policy(system_default_href)
+                    vm_tasks.append(
+                        vm.update_compute_policy(system_default_href))
 
                     task.update(
                         status=vcd_client.TaskStatus.RUNNING.value,
@@ -764,7 +767,7 @@ class ComputePolicyManager:
                         task_href=task_href,
                         org_href=org_href,
                     )
-                    task_monitor.wait_for_success(_task)
+                vcd_utils.wait_for_tasks(self._sysadmin_client, vm_tasks)
 
             task.update(
                 status=vcd_client.TaskStatus.RUNNING.value,
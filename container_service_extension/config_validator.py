@@ -33,6 +33,7 @@ from container_service_extension.sample_generator import \
     SAMPLE_PKS_NSXT_SERVERS_SECTION, SAMPLE_PKS_ORGS_SECTION, \
     SAMPLE_PKS_PVDCS_SECTION, SAMPLE_PKS_SERVERS_SECTION, \
     SAMPLE_SERVICE_CONFIG, SAMPLE_VCD_CONFIG, SAMPLE_VCS_CONFIG # noqa: H301
+from container_service_extension.server_constants import ConsumerEngine
 from container_service_extension.server_constants import \
     SUPPORTED_VCD_API_VERSIONS
 from container_service_extension.server_constants import SYSTEM_ORG_NAME
@@ -43,6 +44,7 @@ from container_service_extension.uaaclient.uaaclient import UaaClient
 from container_service_extension.utils import check_file_permissions
 from container_service_extension.utils import check_keys_and_value_types
 from container_service_extension.utils import get_duplicate_items_in_list
+from container_service_extension.utils import get_max_unavailable_count
 from container_service_extension.utils import NullPrinter
 from container_service_extension.utils import str_to_bool
 
@@ -122,11 +124,29 @@ def get_validated_config(config_file_name,
                                  log_wire=log_wire)
     _validate_broker_config(config['broker'], msg_update_callback,
                             logger_debug)
+    # upgrade_max_unavailable is either an int or a str, its value is
+    # checked by _validate_service_config() instead.
+    service_ref_dict = {
+        k: v for k, v in SAMPLE_SERVICE_CONFIG['service'].items()
+        if k != 'upgrade_max_unavailable'
+    }
     check_keys_and_value_types(config['service'],
-                               SAMPLE_SERVICE_CONFIG['service'],
+                               service_ref_dict,
                                location="config file 'service' section",
-                               excluded_keys=['log_wire'],
+                               excluded_keys=['log_wire', 'processors',
+                                              'late_ack',
+                                              'late_ack_mutating_requests',
+                                              'engine',
+                                              'sysadmin_client_pool_size',
+                                              'rights_cache_ttl',
+                                              'debug_logging',
+                                              'async_logging',
+                                              'cluster_inventory_refresh_interval', # noqa: E501
+                                              'cluster_inventory_max_staleness', # noqa: E501
+                                              'kubeconfig_cache_ttl',
+                                              'max_guest_ops_per_vcenter'],
                                msg_update_callback=msg_update_callback)
+    _validate_service_config(config['service'], msg_update_callback)
     check_keys_and_value_types(config['service']['telemetry'],
                                SAMPLE_SERVICE_CONFIG['service']['telemetry'],
                                location="config file 'service->telemetry' "
@@ -329,6 +349,71 @@ def _validate_broker_config(broker_dict,
         raise Exception("Remote template cookbook is invalid.")
 
 
+def _validate_service_config(service_dict, msg_update_callback=NullPrinter()):
+    """Validate values of optional keys in 'service' section of config.
+
+    :param dict service_dict: 'service' section of config file as a dict.
+    :param utils.ConsoleMessagePrinter msg_update_callback: Callback object.
+
+    :raises ValueError: if the value of an optional property is invalid.
+    """
+    valid_engines = [engine.value for engine in ConsumerEngine]
+    engine = service_dict.get('engine', ConsumerEngine.THREADS)
+    if engine not in valid_engines:
+        msg = f"Consumer engine '{engine}' is not supported. Valid values " \
+              f"are {valid_engines}"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+    if service_dict.get('processors', 0) < 0:
+        msg = "Number of processors can't be negative"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+    if service_dict.get('sysadmin_client_pool_size', 0) < 0:
+        msg = "Size of sysadmin client pool can't be negative"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+    if service_dict.get('rights_cache_ttl', 0) < 0:
+        msg = "Rights cache ttl can't be negative"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+    if service_dict.get('kubeconfig_cache_ttl', 0) < 0:
+        msg = "Kubeconfig cache ttl can't be negative"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+    if service_dict.get('max_guest_ops_per_vcenter', 1) < 1:
+        msg = "Max guest operations per vCenter must be at least 1"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+    try:
+        get_max_unavailable_count(
+            service_dict.get('upgrade_max_unavailable', 1), num_nodes=1)
+    except ValueError:
+        msg = "Upgrade max unavailable must be a number of nodes (at " \
+              "least 1) or a percentage of nodes (from 1% to 100%)"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+    refresh_interval = service_dict.get('cluster_inventory_refresh_interval', 0) # noqa: E501
+    if refresh_interval < 0:
+        msg = "Cluster inventory refresh interval can't be negative"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+    max_staleness = service_dict.get('cluster_inventory_max_staleness',
+                                     2 * refresh_interval)
+    if refresh_interval > 0 and max_staleness < refresh_interval:
+        msg = "Cluster inventory max staleness can't be less than its " \
+              "refresh interval"
+        msg_update_callback.error(msg)
+        raise ValueError(msg)
+
+
 def _validate_pks_config_structure(pks_config,
                                    msg_update_callback=NullPrinter()):
     sample_config = {
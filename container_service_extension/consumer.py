@@ -3,11 +3,16 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 import base64
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import json
+import logging
 import sys
 import threading
 import traceback
 
+from cachetools import TTLCache
 import pika
 import requests
 
@@ -18,6 +23,53 @@ import container_service_extension.request_processor as request_processor
 from container_service_extension.server_constants import EXCHANGE_TYPE
 from container_service_extension.shared_constants import RESPONSE_MESSAGE_KEY
 
+# Replies are retained long enough to cover redelivery of a message whose
+# channel was closed before it could be acknowledged. The cache lives in
+# memory, so only redeliveries to the same server process are detected.
+REPLY_CACHE_MAX_SIZE = 1024
+REPLY_CACHE_TTL_SECONDS = 3600
+
+
+class ReplyCache(object):
+    """Thread safe, bounded cache of request replies keyed by vCD request id.
+
+    Each entry is a Future that resolves to the reply message, so that a
+    redelivered request can be answered even if the original request is
+    still being processed.
+    """
+
+    def __init__(self, maxsize=REPLY_CACHE_MAX_SIZE,
+                 ttl=REPLY_CACHE_TTL_SECONDS):
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def reserve(self, request_id):
+        """Get the reply future for a request, creating it if needed.
+
+        :param str request_id: id of the vCD request.
+
+        :return: reply future and a flag telling if the caller created the
+            future, and hence is responsible for resolving it.
+
+        :rtype: tuple
+        """
+        with self._lock:
+            future = self._cache.get(request_id)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._cache[request_id] = future
+            return future, True
+
+    def discard(self, request_id):
+        with self._lock:
+            self._cache.pop(request_id, None)
+
+
+# Shared by all consumers, since a redelivered message can be picked up by
+# any listener of this server.
+REPLY_CACHE = ReplyCache()
+
 
 class MessageConsumer(object):
     def __init__(self,
@@ -28,7 +80,10 @@ class MessageConsumer(object):
                  username,
                  password,
                  exchange,
-                 routing_key):
+                 routing_key,
+                 num_processors=0,
+                 late_ack=False,
+                 late_ack_mutating_requests=False):
         self._connection = None
         self._channel = None
         self._closing = False
@@ -43,6 +98,26 @@ class MessageConsumer(object):
         self.routing_key = routing_key
         self.queue = routing_key
         self.fsencoding = sys.getfilesystemencoding()
+        # If num_processors is 0, messages are processed inline on the ioloop
+        # thread. Otherwise they are handed off to a bounded worker pool, and
+        # the broker is asked to not deliver more than num_processors
+        # unacknowledged messages at a time (backpressure).
+        self.num_processors = num_processors
+        self._ctpe = None
+        if self.num_processors > 0:
+            self._ctpe = ThreadPoolExecutor(
+                max_workers=self.num_processors,
+                thread_name_prefix='MessageProcessor')
+        # If late_ack is True, GET request messages are acknowledged only
+        # after the reply has been published, so that in-flight requests are
+        # redelivered if the server goes down. Requests that modify anything
+        # are acknowledged on receipt, unless late_ack_mutating_requests is
+        # also True. Redelivered requests that modify anything are then
+        # answered from REPLY_CACHE instead of being processed again, but
+        # only if they were already received by this server process: they
+        # are processed again after a restart.
+        self.late_ack = late_ack
+        self.late_ack_mutating_requests = late_ack_mutating_requests
 
     def connect(self):
         LOGGER.info(f"Connecting to {self.host}:{self.port}")
@@ -129,6 +204,19 @@ class MessageConsumer(object):
 
     def on_bindok(self, unused_frame):
         LOGGER.debug("Queue bound")
+        if self._ctpe is None and not self.late_ack:
+            self.start_consuming()
+        else:
+            self.set_qos()
+
+    def set_qos(self):
+        prefetch_count = max(self.num_processors, 1)
+        LOGGER.debug(f"Setting prefetch count to {prefetch_count}")
+        self._channel.basic_qos(self.on_basic_qos_ok,
+                                prefetch_count=prefetch_count)
+
+    def on_basic_qos_ok(self, unused_frame):
+        LOGGER.debug("QOS set")
         self.start_consuming()
 
     def start_consuming(self):
@@ -147,14 +235,135 @@ class MessageConsumer(object):
         if self._channel:
             self._channel.close()
 
-    def on_message(self, unused_channel, basic_deliver, properties, body):
-        self.acknowledge_message(basic_deliver.delivery_tag)
+    def on_message(self, channel, basic_deliver, properties, body):
+        acknowledge_late = self._is_acknowledged_late(body)
+        if self._ctpe is None:
+            if not acknowledge_late:
+                self.acknowledge_message(basic_deliver.delivery_tag)
+            self.handle_message(self._connection, channel, basic_deliver,
+                                properties, body, acknowledge_late)
+            return
+
+        # The message stays unacknowledged until a worker picks it up, so
+        # the broker stops delivering once prefetch count is reached.
+        self._ctpe.submit(self._process_message_in_worker, channel,
+                          basic_deliver, properties, body, acknowledge_late)
+
+    def _process_message_in_worker(self, channel, basic_deliver, properties,
+                                   body, acknowledge_late):
+        # pika connections are not thread safe; every channel operation must
+        # be scheduled back on the ioloop thread.
+        connection = self._connection
+        if not acknowledge_late:
+            connection.add_callback_threadsafe(functools.partial(
+                self._acknowledge_message_if_channel_open, channel,
+                basic_deliver.delivery_tag))
+        self.handle_message(connection, channel, basic_deliver, properties,
+                            body, acknowledge_late)
+
+    def handle_message(self, connection, channel, basic_deliver, properties,
+                       body, acknowledge_late):
+        try:
+            reply_future = self.get_reply(basic_deliver, properties, body)
+        except Exception as err:
+            reply_future = Future()
+            reply_future.set_exception(err)
+        reply_future.add_done_callback(functools.partial(
+            self._on_reply_ready, connection, channel, basic_deliver,
+            properties, acknowledge_late))
+
+    def _on_reply_ready(self, connection, channel, basic_deliver, properties,
+                        acknowledge_late, reply_future):
+        if reply_future.exception() is not None:
+            LOGGER.error(f"Failed to process message "
+                         f"{basic_deliver.delivery_tag}: "
+                         f"{reply_future.exception()}")
+        connection.add_callback_threadsafe(functools.partial(
+            self._send_reply_and_acknowledge, channel, basic_deliver,
+            properties, acknowledge_late, reply_future))
+
+    def _send_reply_and_acknowledge(self, channel, basic_deliver, properties,
+                                    acknowledge_late, reply_future):
+        if reply_future.exception() is None:
+            reply_msg = reply_future.result()
+            if reply_msg is not None:
+                self.send_reply(channel, properties, reply_msg)
+        if acknowledge_late:
+            self._acknowledge_message_if_channel_open(
+                channel, basic_deliver.delivery_tag)
+
+    def get_reply(self, basic_deliver, properties, body):
+        """Get the reply for a message, processing the request if needed.
+
+        If requests that aren't GETs are acknowledged late, their reply is
+        looked up in REPLY_CACHE first, so that a request redelivered to
+        this server process doesn't modify anything a second time. GET
+        requests are simply processed again.
+
+        :return: future that resolves to the reply message.
+
+        :rtype: concurrent.futures.Future
+        """
+        request_id = None
+        if self.late_ack and self.late_ack_mutating_requests:
+            request_id = self._get_cacheable_request_id(body)
+
+        if request_id is None:
+            reply_future = Future()
+            reply_future.set_result(
+                self.process_message(basic_deliver, properties, body))
+            return reply_future
+
+        reply_future, is_new_request = REPLY_CACHE.reserve(request_id)
+        if not is_new_request:
+            LOGGER.info(f"Message {basic_deliver.delivery_tag} is a "
+                        f"duplicate of request {request_id} "
+                        f"(redelivered={basic_deliver.redelivered}), "
+                        f"replying from cache")
+            return reply_future
+        try:
+            reply_future.set_result(
+                self.process_message(basic_deliver, properties, body))
+        except Exception as err:
+            # let a redelivery of this request be processed again
+            REPLY_CACHE.discard(request_id)
+            reply_future.set_exception(err)
+        return reply_future
+
+    def _is_acknowledged_late(self, body):
+        """Tell if a message is acknowledged only after it is replied to."""
+        if not self.late_ack:
+            return False
+        return self.late_ack_mutating_requests \
+            or self._get_cacheable_request_id(body) is None
+
+    def _get_cacheable_request_id(self, body):
+        """Get the id of a request whose reply is cached, i.e. not a GET."""
+        try:
+            request = json.loads(body.decode(self.fsencoding))[0]
+            if request['method'].upper() == 'GET':
+                return None
+            return request['id']
+        except Exception:
+            return None
+
+    def process_message(self, basic_deliver, properties, body):
+        """Process a request message and build the reply for it.
+
+        :return: reply message to be published, or None if the request
+            doesn't expect a reply.
+
+        :rtype: dict
+        """
+        body_json = {}
         try:
             body_json = json.loads(body.decode(self.fsencoding))[0]
-            LOGGER.debug(f"Received message # {basic_deliver.delivery_tag} "
-                         f"from {properties.app_id} "
-                         f"({threading.currentThread().ident}): "
-                         f"{json.dumps(body_json)}, props: {properties}")
+            if LOGGER.isEnabledFor(logging.DEBUG):
+                LOGGER.debug(f"Received message # "
+                             f"{basic_deliver.delivery_tag} "
+                             f"from {properties.app_id} "
+                             f"({threading.currentThread().ident}): "
+                             f"{json.dumps(body_json)}, props: {properties}")
 
             response_format = None
             accept_header = body_json['headers']['Accept'].lower()
@@ -185,31 +394,50 @@ class MessageConsumer(object):
             tb = traceback.format_exc()
             LOGGER.error(tb)
 
-        if properties.reply_to is not None:
-            reply_msg = {
-                'id': body_json['id'],
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Content-Length': len(reply_body)
-                },
-                'statusCode': status_code,
-                'body': base64.b64encode(reply_body.encode()).decode(self.fsencoding), # noqa: E501
-                'request': False
-            }
+        if properties.reply_to is None:
+            return None
+
+        reply_msg = {
+            'id': body_json.get('id'),
+            'headers': {
+                'Content-Type': 'application/json',
+                'Content-Length': len(reply_body)
+            },
+            'statusCode': status_code,
+            'body': base64.b64encode(reply_body.encode()).decode(self.fsencoding), # noqa: E501
+            'request': False
+        }
+        if LOGGER.isEnabledFor(logging.DEBUG):
             LOGGER.debug(f"reply: {reply_body}")
-
-            reply_properties = pika.BasicProperties(
-                correlation_id=properties.correlation_id)
-            self._channel.basic_publish(
-                exchange=properties.headers['replyToExchange'],
-                routing_key=properties.reply_to,
-                body=json.dumps(reply_msg),
-                properties=reply_properties)
+        return reply_msg
+
+    def send_reply(self, channel, properties, reply_msg):
+        if not channel.is_open:
+            LOGGER.warning(f"Channel closed, unable to send reply for "
+                           f"request {reply_msg['id']}")
+            return
+        reply_properties = pika.BasicProperties(
+            correlation_id=properties.correlation_id)
+        channel.basic_publish(
+            exchange=properties.headers['replyToExchange'],
+            routing_key=properties.reply_to,
+            body=json.dumps(reply_msg),
+            properties=reply_properties)
 
     def acknowledge_message(self, delivery_tag):
         LOGGER.debug(f"Acknowledging message {delivery_tag}")
         self._channel.basic_ack(delivery_tag)
 
+    def _acknowledge_message_if_channel_open(self, channel, delivery_tag):
+        # delivery tags are scoped to the channel that received the message,
+        # if that channel is gone the broker will redeliver the message.
+        if not channel.is_open:
+            LOGGER.warning(f"Channel closed, unable to acknowledge message "
+                           f"{delivery_tag}")
+            return
+        LOGGER.debug(f"Acknowledging message {delivery_tag}")
+        channel.basic_ack(delivery_tag)
+
     def stop_consuming(self):
         if self._channel:
             LOGGER.info("Sending a Basic.Cancel RPC command to RabbitMQ")
@@ -231,6 +459,8 @@ class MessageConsumer(object):
         LOGGER.info("Stopping")
         self._closing = True
         self.stop_consuming()
+        if self._ctpe is not None:
+            self._ctpe.shutdown(wait=False)
         self._connection.ioloop.start()
         LOGGER.info("Stopped")
 
@@ -2,10 +2,12 @@
 # Copyright (c) 2020 VMware, Inc. All Rights Reserved.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import concurrent.futures
 import copy
 import random
 import re
 import string
+import threading
 import time
 from typing import List
 
@@ -24,12 +26,23 @@ import container_service_extension.def_.entity_service as def_entity_svc
 import container_service_extension.def_.models as def_models
 import container_service_extension.def_.utils as def_utils
 import container_service_extension.exceptions as e
+from container_service_extension.guest_readiness import \
+    wait_until_guest_ready
 import container_service_extension.local_template_manager as ltm
 from container_service_extension.logger import SERVER_LOGGER as LOGGER
+from container_service_extension.metadata_query import MetadataQuery
 import container_service_extension.operation_context as ctx
 import container_service_extension.pyvcloud_utils as vcd_utils
 import container_service_extension.request_handlers.request_utils as req_utils
 from container_service_extension.server_constants import ClusterMetadataKey
+from container_service_extension.server_constants import \
+    DEFAULT_UPGRADE_MAX_UNAVAILABLE
+from container_service_extension.server_constants import \
+    GUEST_EXEC_RETRY_MAX_SECONDS
+from container_service_extension.server_constants import \
+    GUEST_EXEC_RETRY_MIN_SECONDS
+from container_service_extension.server_constants import \
+    KUBECTL_NODE_STATUS_PREFIX
 from container_service_extension.server_constants import KwargKey
 from container_service_extension.server_constants import LocalTemplateKey
 from container_service_extension.server_constants import NodeType
@@ -46,6 +59,35 @@ from container_service_extension.telemetry.telemetry_handler import \
 import container_service_extension.utils as utils
 import container_service_extension.vsphere_utils as vs_utils
 
+# cluster data dictionary key of each cluster metadata key
+METADATA_KEY_TO_CLUSTER_KEY = {
+    ClusterMetadataKey.CLUSTER_ID: 'cluster_id',
+    ClusterMetadataKey.CSE_VERSION: 'cse_version',
+    ClusterMetadataKey.MASTER_IP: 'leader_endpoint',
+    ClusterMetadataKey.TEMPLATE_NAME: 'template_name',
+    ClusterMetadataKey.TEMPLATE_REVISION: 'template_revision',
+    ClusterMetadataKey.OS: 'os',
+    ClusterMetadataKey.DOCKER_VERSION: 'docker_version',
+    ClusterMetadataKey.KUBERNETES: 'kubernetes',
+    ClusterMetadataKey.KUBERNETES_VERSION: 'kubernetes_version',
+    ClusterMetadataKey.CNI: 'cni',
+    ClusterMetadataKey.CNI_VERSION: 'cni_version'
+}
+# metadata queried by default, for the full cluster data
+ALL_CLUSTER_METADATA_KEYS = [
+    *METADATA_KEY_TO_CLUSTER_KEY,
+    ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME
+]
+# metadata needed by operations that only use the cluster id and hrefs
+CLUSTER_ID_METADATA_KEYS = [ClusterMetadataKey.CLUSTER_ID]
+# metadata needed by operations on the cluster template
+CLUSTER_TEMPLATE_METADATA_KEYS = [
+    ClusterMetadataKey.CLUSTER_ID,
+    ClusterMetadataKey.TEMPLATE_NAME,
+    ClusterMetadataKey.TEMPLATE_REVISION,
+    ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME
+]
+
 
 class ClusterService(abstract_broker.AbstractBroker):
     """Handles cluster operations for native DEF based clusters."""
@@ -75,6 +117,22 @@ class ClusterService(abstract_broker.AbstractBroker):
             version=ent_type.version,
             filters=filters)
 
+    def list_clusters_page(self, filters: dict, page: int, page_size: int):
+        """Get a single page of defined entities of native clusters.
+
+        :return: defined entities of the page, and the total number of
+            native cluster entities.
+        :rtype: Tuple[List[def_models.DefEntity], int]
+        """
+        ent_type: def_models.DefEntityType = def_utils.get_registered_def_entity_type()  # noqa: E501
+        return self.entity_svc.get_entities_page_by_entity_type(
+            vendor=ent_type.vendor,
+            nss=ent_type.nss,
+            version=ent_type.version,
+            page=page,
+            page_size=page_size,
+            filters=filters)
+
     def get_cluster_config(self, **kwargs):
         """Get the cluster's kube config contents.
 
@@ -120,7 +178,8 @@ class ClusterService(abstract_broker.AbstractBroker):
         cluster = get_cluster(self.context.client,
                               validated_data[RequestKey.CLUSTER_NAME],
                               org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+                              ovdc_name=validated_data[RequestKey.OVDC_NAME],
+                              metadata_keys=CLUSTER_TEMPLATE_METADATA_KEYS)
 
         if kwargs.get(KwargKey.TELEMETRY, True):
             # Record the telemetry data
@@ -167,7 +226,8 @@ class ClusterService(abstract_broker.AbstractBroker):
         try:
             get_cluster(self.context.client, cluster_name,
                         org_name=org_name,
-                        ovdc_name=ovdc_name)
+                        ovdc_name=ovdc_name,
+                        metadata_keys=CLUSTER_ID_METADATA_KEYS)
             raise e.ClusterAlreadyExistsError(
                 f"Cluster '{cluster_name}' already exists.")
         except e.ClusterNotFoundError:
@@ -245,7 +305,11 @@ class ClusterService(abstract_broker.AbstractBroker):
                 msg = f"Error while creating vApp: {err}"
                 LOGGER.debug(str(err))
                 raise e.ClusterOperationError(msg)
-            self.context.client.get_task_monitor().wait_for_status(vapp_resource.Tasks.Task[0]) # noqa: E501
+            # Instantiation copies the template disks, which can take longer
+            # than any fixed timeout.
+            vcd_utils.wait_for_task(self.context.client,
+                                    vapp_resource.Tasks.Task[0],
+                                    timeout=None)
 
             template = get_template(template_name, template_revision)
 
@@ -264,7 +328,7 @@ class ClusterService(abstract_broker.AbstractBroker):
             vapp = vcd_vapp.VApp(self.context.client,
                                  href=vapp_resource.get('href'))
             task = vapp.set_multiple_metadata(tags)
-            self.context.client.get_task_monitor().wait_for_status(task)
+            vcd_utils.wait_for_task(self.context.client, task)
 
             msg = f"Creating master node for cluster '{cluster_name}' " \
                   f"({cluster_id})"
@@ -289,37 +353,57 @@ class ClusterService(abstract_broker.AbstractBroker):
                 raise e.MasterNodeCreationError("Error adding master node:",
                                                 str(err))
 
-            msg = f"Initializing cluster '{cluster_name}' ({cluster_id})"
+            msg = f"Initializing cluster '{cluster_name}' ({cluster_id}) " \
+                  f"and creating {num_workers} node(s)"
             self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
             vapp.reload()
-            init_cluster(self.context.sysadmin_client,
-                         vapp,
-                         template[LocalTemplateKey.NAME],
-                         template[LocalTemplateKey.REVISION])
-            master_ip = get_master_ip(self.context.sysadmin_client, vapp)
+            # Workers and the NFS node don't need the master till they join
+            # the cluster, so they are created while the master initializes.
+            # Clients aren't thread safe, the node thread uses copies.
+            nodes_client = vcd_utils.copy_client(self.context.client)
+            nodes_cancelled = threading.Event()
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1) as executor:
+                nodes_future = executor.submit(
+                    _add_worker_and_nfs_nodes,
+                    vcd_utils.copy_client(self.context.sysadmin_client),
+                    num_workers=num_workers,
+                    enable_nfs=enable_nfs,
+                    org=vcd_org.Org(nodes_client, href=org.href,
+                                    resource=org.resource),
+                    vdc=VDC(nodes_client, href=vdc.href,
+                            resource=vdc.resource),
+                    vapp=vcd_vapp.VApp(nodes_client, href=vapp.href),
+                    catalog_name=catalog_name,
+                    template=template,
+                    network_name=network_name,
+                    storage_profile=worker_storage_profile,
+                    ssh_key=ssh_key,
+                    sizing_class_name=worker_sizing_class_name,
+                    cancelled=nodes_cancelled)
+                try:
+                    init_cluster(self.context.sysadmin_client,
+                                 vapp,
+                                 template[LocalTemplateKey.NAME],
+                                 template[LocalTemplateKey.REVISION])
+                    master_ip = get_master_ip(self.context.sysadmin_client,
+                                              vapp)
+                except Exception:
+                    # A vApp being recomposed can't be deleted on rollback,
+                    # so nodes not being added yet are skipped, and the nodes
+                    # being added are waited for.
+                    nodes_cancelled.set()
+                    nodes_error = nodes_future.exception()
+                    if nodes_error is not None:
+                        LOGGER.error(f"Error creating nodes of cluster "
+                                     f"'{cluster_name}': {nodes_error}")
+                    raise
+                nodes_future.result()
+
+            # The vApp can't be changed while nodes are being added to it.
             task = vapp.set_metadata('GENERAL', 'READWRITE', 'cse.master.ip',
                                      master_ip)
-            self.context.client.get_task_monitor().wait_for_status(task)
-
-            msg = f"Creating {num_workers} node(s) for cluster " \
-                  f"'{cluster_name}' ({cluster_id})"
-            self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
-            try:
-                add_nodes(self.context.sysadmin_client,
-                          num_nodes=num_workers,
-                          node_type=NodeType.WORKER,
-                          org=org,
-                          vdc=vdc,
-                          vapp=vapp,
-                          catalog_name=catalog_name,
-                          template=template,
-                          network_name=network_name,
-                          storage_profile=worker_storage_profile,
-                          ssh_key=ssh_key,
-                          sizing_class_name=worker_sizing_class_name)
-            except Exception as err:
-                raise e.WorkerNodeCreationError("Error creating worker node:",
-                                                str(err))
+            vcd_utils.wait_for_task(self.context.client, task)
 
             msg = f"Adding {num_workers} node(s) to cluster " \
                   f"'{cluster_name}' ({cluster_id})"
@@ -330,26 +414,6 @@ class ClusterService(abstract_broker.AbstractBroker):
                          template[LocalTemplateKey.NAME],
                          template[LocalTemplateKey.REVISION])
 
-            if enable_nfs:
-                msg = f"Creating NFS node for cluster " \
-                      f"'{cluster_name}' ({cluster_id})"
-                self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
-                try:
-                    add_nodes(self.context.sysadmin_client,
-                              num_nodes=1,
-                              node_type=NodeType.NFS,
-                              org=org,
-                              vdc=vdc,
-                              vapp=vapp,
-                              catalog_name=catalog_name,
-                              template=template,
-                              network_name=network_name,
-                              storage_profile=worker_storage_profile,
-                              ssh_key=ssh_key)
-                except Exception as err:
-                    raise e.NFSNodeCreationError("Error creating NFS node:",
-                                                 str(err))
-
             msg = f"Created cluster '{cluster_name}' ({cluster_id})"
             self._update_task(vcd_client.TaskStatus.SUCCESS, message=msg)
 
@@ -381,7 +445,8 @@ class ClusterService(abstract_broker.AbstractBroker):
                                           cluster_name,
                                           cluster_id=cluster_id,
                                           org_name=org_name,
-                                          ovdc_name=ovdc_name)
+                                          ovdc_name=ovdc_name,
+                                          metadata_keys=CLUSTER_ID_METADATA_KEYS) # noqa: E501
                     _delete_vapp(self.context.client, cluster['vdc_href'],
                                  cluster_name)
                     # Delete the corresponding defined entity
@@ -494,7 +559,8 @@ class ClusterService(abstract_broker.AbstractBroker):
 
         cluster = get_cluster(self.context.client, cluster_name,
                               org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+                              ovdc_name=validated_data[RequestKey.OVDC_NAME],
+                              metadata_keys=CLUSTER_ID_METADATA_KEYS)
         cluster_id = cluster['cluster_id']
 
         if kwargs.get(KwargKey.TELEMETRY, True):
@@ -619,7 +685,8 @@ class ClusterService(abstract_broker.AbstractBroker):
 
         cluster = get_cluster(self.context.client, cluster_name,
                               org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+                              ovdc_name=validated_data[RequestKey.OVDC_NAME],
+                              metadata_keys=CLUSTER_ID_METADATA_KEYS)
 
         if kwargs.get(KwargKey.TELEMETRY, True):
             # Record the telemetry data
@@ -645,10 +712,11 @@ class ClusterService(abstract_broker.AbstractBroker):
             if hasattr(vm, 'VmSpecSection'):
                 node_info['numberOfCpus'] = vm.VmSpecSection.NumCpus.text
                 node_info['memoryMB'] = vm.VmSpecSection.MemoryResourceMb.Configured.text # noqa: E501
-            try:
-                node_info['ipAddress'] = vapp.get_primary_ip(vm_name)
-            except Exception:
+            ip_address = vcd_utils.get_primary_ip(vm)
+            if ip_address is None:
                 LOGGER.debug(f"Unable to get ip address of node {vm_name}")
+            else:
+                node_info['ipAddress'] = ip_address
             if vm_name.startswith(NodeType.MASTER):
                 node_info['node_type'] = 'master'
             elif vm_name.startswith(NodeType.WORKER):
@@ -740,7 +808,8 @@ class ClusterService(abstract_broker.AbstractBroker):
 
         cluster = get_cluster(self.context.client, cluster_name,
                               org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+                              ovdc_name=validated_data[RequestKey.OVDC_NAME],
+                              metadata_keys=CLUSTER_ID_METADATA_KEYS)
         cluster_id = cluster['cluster_id']
 
         if kwargs.get(KwargKey.TELEMETRY, True):
@@ -987,28 +1056,9 @@ class ClusterService(abstract_broker.AbstractBroker):
                                                    template_revision,
                                                    ScriptFile.WORKER_K8S_UPGRADE) # noqa: E501
                 script = utils.read_data_file(filepath, logger=LOGGER)
-                for node in worker_node_names:
-                    msg = f"Draining node {node}"
-                    self._update_task(vcd_client.TaskStatus.RUNNING,
-                                      message=msg)
-                    _drain_nodes(self.context.sysadmin_client,
-                                 vapp_href,
-                                 [node],
-                                 cluster_name=cluster_name)
-
-                    msg = f"Upgrading Kubernetes ({c_k8s} " \
-                          f"-> {t_k8s}) in node {node}"
-                    self._update_task(vcd_client.TaskStatus.RUNNING,
-                                      message=msg)
-                    run_script_in_nodes(self.context.sysadmin_client,
-                                        vapp_href, [node], script)
-
-                    msg = f"Uncordoning node {node}"
-                    self._update_task(vcd_client.TaskStatus.RUNNING,
-                                      message=msg)
-                    _uncordon_nodes(self.context.sysadmin_client,
-                                    vapp_href, [node],
-                                    cluster_name=cluster_name)
+                self._upgrade_worker_nodes(
+                    vapp_href, worker_node_names, script, cluster_name,
+                    upgrade_msg=f"Upgrading Kubernetes ({c_k8s} -> {t_k8s})")
 
             if upgrade_docker or upgrade_cni:
                 msg = f"Draining all nodes {all_node_names}"
@@ -1058,7 +1108,7 @@ class ClusterService(abstract_broker.AbstractBroker):
             }
             vapp = vcd_vapp.VApp(self.context.client, href=vapp_href)
             task = vapp.set_multiple_metadata(metadata)
-            self.context.client.get_task_monitor().wait_for_status(task)
+            vcd_utils.wait_for_task(self.context.client, task)
 
             msg = f"Successfully upgraded cluster '{cluster_name}' software " \
                   f"to match template {template_name} (revision " \
@@ -1075,6 +1125,71 @@ class ClusterService(abstract_broker.AbstractBroker):
         finally:
             self.context.end()
 
+    def _upgrade_worker_nodes(self, vapp_href, worker_node_names, script,
+                              cluster_name, upgrade_msg):
+        """Upgrade worker nodes in rolling batches.
+
+        Up to 'upgrade_max_unavailable' (server config) workers at a time are
+        drained, upgraded concurrently and uncordoned. Stops after the first
+        batch in which a node failed.
+
+        :param str vapp_href:
+        :param list worker_node_names:
+        :param str script: upgrade script to run in the workers.
+        :param str cluster_name:
+        :param str upgrade_msg: task message describing the upgrade.
+
+        :raises NodeOperationError: if a node failed, along with the nodes
+            that were upgraded and the ones that were not.
+        """
+        max_unavailable = utils.get_server_runtime_config()['service'].get(
+            'upgrade_max_unavailable', DEFAULT_UPGRADE_MAX_UNAVAILABLE)
+        batch_size = utils.get_max_unavailable_count(max_unavailable,
+                                                     len(worker_node_names))
+        vapp = vcd_vapp.VApp(self.context.sysadmin_client, href=vapp_href)
+        upgraded = []
+        for i in range(0, len(worker_node_names), batch_size):
+            batch = worker_node_names[i:i + batch_size]
+            msg = f"Draining node(s) {batch}"
+            self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
+            try:
+                _drain_nodes(self.context.sysadmin_client, vapp_href, batch,
+                             cluster_name=cluster_name)
+            except Exception as err:
+                errors = {node: str(err) for node in batch}
+            else:
+                msg = f"{upgrade_msg} in node(s) {batch} " \
+                      f"({len(upgraded)}/{len(worker_node_names)} upgraded)"
+                self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
+                errors = _execute_script_in_nodes_with_errors(
+                    self.context.sysadmin_client, vapp, batch, script)
+
+                # Nodes upgraded successfully are uncordoned even if other
+                # nodes of the batch failed.
+                succeeded = [node for node in batch if node not in errors]
+                if succeeded:
+                    msg = f"Uncordoning node(s) {succeeded}"
+                    self._update_task(vcd_client.TaskStatus.RUNNING,
+                                      message=msg)
+                    try:
+                        _uncordon_nodes(self.context.sysadmin_client,
+                                        vapp_href, succeeded,
+                                        cluster_name=cluster_name)
+                        upgraded.extend(succeeded)
+                    except Exception as err:
+                        errors.update(
+                            (node, f"upgraded, but not uncordoned: {err}")
+                            for node in succeeded)
+
+            if errors:
+                not_upgraded = [node for node in worker_node_names
+                                if node not in upgraded
+                                and node not in errors]
+                raise e.NodeOperationError(
+                    f"Upgrade stopped, failed on node(s) {list(errors)}. "
+                    f"Upgraded node(s): {upgraded}. Node(s) not upgraded: "
+                    f"{not_upgraded}. Errors: {errors}")
+
     def _update_task(self, status, message='', error_message=None,
                      stack_trace=''):
         """Update task or create it if it does not exist.
@@ -1123,20 +1238,64 @@ class ClusterService(abstract_broker.AbstractBroker):
         )
 
 
+def _run_kubectl_for_nodes(sysadmin_client, vapp_href, node_names,
+                           kubectl_command):
+    """Run a kubectl command for nodes of a cluster in parallel.
+
+    A single script is run in the first master node, which runs the command
+    once per node in the background and prints a status line per node.
+
+    :param pyvcloud.vcd.client.Client sysadmin_client:
+    :param str vapp_href:
+    :param list node_names: names of the nodes, each of which is passed as
+        the first argument of the command.
+    :param str kubectl_command: kubectl sub command and flags, e.g.
+        'uncordon'.
+
+    :return: exit code of the command keyed by node name.
+
+    :rtype: dict
+
+    :raises NodeOperationError: if the command failed for any node.
+    """
+    script = "#!/usr/bin/env bash\n" \
+             "run() {\n" \
+             f"    out=$(kubectl {kubectl_command} \"$1\" 2>&1)\n" \
+             "    rc=$?\n" \
+             "    if [ $rc -ne 0 ]; then echo \"$1: $out\" >&2; fi\n" \
+             f"    echo \"{KUBECTL_NODE_STATUS_PREFIX} $1 $rc\"\n" \
+             "}\n"
+    for node_name in node_names:
+        script += f"run '{node_name}' &\n"
+    script += "wait\n"
+
+    vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
+    master_node_names = get_node_names(vapp, NodeType.MASTER)
+    result = execute_script_in_nodes(sysadmin_client, vapp=vapp,
+                                     node_names=[master_node_names[0]],
+                                     script=script, check_tools=False)[0]
+    exit_codes = {}
+    for line in result[1].content.decode().splitlines():
+        tokens = line.split()
+        if len(tokens) == 3 and tokens[0] == KUBECTL_NODE_STATUS_PREFIX:
+            exit_codes[tokens[1]] = int(tokens[2])
+    failed_nodes = [node_name for node_name in node_names
+                    if exit_codes.get(node_name, -1) != 0]
+    if failed_nodes:
+        raise e.NodeOperationError(
+            f"kubectl {kubectl_command} failed for node(s) {failed_nodes}:\n"
+            f"{result[2].content.decode()}")
+    return exit_codes
+
+
 def _drain_nodes(sysadmin_client: vcd_client.Client, vapp_href, node_names,
                  cluster_name=''):
     LOGGER.debug(f"Draining nodes {node_names} in cluster '{cluster_name}' "
                  f"(vapp: {vapp_href})")
-    script = "#!/usr/bin/env bash\n"
-    for node_name in node_names:
-        script += f"kubectl drain {node_name} " \
-                  f"--ignore-daemonsets --timeout=60s --delete-local-data\n"
-
     try:
-        vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
-        master_node_names = get_node_names(vapp, NodeType.MASTER)
-        run_script_in_nodes(sysadmin_client, vapp_href, [master_node_names[0]],
-                            script)
+        _run_kubectl_for_nodes(
+            sysadmin_client, vapp_href, node_names,
+            "drain --ignore-daemonsets --timeout=60s --delete-local-data")
     except Exception as err:
         LOGGER.warning(f"Failed to drain nodes {node_names} in cluster "
                        f"'{cluster_name}' (vapp: {vapp_href}) with "
@@ -1153,15 +1312,9 @@ def _uncordon_nodes(sysadmin_client: vcd_client.Client, vapp_href, node_names,
 
     LOGGER.debug(f"Uncordoning nodes {node_names} in cluster '{cluster_name}' "
                  f"(vapp: {vapp_href})")
-    script = "#!/usr/bin/env bash\n"
-    for node_name in node_names:
-        script += f"kubectl uncordon {node_name}\n"
-
     try:
-        vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
-        master_node_names = get_node_names(vapp, NodeType.MASTER)
-        run_script_in_nodes(sysadmin_client, vapp_href, [master_node_names[0]],
-                            script)
+        _run_kubectl_for_nodes(sysadmin_client, vapp_href, node_names,
+                               "uncordon")
     except Exception as err:
         LOGGER.warning(f"Failed to uncordon nodes {node_names} in cluster "
                        f"'{cluster_name}' (vapp: {vapp_href}) "
@@ -1178,7 +1331,7 @@ def _delete_vapp(client, vdc_href, vapp_name):
     try:
         vdc = VDC(client, href=vdc_href)
         task = vdc.delete_vapp(vapp_name, force=True)
-        client.get_task_monitor().wait_for_status(task)
+        vcd_utils.wait_for_task(client, task)
     except Exception as err:
         LOGGER.warning(f"Failed to delete vapp {vapp_name} "
                        f"(vdc: {vdc_href}) with error: {err}")
@@ -1201,24 +1354,34 @@ def _delete_nodes(sysadmin_client: vcd_client.Client, vapp_href, node_names,
     vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
     try:
         master_node_names = get_node_names(vapp, NodeType.MASTER)
-        run_script_in_nodes(sysadmin_client, vapp_href, [master_node_names[0]],
-                            script)
+        results = execute_script_in_nodes(sysadmin_client, vapp=vapp,
+                                          node_names=[master_node_names[0]],
+                                          script=script, check_tools=False)
+        errors = get_script_execution_errors(results)
+        if errors:
+            raise e.ScriptExecutionError(errors)
     except Exception:
         LOGGER.warning(f"Failed to delete node(s) {node_names} from cluster "
                        f"'{cluster_name}' using kubectl (vapp: {vapp_href})")
 
-    vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
+    # Undeploy tasks of different VMs run concurrently in vCD, so they are
+    # all started before waiting for any of them.
+    tasks = []
     for vm_name in node_names:
         vm = vcd_vm.VM(sysadmin_client, resource=vapp.get_vm(vm_name))
         try:
-            task = vm.undeploy()
-            sysadmin_client.get_task_monitor().wait_for_status(task)
+            tasks.append(vm.undeploy())
         except Exception:
             LOGGER.warning(f"Failed to undeploy VM {vm_name} "
                            f"(vapp: {vapp_href})")
+    try:
+        vcd_utils.wait_for_tasks(sysadmin_client, tasks)
+    except Exception as err:
+        LOGGER.warning(f"Failed to undeploy VM(s) of {node_names} "
+                       f"(vapp: {vapp_href}): {err}")
 
     task = vapp.delete_vms(node_names)
-    sysadmin_client.get_task_monitor().wait_for_status(task)
+    vcd_utils.wait_for_task(sysadmin_client, task)
     LOGGER.debug(f"Successfully deleted node(s) {node_names} from "
                  f"cluster '{cluster_name}' (vapp: {vapp_href})")
 
@@ -1256,7 +1419,7 @@ def is_valid_cluster_name(name):
 
 
 def get_all_clusters(client, cluster_name=None, cluster_id=None,
-                     org_name=None, ovdc_name=None):
+                     org_name=None, ovdc_name=None, metadata_keys=None):
     """Get list of dictionaries containing data for each visible cluster.
 
     TODO define these cluster data dictionary keys better:
@@ -1265,6 +1428,10 @@ def get_all_clusters(client, cluster_name=None, cluster_id=None,
         'number_of_vms', 'template_name', 'template_revision',
         'cse_version', 'cluster_id', 'status', 'os', 'docker_version',
         'kubernetes', 'kubernetes_version', 'cni', 'cni_version'
+
+    Keys filled from cluster metadata are left empty unless their metadata
+    key is in @metadata_keys, which defaults to ALL_CLUSTER_METADATA_KEYS.
+    Fewer metadata keys take fewer vCD queries.
     """
     query_filter = f'metadata:{ClusterMetadataKey.CLUSTER_ID}==STRING:*'
     if cluster_id is not None:
@@ -1280,106 +1447,63 @@ def get_all_clusters(client, cluster_name=None, cluster_id=None,
             org_resource = client.get_org_by_name(org_name)
             org = vcd_org.Org(client, resource=org_resource)
             query_filter += f";org=={org.resource.get('id')}"
-
-    # 2 queries are required because each query can only return 8 metadata
-    q = client.get_typed_query(
-        resource_type,
-        query_result_format=vcd_client.QueryResultFormat.ID_RECORDS,
-        qfilter=query_filter,
-        fields=f'metadata:{ClusterMetadataKey.CLUSTER_ID}'
-               f',metadata:{ClusterMetadataKey.MASTER_IP}'
-               f',metadata:{ClusterMetadataKey.CSE_VERSION}'
-               f',metadata:{ClusterMetadataKey.TEMPLATE_NAME}'
-               f',metadata:{ClusterMetadataKey.TEMPLATE_REVISION}'
-               f',metadata:{ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME}' # noqa: E501
-               f',metadata:{ClusterMetadataKey.OS}')
-    q2 = client.get_typed_query(
-        resource_type,
-        query_result_format=vcd_client.QueryResultFormat.ID_RECORDS,
-        qfilter=query_filter,
-        fields=f'metadata:{ClusterMetadataKey.DOCKER_VERSION}'
-               f',metadata:{ClusterMetadataKey.KUBERNETES}'
-               f',metadata:{ClusterMetadataKey.KUBERNETES_VERSION}'
-               f',metadata:{ClusterMetadataKey.CNI}'
-               f',metadata:{ClusterMetadataKey.CNI_VERSION}')
-
-    metadata_key_to_cluster_key = {
-        ClusterMetadataKey.CLUSTER_ID: 'cluster_id',
-        ClusterMetadataKey.CSE_VERSION: 'cse_version',
-        ClusterMetadataKey.MASTER_IP: 'leader_endpoint',
-        ClusterMetadataKey.TEMPLATE_NAME: 'template_name',
-        ClusterMetadataKey.TEMPLATE_REVISION: 'template_revision',
-        ClusterMetadataKey.OS: 'os',
-        ClusterMetadataKey.DOCKER_VERSION: 'docker_version',
-        ClusterMetadataKey.KUBERNETES: 'kubernetes',
-        ClusterMetadataKey.KUBERNETES_VERSION: 'kubernetes_version',
-        ClusterMetadataKey.CNI: 'cni',
-        ClusterMetadataKey.CNI_VERSION: 'cni_version'
+    if metadata_keys is None:
+        metadata_keys = ALL_CLUSTER_METADATA_KEYS
+
+    query = MetadataQuery(client, resource_type, metadata_keys,
+                          qfilter=query_filter)
+    return [_to_cluster_data(client, record, metadata)
+            for record, metadata in query.execute()]
+
+
+def _to_cluster_data(client, record, metadata):
+    """Get cluster data dictionary from a vApp query record."""
+    vapp_id = record.get('id').split(':')[-1]
+    vdc_id = record.get('vdc').split(':')[-1]
+    cluster = {
+        'name': record.get('name'),
+        'vapp_id': vapp_id,
+        'vapp_href': f'{client.get_api_uri()}/vApp/vapp-{vapp_id}',
+        'vdc_name': record.get('vdcName'),
+        'vdc_href': f'{client.get_api_uri()}/vdc/{vdc_id}',
+        'vdc_id': vdc_id,
+        'leader_endpoint': '',
+        'master_nodes': [],
+        'nodes': [],
+        'nfs_nodes': [],
+        'number_of_vms': record.get('numberOfVMs'),
+        'template_name': '',
+        'template_revision': '',
+        'cse_version': '',
+        'cluster_id': '',
+        'status': record.get('status'),
+        'os': '',
+        'docker_version': '',
+        'kubernetes': '',
+        'kubernetes_version': '',
+        'cni': '',
+        'cni_version': ''
     }
+    for metadata_key, cluster_key in METADATA_KEY_TO_CLUSTER_KEY.items():
+        if metadata_key in metadata:
+            cluster[cluster_key] = metadata[metadata_key]
 
-    clusters = {}
-    for record in q.execute():
-        vapp_id = record.get('id').split(':')[-1]
-        vdc_id = record.get('vdc').split(':')[-1]
-        vapp_href = f'{client.get_api_uri()}/vApp/vapp-{vapp_id}'
-
-        clusters[vapp_id] = {
-            'name': record.get('name'),
-            'vapp_id': vapp_id,
-            'vapp_href': vapp_href,
-            'vdc_name': record.get('vdcName'),
-            'vdc_href': f'{client.get_api_uri()}/vdc/{vdc_id}',
-            'vdc_id': vdc_id,
-            'leader_endpoint': '',
-            'master_nodes': [],
-            'nodes': [],
-            'nfs_nodes': [],
-            'number_of_vms': record.get('numberOfVMs'),
-            'template_name': '',
-            'template_revision': '',
-            'cse_version': '',
-            'cluster_id': '',
-            'status': record.get('status'),
-            'os': '',
-            'docker_version': '',
-            'kubernetes': '',
-            'kubernetes_version': '',
-            'cni': '',
-            'cni_version': ''
-        }
-
-        if hasattr(record, 'Metadata'):
-            for element in record.Metadata.MetadataEntry:
-                if element.Key in metadata_key_to_cluster_key:
-                    clusters[vapp_id][metadata_key_to_cluster_key[element.Key]] = str(element.TypedValue.Value) # noqa: E501
-                # for pre-2.5.0 cluster backwards compatibility
-                elif element.Key == ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME and clusters[vapp_id]['template_name'] == '': # noqa: E501
-                    clusters[vapp_id]['template_name'] = str(element.TypedValue.Value) # noqa: E501
-
-        # pre-2.6 clusters may not have kubernetes version metadata
-        if clusters[vapp_id]['kubernetes_version'] == '':
-            clusters[vapp_id]['kubernetes_version'] = ltm.get_k8s_version_from_template_name(clusters[vapp_id]['template_name']) # noqa: E501
-
-    # api query can fetch only 8 metadata at a time
-    # since we have more than 8 metadata, we need to use 2 queries
-    for record in q2.execute():
-        vapp_id = record.get('id').split(':')[-1]
-        if hasattr(record, 'Metadata'):
-            for element in record.Metadata.MetadataEntry:
-                if element.Key in metadata_key_to_cluster_key:
-                    clusters[vapp_id][metadata_key_to_cluster_key[element.Key]] = str(element.TypedValue.Value) # noqa: E501
-                # for pre-2.5.0 cluster backwards compatibility
-                elif element.Key == ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME and clusters[vapp_id]['template_name'] == '': # noqa: E501
-                    clusters[vapp_id]['template_name'] = str(element.TypedValue.Value) # noqa: E501
-
-    return list(clusters.values())
+    # for pre-2.5.0 cluster backwards compatibility
+    if cluster['template_name'] == '':
+        cluster['template_name'] = metadata.get(
+            ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME, '')
+    # pre-2.6 clusters may not have kubernetes version metadata
+    if cluster['kubernetes_version'] == '':
+        cluster['kubernetes_version'] = ltm.get_k8s_version_from_template_name(cluster['template_name']) # noqa: E501
+    return cluster
 
 
 def get_cluster(client, cluster_name, cluster_id=None, org_name=None,
-                ovdc_name=None):
+                ovdc_name=None, metadata_keys=None):
     clusters = get_all_clusters(client, cluster_name=cluster_name,
                                 cluster_id=cluster_id, org_name=org_name,
-                                ovdc_name=ovdc_name)
+                                ovdc_name=ovdc_name,
+                                metadata_keys=metadata_keys)
     if len(clusters) > 1:
         raise e.CseDuplicateClusterError(f"Found multiple clusters named"
                                          f" '{cluster_name}'.")
@@ -1453,14 +1577,14 @@ def add_nodes(sysadmin_client, num_nodes, node_type, org, vdc, vapp,
                 "fi"
 
         vapp.reload()
+        vm_names = set(vcd_utils.get_vms_by_name(vapp))
         for n in range(num_nodes):
             name = None
             while True:
                 name = f"{node_type}-{''.join(random.choices(string.ascii_lowercase + string.digits, k=4))}" # noqa: E501
-                try:
-                    vapp.get_vm(name)
-                except Exception:
+                if name not in vm_names:
                     break
+            vm_names.add(name)
             spec = {
                 'source_vm_name': source_vm,
                 'vapp': source_vapp.resource,
@@ -1479,33 +1603,35 @@ def add_nodes(sysadmin_client, num_nodes, node_type, org, vdc, vapp,
             specs.append(spec)
 
         task = vapp.add_vms(specs, power_on=False)
-        sysadmin_client.get_task_monitor().wait_for_status(task)
+        vcd_utils.wait_for_task(sysadmin_client, task, timeout=None)
         vapp.reload()
 
-        for spec in specs:
-            vm_name = spec['target_vm_name']
-            vm_resource = vapp.get_vm(vm_name)
-            vm = vcd_vm.VM(sysadmin_client, resource=vm_resource)
-
-            task = vm.power_on()
-            sysadmin_client.get_task_monitor().wait_for_status(task)
-            vapp.reload()
-
-            if node_type == NodeType.NFS:
-                LOGGER.debug(f"Enabling NFS server on {vm_name}")
-                script_filepath = ltm.get_script_filepath(
-                    template[LocalTemplateKey.NAME],
-                    template[LocalTemplateKey.REVISION],
-                    ScriptFile.NFSD)
-                script = utils.read_data_file(script_filepath, logger=LOGGER)
-                exec_results = execute_script_in_nodes(
-                    sysadmin_client, vapp=vapp, node_names=[vm_name],
-                    script=script)
-                errors = get_script_execution_errors(exec_results)
-                if errors:
-                    raise e.ScriptExecutionError(
-                        f"VM customization script execution failed "
-                        f"on node {vm_name}:{errors}")
+        # Power on tasks of different VMs run concurrently in vCD, so they
+        # are all started before waiting for any of them.
+        power_on_tasks = [
+            vcd_vm.VM(sysadmin_client,
+                      resource=vapp.get_vm(spec['target_vm_name'])).power_on()
+            for spec in specs]
+        vcd_utils.wait_for_tasks(sysadmin_client, power_on_tasks)
+        if power_on_tasks:
+            task = power_on_tasks[-1]
+
+        if node_type == NodeType.NFS:
+            node_names = [spec['target_vm_name'] for spec in specs]
+            LOGGER.debug(f"Enabling NFS server on {node_names}")
+            script_filepath = ltm.get_script_filepath(
+                template[LocalTemplateKey.NAME],
+                template[LocalTemplateKey.REVISION],
+                ScriptFile.NFSD)
+            script = utils.read_data_file(script_filepath, logger=LOGGER)
+            exec_results = execute_script_in_nodes(
+                sysadmin_client, vapp=vapp, node_names=node_names,
+                script=script)
+            errors = get_script_execution_errors(exec_results)
+            if errors:
+                raise e.ScriptExecutionError(
+                    f"VM customization script execution failed on node "
+                    f"{node_names}:{errors}")
     except Exception as err:
         # TODO: get details of the exception to determine cause of failure,
         # e.g. not enough resources available.
@@ -1516,14 +1642,58 @@ def add_nodes(sysadmin_client, num_nodes, node_type, org, vdc, vapp,
     return {'task': task, 'specs': specs}
 
 
-def get_node_names(vapp, node_type):
-    return [vm.get('name') for vm in vapp.get_all_vms() if vm.get('name').startswith(node_type)] # noqa: E501
+def _add_worker_and_nfs_nodes(sysadmin_client, num_workers, enable_nfs, org,
+                              vdc, vapp, catalog_name, template, network_name,
+                              storage_profile=None, ssh_key=None,
+                              sizing_class_name=None, cancelled=None):
+    """Add the worker nodes and the NFS node of a new cluster.
 
+    Meant to run while the master initializes, so @vapp should not be shared
+    with the caller. Workers are added before the NFS node, since a vApp
+    can't be recomposed by two tasks at once.
 
-def _wait_for_tools_ready_callback(message, exception=None):
-    LOGGER.debug(f"waiting for guest tools, status: {message}")
-    if exception is not None:
-        LOGGER.error(f"exception: {str(exception)}")
+    :param threading.Event cancelled: once set, nodes that are not being
+        added yet are skipped.
+    """
+    try:
+        add_nodes(sysadmin_client,
+                  num_nodes=num_workers,
+                  node_type=NodeType.WORKER,
+                  org=org,
+                  vdc=vdc,
+                  vapp=vapp,
+                  catalog_name=catalog_name,
+                  template=template,
+                  network_name=network_name,
+                  storage_profile=storage_profile,
+                  ssh_key=ssh_key,
+                  sizing_class_name=sizing_class_name)
+    except Exception as err:
+        raise e.WorkerNodeCreationError("Error creating worker node:",
+                                        str(err))
+
+    if cancelled is not None and cancelled.is_set():
+        return
+
+    if enable_nfs:
+        try:
+            add_nodes(sysadmin_client,
+                      num_nodes=1,
+                      node_type=NodeType.NFS,
+                      org=org,
+                      vdc=vdc,
+                      vapp=vapp,
+                      catalog_name=catalog_name,
+                      template=template,
+                      network_name=network_name,
+                      storage_profile=storage_profile,
+                      ssh_key=ssh_key)
+        except Exception as err:
+            raise e.NFSNodeCreationError("Error creating NFS node:", str(err))
+
+
+def get_node_names(vapp, node_type):
+    return [name for name in vcd_utils.get_vms_by_name(vapp) if name.startswith(node_type)] # noqa: E501
 
 
 def _wait_for_guest_execution_callback(message, exception=None):
@@ -1620,6 +1790,8 @@ def _wait_until_ready_to_exec(vs, vm, password, tries=30):
     ready = False
     script = "#!/usr/bin/env bash\n" \
              "uname -a\n"
+    delays = utils.exponential_backoff(GUEST_EXEC_RETRY_MIN_SECONDS,
+                                       GUEST_EXEC_RETRY_MAX_SECONDS)
     for _ in range(tries):
         result = vs.execute_script_in_guest(
             vm, 'root', password, script,
@@ -1634,7 +1806,7 @@ def _wait_until_ready_to_exec(vs, vm, password, tries=30):
             break
         LOGGER.info(f"Script returned {result[0]}; VM is not "
                     f"ready to execute scripts, yet")
-        time.sleep(2)
+        time.sleep(next(delays))
 
     if not ready:
         raise e.CseServerError('VM is not ready to execute scripts')
@@ -1643,24 +1815,77 @@ def _wait_until_ready_to_exec(vs, vm, password, tries=30):
 def execute_script_in_nodes(sysadmin_client: vcd_client.Client,
                             vapp, node_names, script,
                             check_tools=True, wait=True):
+    """Execute a script in nodes of a cluster, concurrently.
+
+    At most 'max_guest_ops_per_vcenter' nodes of a vCenter are worked on at
+    a time, see vsphere_utils.run_guest_ops() for errors.
+
+    :return: script results, in the order of @node_names.
+
+    :rtype: list
+    """
     vcd_utils.raise_error_if_not_sysadmin(sysadmin_client)
-    all_results = []
-    for node_name in node_names:
-        LOGGER.debug(f"will try to execute script on {node_name}:\n"
-                     f"{script}")
+    # Load the vApp once, instead of in every node thread.
+    vapp.get_resource()
+    # Nodes are worked on in threads, each with its own copy of the client.
+    return vs_utils.run_guest_ops(
+        lambda node_name: _execute_script_in_node(
+            vcd_utils.copy_client(sysadmin_client), vapp, node_name, script,
+            check_tools=check_tools, wait=wait),
+        node_names, logger=LOGGER)
 
-        vs = vs_utils.get_vsphere(sysadmin_client, vapp, vm_name=node_name,
-                                  logger=LOGGER)
-        vs.connect()
+
+def _execute_script_in_nodes_with_errors(sysadmin_client: vcd_client.Client,
+                                         vapp, node_names, script):
+    """Execute a script in nodes concurrently, collecting errors per node.
+
+    Unlike execute_script_in_nodes(), nodes don't fail each other: a node
+    fails if the script can't be run in it or exits with non zero status.
+
+    :return: error messages keyed by the names of the failed nodes.
+
+    :rtype: dict
+    """
+    vcd_utils.raise_error_if_not_sysadmin(sysadmin_client)
+    # Load the vApp once, instead of in every node thread.
+    vapp.get_resource()
+
+    # Nodes are worked on in threads, each with its own copy of the client.
+    def execute_script(node_name):
+        try:
+            result = _execute_script_in_node(
+                vcd_utils.copy_client(sysadmin_client), vapp, node_name,
+                script, check_tools=False)
+        except Exception as err:
+            LOGGER.error(f"Failed to execute script in node {node_name}: "
+                         f"{err}")
+            return str(err)
+        if result[0] != 0:
+            return result[2].content.decode()
+        return None
+
+    errors = vs_utils.run_guest_ops(execute_script, node_names,
+                                    logger=LOGGER)
+    return {node_name: error for node_name, error in zip(node_names, errors)
+            if error is not None}
+
+
+def _execute_script_in_node(sysadmin_client: vcd_client.Client,
+                            vapp, node_name, script,
+                            check_tools=True, wait=True):
+    LOGGER.debug(f"will try to execute script on {node_name}:\n"
+                 f"{script}")
+
+    if check_tools:
+        LOGGER.debug(f"waiting for tools on {node_name}")
+        wait_until_guest_ready(sysadmin_client, vapp, node_name,
+                               logger=LOGGER)
+    with vs_utils.pooled_vsphere(sysadmin_client, vapp, node_name,
+                                 logger=LOGGER) as vs:
         moid = vapp.get_vm_moid(node_name)
         vm = vs.get_vm_by_moid(moid)
         password = vapp.get_admin_password(node_name)
         if check_tools:
-            LOGGER.debug(f"waiting for tools on {node_name}")
-            vs.wait_until_tools_ready(
-                vm,
-                sleep=5,
-                callback=_wait_for_tools_ready_callback)
             _wait_until_ready_to_exec(vs, vm, password)
         LOGGER.debug(f"about to execute script on {node_name} "
                      f"(vm={vm}), wait={wait}")
@@ -1683,12 +1908,10 @@ def execute_script_in_nodes(sysadmin_client: vcd_client.Client,
             ]
             result_stdout = ''
             result_stderr = ''
-        LOGGER.debug(result[0])
-        LOGGER.debug(result_stderr)
-        LOGGER.debug(result_stdout)
-        all_results.append(result)
-
-    return all_results
+    LOGGER.debug(result[0])
+    LOGGER.debug(result_stderr)
+    LOGGER.debug(result_stdout)
+    return result
 
 
 def run_script_in_nodes(sysadmin_client: vcd_client.Client, vapp_href,
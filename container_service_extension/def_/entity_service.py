@@ -145,6 +145,36 @@ class DefEntityService():
             for entity in response_body['values']:
                 yield DefEntity(**entity)
 
+    @handle_entity_service_exception
+    def get_entities_page_by_entity_type(self, vendor: str, nss: str,
+                                         version: str, page: int,
+                                         page_size: int,
+                                         filters: dict = None):
+        """Get a single page of entities of a given entity type.
+
+        :param str vendor: Vendor of the entity type
+        :param str nss: nss of the entity type
+        :param str version: version of the entity type
+        :param int page: page number, starting at 1
+        :param int page_size: max number of entities in the page
+        :param dict filters: Key-value pairs representing filter options
+        :return: Entities of the page and total number of entities of that
+            entity type
+        :rtype: Tuple[List[DefEntity], int]
+        """
+        query_string = f"page={page}&pageSize={page_size}&sortAsc=name"
+        if filters:
+            filter_string = ";".join(
+                [f"{k}=={v}" for (k, v) in filters.items()])
+            query_string = f"filter={filter_string}&{query_string}"
+        response_body = self._cloudapi_client.do_request(
+            method=RequestMethod.GET,
+            cloudapi_version=CLOUDAPI_VERSION_1_0_0,
+            resource_url_relative_path=f"{CloudApiResource.ENTITIES}/"
+                                       f"{vendor}/{nss}/{version}?{query_string}")  # noqa: E501
+        entities = [DefEntity(**entity) for entity in response_body['values']]
+        return entities, response_body['resultTotal']
+
     @handle_entity_service_exception
     def list_entities_by_interface(self, vendor: str, nss: str, version: str):
         """List entities of a given interface.
@@ -0,0 +1,279 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Detection of VMs whose guest operations are ready, e.g. after power on.
+
+A GuestReadinessWatcher per vCenter follows the tools status of all VMs
+that requests are waiting on, through property collector updates. If the
+watcher can't be used, VMs are polled with exponential backoff instead.
+"""
+
+import threading
+import time
+
+from pyVim.connect import Disconnect
+from pyVmomi import vim
+from pyVmomi import vmodl
+
+from container_service_extension.logger import NULL_LOGGER
+from container_service_extension.logger import SERVER_LOGGER as LOGGER
+from container_service_extension.server_constants import \
+    GUEST_READINESS_POLL_MAX_SECONDS
+from container_service_extension.server_constants import \
+    GUEST_READINESS_POLL_MIN_SECONDS
+from container_service_extension.server_constants import \
+    GUEST_READINESS_WAIT_SECONDS
+from container_service_extension.server_constants import \
+    GUEST_READINESS_WATCHER_MAX_SILENCE_SECONDS
+from container_service_extension.server_constants import \
+    GUEST_READINESS_WATCHER_RETRY_SECONDS
+import container_service_extension.utils as utils
+import container_service_extension.vsphere_utils as vs_utils
+
+TOOLS_RUNNING_STATUS = 'guest.toolsRunningStatus'
+GUEST_OPERATIONS_READY = 'guest.guestOperationsReady'
+
+# vCenter name -> GuestReadinessWatcher
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+class _Waiter(object):
+    def __init__(self):
+        self.event = threading.Event()
+        # True once the VM is ready, False if the watcher can't tell
+        self.ready = None
+
+
+class GuestReadinessWatcher(object):
+    """Thread safe watcher of VMs of a vCenter till their guest is ready.
+
+    A VM is ready once its tools are running and its guest operations are
+    ready. Every watched VM gets a property collector filter, and a single
+    WaitForUpdatesEx() loop on a dedicated vCenter session serves all of
+    them. The loop wakes up every GUEST_READINESS_WAIT_SECONDS, so VMs are
+    seen ready within about that time.
+    """
+
+    def __init__(self, vsphere_factory, name):
+        """Initialize GuestReadinessWatcher object.
+
+        :param function vsphere_factory: function that returns a new
+            connected VSphere object, used for the session of the watcher.
+        :param str name: name of the watcher, used for logging.
+        """
+        self._vsphere_factory = vsphere_factory
+        self.name = name
+        self._lock = threading.Lock()
+        # moid -> _Waiter, for VMs that are waited on
+        self._waiters = {}
+        # moids of VMs to add to / remove from the property collector
+        self._added = set()
+        self._removed = set()
+        self._stopped = threading.Event()
+        self.failed_at = None
+        # last time the update loop ran, see is_healthy()
+        self._alive_at = time.monotonic()
+
+    def wait(self, moid):
+        """Block till the guest of a VM is ready.
+
+        The watcher is checked every GUEST_READINESS_POLL_MAX_SECONDS while
+        waiting, so that a hung watcher doesn't block its callers.
+
+        :param str moid: vCenter managed object id of the VM.
+
+        :return: True once the VM is ready, False if the watcher can't watch
+            the VM and the caller should poll it instead.
+
+        :rtype: bool
+        """
+        with self._lock:
+            if not self._is_healthy():
+                return False
+            waiter = self._waiters.get(moid)
+            if waiter is None:
+                waiter = self._waiters[moid] = _Waiter()
+                self._added.add(moid)
+        while not waiter.event.wait(GUEST_READINESS_POLL_MAX_SECONDS):
+            with self._lock:
+                if not self._is_healthy():
+                    return False
+        return waiter.ready
+
+    def _is_healthy(self):
+        """Check that the watcher runs, marks it failed if it hung.
+
+        Must be called with the lock held.
+        """
+        if self.failed_at is not None or self._stopped.is_set():
+            return False
+        silence = time.monotonic() - self._alive_at
+        if silence > GUEST_READINESS_WATCHER_MAX_SILENCE_SECONDS:
+            LOGGER.warning(f"{self.name} is silent for {int(silence)}s, VMs "
+                           f"will be polled")
+            self.failed_at = time.monotonic()
+            # The update loop exits if it ever wakes up.
+            self._stopped.set()
+            return False
+        return True
+
+    def run(self):
+        """Watch VMs till stopped or till the watcher fails.
+
+        Blocks the calling thread, should be run in a daemon thread.
+        """
+        vs = None
+        collector = None
+        # moid -> (property collector filter, properties seen so far)
+        filters = {}
+        try:
+            vs = self._vsphere_factory()
+            collector = vs.service_instance.content.propertyCollector.CreatePropertyCollector() # noqa: E501
+            options = vmodl.query.PropertyCollector.WaitOptions(
+                maxWaitSeconds=GUEST_READINESS_WAIT_SECONDS)
+            version = ''
+            while not self._stopped.is_set():
+                self._alive_at = time.monotonic()
+                self._update_filters(vs, collector, filters)
+                update_set = collector.WaitForUpdatesEx(version, options)
+                if update_set is None:
+                    continue
+                version = update_set.version
+                for filter_update in update_set.filterSet:
+                    for object_update in filter_update.objectSet:
+                        self._handle_update(object_update, filters)
+        except Exception as err:
+            LOGGER.warning(f"{self.name} failed, VMs will be polled: {err}")
+            with self._lock:
+                self.failed_at = time.monotonic()
+        finally:
+            # Waiters left when failed or stopped poll their VM instead.
+            with self._lock:
+                waiters = list(self._waiters.values())
+                self._waiters.clear()
+            for waiter in waiters:
+                waiter.ready = False
+                waiter.event.set()
+            if collector is not None:
+                try:
+                    collector.Destroy()
+                except Exception:
+                    pass
+            if vs is not None:
+                try:
+                    Disconnect(vs.service_instance)
+                except Exception:
+                    pass
+
+    def stop(self):
+        self._stopped.set()
+
+    def _update_filters(self, vs, collector, filters):
+        with self._lock:
+            added = self._added
+            removed = self._removed
+            self._added = set()
+            self._removed = set()
+        for moid in removed:
+            collector_filter, _ = filters.pop(moid, (None, None))
+            if collector_filter is not None:
+                collector_filter.Destroy()
+        for moid in added:
+            filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+                objectSet=[vmodl.query.PropertyCollector.ObjectSpec(
+                    obj=vs.get_vm_by_moid(moid), skip=False)],
+                propSet=[vmodl.query.PropertyCollector.PropertySpec(
+                    type=vim.VirtualMachine, all=False,
+                    pathSet=[TOOLS_RUNNING_STATUS, GUEST_OPERATIONS_READY])])
+            try:
+                filters[moid] = (
+                    collector.CreateFilter(filter_spec, partialUpdates=True),
+                    {})
+            except vmodl.MethodFault as err:
+                # e.g. the VM is gone, only its waiter is affected
+                LOGGER.debug(f"{self.name} can't watch VM {moid}: {err}")
+                self._notify(moid, ready=False)
+
+    def _handle_update(self, object_update, filters):
+        moid = object_update.obj._moId
+        if moid not in filters:
+            return
+        properties = filters[moid][1]
+        for change in object_update.changeSet:
+            properties[change.name] = change.val
+        if properties.get(TOOLS_RUNNING_STATUS) == 'guestToolsRunning' and \
+                properties.get(GUEST_OPERATIONS_READY) is True:
+            self._notify(moid, ready=True)
+
+    def _notify(self, moid, ready):
+        with self._lock:
+            waiter = self._waiters.pop(moid, None)
+            self._removed.add(moid)
+        if waiter is not None:
+            waiter.ready = ready
+            waiter.event.set()
+
+
+def _get_watcher(vcenter):
+    """Get the watcher of a vCenter, None if it failed recently."""
+    with _watchers_lock:
+        watcher = _watchers.get(vcenter['name'])
+        if watcher is not None and watcher.failed_at is not None:
+            if time.monotonic() - watcher.failed_at < GUEST_READINESS_WATCHER_RETRY_SECONDS: # noqa: E501
+                return None
+            watcher = None
+        if watcher is None:
+            watcher = GuestReadinessWatcher(
+                lambda: vs_utils.connect_vsphere(vcenter),
+                name=f"Guest readiness watcher of vCenter '{vcenter['name']}'") # noqa: E501
+            utils.run_async(watcher.run)()
+            _watchers[vcenter['name']] = watcher
+        return watcher
+
+
+def wait_until_guest_ready(sys_admin_client, vapp, vm_name,
+                           logger=NULL_LOGGER):
+    """Block till the tools and guest operations of a VM are ready.
+
+    No vCenter session of vsphere_utils.pooled_vsphere() is used while
+    waiting, except when the VM has to be polled.
+
+    :param pyvcloud.vcd.client.Client sys_admin_client:
+    :param pyvcloud.vcd.vapp.VApp vapp: VApp of the VM.
+    :param str vm_name:
+    :param logging.Logger logger: logger to log with.
+    """
+    vcenter = vs_utils.get_vcenter_info(sys_admin_client, vapp, vm_name)
+    moid = vapp.get_vm_moid(vm_name)
+    watcher = _get_watcher(vcenter)
+    if watcher is not None and watcher.wait(moid):
+        logger.debug(f"Guest of VM {vm_name} is ready")
+        return
+
+    for delay in utils.exponential_backoff(GUEST_READINESS_POLL_MIN_SECONDS,
+                                           GUEST_READINESS_POLL_MAX_SECONDS):
+        try:
+            with vs_utils.pooled_vsphere(sys_admin_client, vapp, vm_name,
+                                         logger=logger) as vs:
+                guest = vs.get_vm_by_moid(moid).guest
+                status = guest.toolsRunningStatus
+                guest_ops_ready = guest.guestOperationsReady
+            logger.debug(f"VM {vm_name} tools status: {status}, guest "
+                         f"operations ready: {guest_ops_ready}")
+            if status == 'guestToolsRunning' and guest_ops_ready is True:
+                return
+        except Exception as err:
+            logger.debug(f"Failed to get guest status of VM {vm_name}: "
+                         f"{err}")
+        time.sleep(delay)
+
+
+def stop_guest_readiness_watchers():
+    """Stop all watchers, along with their vCenter sessions."""
+    with _watchers_lock:
+        watchers = list(_watchers.values())
+        _watchers.clear()
+    for watcher in watchers:
+        watcher.stop()
@@ -0,0 +1,114 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import threading
+
+from cachetools import TTLCache
+from cryptography.fernet import Fernet
+
+from container_service_extension.server_constants import \
+    DEFAULT_KUBECONFIG_CACHE_TTL_SECONDS
+from container_service_extension.server_constants import \
+    KUBECONFIG_CACHE_MAX_SIZE
+import container_service_extension.utils as utils
+
+
+# created on first use since its ttl comes from the server config
+_KUBECONFIG_CACHE = None
+_KUBECONFIG_CACHE_LOCK = threading.Lock()
+
+
+class KubeconfigCache(object):
+    """Thread safe LRU cache of cluster kubeconfigs with time based expiry.
+
+    Kubeconfigs hold cluster admin credentials, so they are kept encrypted
+    with a key that is generated for each cache and never leaves the
+    process.
+    """
+
+    def __init__(self, maxsize, ttl):
+        """Initialize KubeconfigCache object.
+
+        :param int maxsize: max number of kubeconfigs to keep, least recently
+            used kubeconfigs are evicted first.
+        :param int ttl: time in seconds for which a kubeconfig is cached.
+        """
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._fernet = Fernet(Fernet.generate_key())
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cluster_id):
+        """Get the cached kubeconfig of a cluster.
+
+        :param str cluster_id:
+
+        :return: kubeconfig contents, or None if there is no valid entry.
+
+        :rtype: str
+        """
+        with self._lock:
+            token = self._cache.get(cluster_id)
+            if token is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._fernet.decrypt(token).decode()
+
+    def put(self, cluster_id, kubeconfig):
+        token = self._fernet.encrypt(kubeconfig.encode())
+        with self._lock:
+            self._cache[cluster_id] = token
+
+    def invalidate(self, cluster_id=None):
+        """Remove the kubeconfig of a cluster, or of all clusters."""
+        with self._lock:
+            if cluster_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(cluster_id, None)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def get_kubeconfig_cache():
+    """Get the server wide kubeconfig cache.
+
+    :return: the kubeconfig cache, or None if it is disabled by a
+        'kubeconfig_cache_ttl' of 0 in the server config.
+
+    :rtype: KubeconfigCache
+    """
+    global _KUBECONFIG_CACHE
+    with _KUBECONFIG_CACHE_LOCK:
+        if _KUBECONFIG_CACHE is None:
+            ttl = utils.get_server_runtime_config()['service'].get(
+                'kubeconfig_cache_ttl', DEFAULT_KUBECONFIG_CACHE_TTL_SECONDS)
+            if ttl <= 0:
+                return None
+            _KUBECONFIG_CACHE = KubeconfigCache(
+                maxsize=KUBECONFIG_CACHE_MAX_SIZE, ttl=ttl)
+        return _KUBECONFIG_CACHE
+
+
+def invalidate_kubeconfig_cache(cluster_id=None):
+    """Drop the cached kubeconfig of a cluster, or of all clusters.
+
+    Should be called when the kubeconfig of a cluster may have changed, e.g.
+    when the cluster is upgraded or deleted.
+
+    :param str cluster_id: id of the cluster. If None, kubeconfigs of all
+        clusters are dropped.
+    """
+    with _KUBECONFIG_CACHE_LOCK:
+        kubeconfig_cache = _KUBECONFIG_CACHE
+    if kubeconfig_cache is not None:
+        kubeconfig_cache.invalidate(cluster_id)
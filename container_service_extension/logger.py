@@ -5,8 +5,11 @@
 from collections import namedtuple
 import datetime
 import logging
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
+import queue
 
 from container_service_extension.security import RedactingFilter
 
@@ -114,6 +117,38 @@ SERVER_CLOUDAPI_WIRE_LOGGER = logging.getLogger(SERVER_CLOUDAPI_WIRE_LOGGER_NAME
 # NullLogger doesn't perform logging.
 NULL_LOGGER = logging.getLogger('container_service_extension.null-logger')
 
+# loggers whose file handlers are moved to a background thread by
+# configure_async_server_loggers()
+_ASYNC_SERVER_LOGGERS = [SERVER_LOGGER, SERVER_NSXT_WIRE_LOGGER,
+                         SERVER_PKS_WIRE_LOGGER, SERVER_CLOUDAPI_WIRE_LOGGER]
+# logger -> (queue listener, original handlers)
+_QUEUE_LISTENERS = {}
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the queue listener.
+
+    The stock QueueHandler merges args into the message before enqueueing
+    the record. The queue is in process, hence the record is enqueued as is
+    and the message is built on the listener thread, only if a handler
+    accepts the record.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _RedactingQueueListener(QueueListener):
+    """Queue listener that redacts records before handing them off."""
+
+    def __init__(self, log_queue, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self._redacting_filter = RedactingFilter()
+
+    def prepare(self, record):
+        self._redacting_filter.filter(record)
+        return record
+
 
 @run_once
 def setup_log_file_directory():
@@ -166,6 +201,44 @@ def configure_all_file_loggers():
         logger_config.logger.addHandler(file_handler)
 
 
+def configure_async_server_loggers():
+    """Move redaction, formatting and file i/o of server logs off thread.
+
+    The file handlers and redacting filter of the server loggers are replaced
+    by a queue handler. Records are written to the original handlers by a
+    queue listener running in a background thread, so that logging doesn't
+    block the threads processing requests.
+    """
+    for server_logger in _ASYNC_SERVER_LOGGERS:
+        if server_logger in _QUEUE_LISTENERS:
+            continue
+        handlers = list(server_logger.handlers)
+        for handler in handlers:
+            server_logger.removeHandler(handler)
+        for log_filter in list(server_logger.filters):
+            if isinstance(log_filter, RedactingFilter):
+                server_logger.removeFilter(log_filter)
+        log_queue = queue.Queue()
+        listener = _RedactingQueueListener(log_queue, *handlers)
+        listener.start()
+        server_logger.addHandler(_DeferredQueueHandler(log_queue))
+        _QUEUE_LISTENERS[server_logger] = (listener, handlers)
+
+
+def stop_async_server_loggers():
+    """Flush queued server logs and restore synchronous file logging."""
+    for server_logger, (listener, handlers) in list(_QUEUE_LISTENERS.items()):
+        for handler in list(server_logger.handlers):
+            if isinstance(handler, _DeferredQueueHandler):
+                server_logger.removeHandler(handler)
+        server_logger.addFilter(RedactingFilter())
+        for handler in handlers:
+            server_logger.addHandler(handler)
+        # Writes out records that are still in the queue.
+        listener.stop()
+        del _QUEUE_LISTENERS[server_logger]
+
+
 @run_once
 def configure_null_logger():
     """Configure null logger if it is not configured."""
@@ -0,0 +1,243 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Typed queries of vCD records along with their metadata.
+
+vCD returns at most 8 metadata entries per record of a typed query.
+MetadataQuery splits the requested metadata keys across as many sub-queries
+as needed, runs them concurrently and merges their records by id, so callers
+see a single query whatever the number of keys.
+"""
+
+import concurrent.futures
+import queue
+import threading
+
+import pyvcloud.vcd.client as vcd_client
+
+import container_service_extension.pyvcloud_utils as vcd_utils
+
+# max number of metadata entries vCD returns per record of a typed query
+MAX_METADATA_FIELDS_PER_QUERY = 8
+# max number of sub-queries in flight, across all queries
+MAX_CONCURRENT_SUB_QUERIES = 16
+# max number of record ids per sub-query filter, keeps query urls short
+MAX_IDS_PER_QUERY_FILTER = 25
+
+_executor = None
+_executor_lock = threading.Lock()
+# marks the end of the records of a sub-query
+_END_OF_RECORDS = object()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENT_SUB_QUERIES,
+                thread_name_prefix='metadata-query')
+        return _executor
+
+
+def split_metadata_keys(metadata_keys,
+                        max_keys=MAX_METADATA_FIELDS_PER_QUERY):
+    """Split metadata keys into groups small enough for a single query.
+
+    :param list metadata_keys: metadata keys, duplicates are dropped.
+    :param int max_keys: max number of keys per group.
+
+    :return: list of lists of metadata keys, one list per query. Empty if
+        there are no keys.
+
+    :rtype: list
+    """
+    unique_keys = list(dict.fromkeys(metadata_keys))
+    return [unique_keys[i:i + max_keys]
+            for i in range(0, len(unique_keys), max_keys)]
+
+
+def get_record_metadata(record):
+    """Get the metadata entries of a query record.
+
+    :param lxml.objectify.ObjectifiedElement record:
+
+    :return: metadata values as strings, keyed by metadata key.
+
+    :rtype: dict
+    """
+    if not hasattr(record, 'Metadata'):
+        return {}
+    return {str(entry.Key): str(entry.TypedValue.Value)
+            for entry in record.Metadata.MetadataEntry}
+
+
+def get_resource_with_metadata(client, href):
+    """Get a resource along with its metadata, in concurrent requests.
+
+    :param pyvcloud.vcd.client.Client client:
+    :param str href: href of a resource that has metadata, e.g. a vApp.
+
+    :return: the resource, and its metadata values as strings keyed by
+        metadata key.
+
+    :rtype: tuple
+    """
+    metadata_future = _get_executor().submit(
+        vcd_utils.copy_client(client).get_resource, f'{href}/metadata')
+    resource = client.get_resource(href)
+    metadata_resource = metadata_future.result()
+    metadata = {}
+    if hasattr(metadata_resource, 'MetadataEntry'):
+        metadata = {str(entry.Key): str(entry.TypedValue.Value)
+                    for entry in metadata_resource.MetadataEntry}
+    return resource, metadata
+
+
+class MetadataQuery(object):
+    """Typed query of records along with any number of metadata entries."""
+
+    def __init__(self, client, resource_type, metadata_keys, qfilter=None,
+                 sort_asc=None, page_size=None):
+        """Create a query of @resource_type records with their metadata.
+
+        :param pyvcloud.vcd.client.Client client: client of the query,
+            sub-queries run concurrently use copies of it.
+        :param str resource_type: typed query resource type e.g. 'adminVApp'.
+        :param list metadata_keys: keys of the metadata entries to return
+            with each record.
+        :param str qfilter: query filter.
+        :param str sort_asc: attribute to sort the records by, required for
+            consistent pages if the query is paged.
+        :param int page_size: number of records per page.
+        """
+        key_groups = split_metadata_keys(metadata_keys)
+        self._client = client
+        self._resource_type = resource_type
+        self._qfilter = qfilter
+        self._sort_asc = sort_asc
+        self._page_size = page_size
+        self._fields_list = [','.join(f'metadata:{key}' for key in keys)
+                             for keys in key_groups] or [None]
+
+    def execute(self):
+        """Run the query and yield the records as they are received.
+
+        A record is yielded once all sub-queries have returned it. Records
+        missing from some of the sub-queries, e.g. because the entity was
+        created or deleted while the sub-queries ran, are yielded last with
+        the metadata that was found.
+
+        :return: generator of (record, metadata) tuples, where metadata is a
+            dict as returned by get_record_metadata().
+
+        :rtype: generator
+        """
+        if len(self._fields_list) == 1:
+            query = self._get_typed_query(self._client, self._fields_list[0],
+                                          qfilter=self._qfilter,
+                                          sort_asc=self._sort_asc,
+                                          page_size=self._page_size)
+            for record in query.execute():
+                yield record, get_record_metadata(record)
+            return
+
+        records = queue.Queue()
+        executor = _get_executor()
+        # Sub-queries run in executor threads, each with its own client.
+        for fields in self._fields_list:
+            query = self._get_typed_query(vcd_utils.copy_client(self._client),
+                                          fields, qfilter=self._qfilter,
+                                          sort_asc=self._sort_asc,
+                                          page_size=self._page_size)
+            executor.submit(self._produce_records, query, records)
+
+        # record id -> [record, metadata, number of sub-queries returning it]
+        pending = {}
+        running = len(self._fields_list)
+        while running > 0:
+            record = records.get()
+            if record is _END_OF_RECORDS:
+                running -= 1
+                continue
+            if isinstance(record, Exception):
+                raise record
+            entry = pending.get(record.get('id'))
+            if entry is None:
+                entry = pending[record.get('id')] = [record, {}, 0]
+            entry[1].update(get_record_metadata(record))
+            entry[2] += 1
+            if entry[2] == len(self._fields_list):
+                del pending[record.get('id')]
+                yield entry[0], entry[1]
+
+        for record, metadata, _ in pending.values():
+            yield record, metadata
+
+    def execute_page(self, page):
+        """Fetch a single page of the query.
+
+        Only the first sub-query is paged, the metadata of the other
+        sub-queries is fetched for the records of that page by id, so that
+        the page has the same records whatever the number of sub-queries.
+        Records missing from the other sub-queries, e.g. because the entity
+        was deleted meanwhile, are returned with the metadata that was found.
+
+        :param int page: page number, starting at 1.
+
+        :return: list of (record, metadata) tuples of the page as in
+            execute(), and the total number of records across all pages.
+
+        :rtype: tuple
+        """
+        query = self._get_typed_query(self._client, self._fields_list[0],
+                                      qfilter=self._qfilter,
+                                      sort_asc=self._sort_asc,
+                                      page_size=self._page_size)
+        records, total = vcd_utils.execute_typed_query_page(query, page)
+        results = [(r, get_record_metadata(r)) for r in records]
+        if len(self._fields_list) == 1 or not results:
+            return results, total
+
+        metadata_by_id = {record.get('id'): metadata
+                          for record, metadata in results}
+        ids = list(metadata_by_id)
+        futures = []
+        executor = _get_executor()
+        for fields in self._fields_list[1:]:
+            for i in range(0, len(ids), MAX_IDS_PER_QUERY_FILTER):
+                id_filter = ','.join(
+                    f'id=={record_id}'
+                    for record_id in ids[i:i + MAX_IDS_PER_QUERY_FILTER])
+                query = self._get_typed_query(
+                    vcd_utils.copy_client(self._client), fields,
+                    qfilter=id_filter, page_size=MAX_IDS_PER_QUERY_FILTER)
+                futures.append(
+                    executor.submit(lambda q: list(q.execute()), query))
+        for future in futures:
+            for record in future.result():
+                metadata = metadata_by_id.get(record.get('id'))
+                if metadata is not None:
+                    metadata.update(get_record_metadata(record))
+        return results, total
+
+    def _get_typed_query(self, client, fields, qfilter=None, sort_asc=None,
+                         page_size=None):
+        return client.get_typed_query(
+            self._resource_type,
+            query_result_format=vcd_client.QueryResultFormat.ID_RECORDS,
+            page_size=page_size,
+            qfilter=qfilter,
+            sort_asc=sort_asc,
+            fields=fields)
+
+    @staticmethod
+    def _produce_records(query, records):
+        try:
+            for record in query.execute():
+                records.put(record)
+        except Exception as err:
+            records.put(err)
+        finally:
+            records.put(_END_OF_RECORDS)
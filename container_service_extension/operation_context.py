@@ -65,5 +65,9 @@ class OperationContext:
     def sysadmin_cloudapi_client(self):
         return self.user.sysadmin_cloudapi_client
 
+    def invalidate_session(self):
+        """Drop the cached vCD session of the auth token of this operation."""
+        vcd_utils.invalidate_tenant_session(self._auth_token)
+
     def end(self):
         self.user.end()
@@ -73,18 +73,15 @@ def get_ovdc_k8s_provider_metadata(sysadmin_client: vcd_client.Client,
 
 
 def get_all_ovdc_with_metadata():
-    client = None
-    try:
-        client = vcd_utils.get_sys_admin_client()
+    with vcd_utils.pooled_sys_admin_client() as client:
         q = client.get_typed_query(
             vcd_client.ResourceType.ADMIN_ORG_VDC.value,
             query_result_format=vcd_client.QueryResultFormat.RECORDS,
             fields='metadata@SYSTEM:k8s_provider')
-        ovdc_records = q.execute()
+        # query results are fetched lazily, read them while the client is
+        # still borrowed from the pool
+        ovdc_records = list(q.execute())
         return ovdc_records
-    finally:
-        if client is not None:
-            client.logout()
 
 
 def update_ovdc_k8s_provider_metadata(sysadmin_client: vcd_client.Client,
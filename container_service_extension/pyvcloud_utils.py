@@ -2,10 +2,19 @@
 # Copyright (c) 2019 VMware, Inc. All Rights Reserved.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import contextlib
+import copy
 import pathlib
+import threading
+import time
 
+from cachetools import TTLCache
+from lxml import etree
+from lxml import objectify
 import pyvcloud.vcd.client as vcd_client
 from pyvcloud.vcd.exceptions import EntityNotFoundException
+from pyvcloud.vcd.exceptions import TaskTimeoutException
+from pyvcloud.vcd.exceptions import UnauthorizedException
 import pyvcloud.vcd.org as vcd_org
 from pyvcloud.vcd.utils import extract_id
 from pyvcloud.vcd.utils import get_admin_href
@@ -13,21 +22,57 @@ import pyvcloud.vcd.vapp as vcd_vapp
 from pyvcloud.vcd.vdc import VDC
 import requests
 
+from container_service_extension.client_pool import ClientPool
 import container_service_extension.cloudapi.cloudapi_client as cloudApiClient
 from container_service_extension.logger import NULL_LOGGER
 from container_service_extension.logger import SERVER_DEBUG_WIRELOG_FILEPATH
 from container_service_extension.logger import SERVER_LOGGER
+from container_service_extension.server_constants import \
+    DEFAULT_SYSADMIN_CLIENT_POOL_SIZE
+from container_service_extension.server_constants import \
+    OVDC_TO_ORG_CACHE_MAX_SIZE
+from container_service_extension.server_constants import \
+    OVDC_TO_ORG_CACHE_TTL_SECONDS
+from container_service_extension.server_constants import \
+    OVDC_TO_ORG_QUERY_BATCH_SIZE
+from container_service_extension.server_constants import \
+    SYSADMIN_CLIENT_HEALTH_CHECK_INTERVAL_SECONDS
+from container_service_extension.server_constants import \
+    SYSADMIN_CLIENT_MAX_AGE_SECONDS
 from container_service_extension.server_constants import SYSTEM_ORG_NAME
+from container_service_extension.server_constants import \
+    TASK_MONITOR_TIMEOUT_SECONDS
+from container_service_extension.server_constants import \
+    TENANT_SESSION_CACHE_MAX_SIZE
+from container_service_extension.server_constants import \
+    TENANT_SESSION_CACHE_TTL_SECONDS
+import container_service_extension.task_monitor as task_monitor
+from container_service_extension.tenant_session_cache import TenantSession
+from container_service_extension.tenant_session_cache import \
+    TenantSessionCache
 from container_service_extension.utils import get_server_runtime_config
 from container_service_extension.utils import NullPrinter
+from container_service_extension.utils import run_async
 from container_service_extension.utils import str_to_bool
 
 
 # Cache to keep ovdc_id to org_name mapping for vcd cse cluster list
-OVDC_TO_ORG_MAP = {}
+OVDC_TO_ORG_MAP = TTLCache(maxsize=OVDC_TO_ORG_CACHE_MAX_SIZE,
+                           ttl=OVDC_TO_ORG_CACHE_TTL_SECONDS)
+_OVDC_TO_ORG_MAP_LOCK = threading.Lock()
 ORG_ADMIN_RIGHTS = ['General: Administrator Control',
                     'General: Administrator View']
 
+# Pool of sysadmin clients shared by all requests, created on first use
+_SYS_ADMIN_CLIENT_POOL = None
+_SYS_ADMIN_CLIENT_POOL_LOCK = threading.Lock()
+
+# Cache of tenant sessions, so that repeated requests with the same auth
+# token don't need to fetch the vCD session again
+TENANT_SESSION_CACHE = TenantSessionCache(
+    maxsize=TENANT_SESSION_CACHE_MAX_SIZE,
+    ttl=TENANT_SESSION_CACHE_TTL_SECONDS)
+
 
 def raise_error_if_not_sysadmin(client: vcd_client.Client):
     if not client.is_sysadmin():
@@ -51,10 +96,93 @@ def connect_vcd_user_via_token(tenant_auth_token, is_jwt_token):
         log_requests=log_wire,
         log_headers=log_wire,
         log_bodies=log_wire)
+    if not tenant_auth_token:
+        client_tenant.rehydrate_from_token(tenant_auth_token, is_jwt_token)
+        return client_tenant
+
+    tenant_session = TENANT_SESSION_CACHE.get(tenant_auth_token)
+    if tenant_session is not None:
+        _rehydrate_from_tenant_session(client_tenant, tenant_auth_token,
+                                       is_jwt_token, tenant_session)
+        return client_tenant
+
     client_tenant.rehydrate_from_token(tenant_auth_token, is_jwt_token)
+    tenant_session = TenantSession(
+        session_xml=etree.tostring(client_tenant.get_vcloud_session()),
+        vcloud_auth_token=client_tenant.get_xvcloud_authorization_token(),
+        is_sysadmin=client_tenant.is_sysadmin())
+    TENANT_SESSION_CACHE.put(tenant_auth_token, tenant_session)
     return client_tenant
 
 
+def _rehydrate_from_tenant_session(client, tenant_auth_token, is_jwt_token,
+                                   tenant_session):
+    """Restore a client's session state without a round trip to vCD.
+
+    Mirrors pyvcloud's Client.rehydrate_from_token(), except that the vCD
+    session comes from the cache instead of a GET on /session.
+    """
+    session = requests.Session()
+    if is_jwt_token:
+        client._vcloud_access_token = tenant_auth_token
+        session.headers[client._HEADER_AUTHORIZATION_NAME] = \
+            f"Bearer {tenant_auth_token}"
+    else:
+        session.headers[client._HEADER_X_VCLOUD_AUTH_NAME] = tenant_auth_token
+    client._session = session
+    client._vcloud_auth_token = tenant_session.vcloud_auth_token
+    client._vcloud_session = objectify.fromstring(tenant_session.session_xml)
+    client._is_sysadmin = tenant_session.is_sysadmin
+    client._session_endpoints = \
+        vcd_client._get_session_endpoints(client._vcloud_session)
+
+
+def copy_client(client):
+    """Copy a client, for use by another thread.
+
+    pyvcloud clients are not thread safe: all their calls share one
+    requests.Session, and they lazily cache the query list of vCD. The copy
+    is logged in with the same vCD session as @client, without a round trip
+    to vCD, but has its own HTTP session and query list cache. It must not
+    be logged out, that would end the vCD session of @client.
+
+    :param pyvcloud.vcd.client.Client client: logged in client.
+
+    :return: logged in client.
+
+    :rtype: pyvcloud.vcd.client.Client
+    """
+    client_copy = copy.copy(client)
+    session = requests.Session()
+    session.headers.update(client._session.headers)
+    client_copy._session = session
+    client_copy._task_monitor = None
+    if client._query_list_map is not None:
+        client_copy._query_list_map = dict(client._query_list_map)
+    return client_copy
+
+
+def invalidate_tenant_session(tenant_auth_token):
+    """Drop the cached session of a token that vCD no longer accepts."""
+    if tenant_auth_token:
+        TENANT_SESSION_CACHE.invalidate(tenant_auth_token)
+
+
+def is_unauthorized_error(err):
+    """Check if an exception was caused by vCD responding with 401.
+
+    :param Exception err: exception raised while talking to vCD.
+
+    :rtype: bool
+    """
+    if isinstance(err, UnauthorizedException):
+        return True
+    if isinstance(err, requests.exceptions.HTTPError):
+        return err.response is not None and \
+            err.response.status_code == requests.codes.unauthorized
+    return False
+
+
 def get_sys_admin_client():
     server_config = get_server_runtime_config()
     if not server_config['vcd']['verify']:
@@ -82,6 +210,66 @@ def get_sys_admin_client():
     return client
 
 
+def get_sys_admin_client_pool():
+    """Get the server wide pool of logged in sysadmin clients.
+
+    The pool is created on first use. Its size is read from the optional
+    'sysadmin_client_pool_size' key of the 'service' section of the config.
+
+    :return: pool of sysadmin clients.
+
+    :rtype: container_service_extension.client_pool.ClientPool
+    """
+    global _SYS_ADMIN_CLIENT_POOL
+    if _SYS_ADMIN_CLIENT_POOL is None:
+        with _SYS_ADMIN_CLIENT_POOL_LOCK:
+            if _SYS_ADMIN_CLIENT_POOL is None:
+                server_config = get_server_runtime_config()
+                size = server_config['service'].get(
+                    'sysadmin_client_pool_size',
+                    DEFAULT_SYSADMIN_CLIENT_POOL_SIZE)
+                pool = ClientPool(
+                    get_sys_admin_client,
+                    size=size,
+                    max_age=SYSADMIN_CLIENT_MAX_AGE_SECONDS,
+                    health_check_interval=SYSADMIN_CLIENT_HEALTH_CHECK_INTERVAL_SECONDS, # noqa: E501
+                    name='sysadmin client')
+                if size > 0:
+                    run_async(pool.run_keepalive)()
+                _SYS_ADMIN_CLIENT_POOL = pool
+    return _SYS_ADMIN_CLIENT_POOL
+
+
+def close_sys_admin_client_pool():
+    """Log out all pooled sysadmin clients."""
+    global _SYS_ADMIN_CLIENT_POOL
+    with _SYS_ADMIN_CLIENT_POOL_LOCK:
+        if _SYS_ADMIN_CLIENT_POOL is not None:
+            _SYS_ADMIN_CLIENT_POOL.close()
+            _SYS_ADMIN_CLIENT_POOL = None
+
+
+@contextlib.contextmanager
+def pooled_sys_admin_client():
+    """Borrow a sysadmin client from the pool for the duration of a block.
+
+    Usage:
+        with pooled_sys_admin_client() as client:
+            ...
+
+    :return: logged in sysadmin client, which must not be logged out by
+        the caller.
+
+    :rtype: pyvcloud.vcd.client.Client
+    """
+    pool = get_sys_admin_client_pool()
+    client = pool.borrow()
+    try:
+        yield client
+    finally:
+        pool.release(client)
+
+
 def get_org(client, org_name=None):
     """Get the specified or currently logged-in Org object.
 
@@ -162,22 +350,57 @@ def get_org_name_from_ovdc_id(sysadmin_client: vcd_client.Client, vdc_id):
     :return: org_name
 
     :rtype: str
+
+    :raises EntityNotFoundException: if the ovdc doesn't exist.
     """
-    raise_error_if_not_sysadmin(sysadmin_client)
+    org_names = get_org_names_from_ovdc_ids(sysadmin_client, [vdc_id])
+    if vdc_id not in org_names:
+        raise EntityNotFoundException(f"VDC '{vdc_id}' not found")
+    return org_names[vdc_id]
+
 
-    if vdc_id in OVDC_TO_ORG_MAP:
-        return OVDC_TO_ORG_MAP.get(vdc_id)
+def get_org_names_from_ovdc_ids(sysadmin_client: vcd_client.Client, vdc_ids):
+    """Get org_name of each vdc_id using OVDC_TO_ORG_MAP.
 
-    vdc_href = f"{sysadmin_client.get_api_uri()}/vdc/{vdc_id}"
-    vdc_resource = sysadmin_client.get_resource(get_admin_href(vdc_href))
-    vdc_obj = VDC(sysadmin_client, resource=vdc_resource)
-    link = vcd_client.find_link(
-        vdc_obj.get_resource(),
-        vcd_client.RelationType.UP,
-        vcd_client.EntityType.ADMIN_ORG.value)
-    org = vcd_org.Org(sysadmin_client, href=link.href)
-    OVDC_TO_ORG_MAP[vdc_id] = org.get_name()
-    return org.get_name()
+    vdc ids missing from OVDC_TO_ORG_MAP are looked up together, with one
+    adminOrgVdc query per OVDC_TO_ORG_QUERY_BATCH_SIZE ids, and added to
+    OVDC_TO_ORG_MAP.
+
+    :param list vdc_ids: unique ovdc ids, duplicates are allowed.
+
+    :return: org_name keyed by vdc_id. vdc ids of ovdcs that don't exist
+        are left out.
+
+    :rtype: dict
+    """
+    raise_error_if_not_sysadmin(sysadmin_client)
+
+    org_names = {}
+    missing_vdc_ids = []
+    with _OVDC_TO_ORG_MAP_LOCK:
+        for vdc_id in dict.fromkeys(vdc_ids):
+            org_name = OVDC_TO_ORG_MAP.get(vdc_id)
+            if org_name is None:
+                missing_vdc_ids.append(vdc_id)
+            else:
+                org_names[vdc_id] = org_name
+
+    for i in range(0, len(missing_vdc_ids), OVDC_TO_ORG_QUERY_BATCH_SIZE):
+        batch = missing_vdc_ids[i:i + OVDC_TO_ORG_QUERY_BATCH_SIZE]
+        q = sysadmin_client.get_typed_query(
+            vcd_client.ResourceType.ADMIN_ORG_VDC.value,
+            query_result_format=vcd_client.QueryResultFormat.ID_RECORDS,
+            page_size=len(batch),
+            qfilter=','.join(f"id==urn:vcloud:vdc:{vdc_id}"
+                             for vdc_id in batch))
+        for record in q.execute():
+            org_names[extract_id(record.get('id'))] = record.get('orgName')
+
+    with _OVDC_TO_ORG_MAP_LOCK:
+        for vdc_id in missing_vdc_ids:
+            if vdc_id in org_names:
+                OVDC_TO_ORG_MAP[vdc_id] = org_names[vdc_id]
+    return org_names
 
 
 def get_pvdc_id(sysadmin_client: vcd_client.Client, ovdc: VDC):
@@ -214,11 +437,8 @@ def get_pvdc_id_from_pvdc_name(name, vc_name_in_vcd):
 
     :rtype: str
     """
-    # cannot remove this instance of get_sys_admin_client
     # this is used only by PksCache, which is initialized on server start
-    client = None
-    try:
-        client = get_sys_admin_client()
+    with pooled_sys_admin_client() as client:
         query = client.get_typed_query(
             vcd_client.ResourceType.PROVIDER_VDC.value,
             query_result_format=vcd_client.QueryResultFormat.RECORDS,
@@ -228,9 +448,6 @@ def get_pvdc_id_from_pvdc_name(name, vc_name_in_vcd):
             href = pvdc_record.get('href')
             pvdc_id = href.split("/")[-1]
             return pvdc_id
-    finally:
-        if client:
-            client.logout()
 
 
 def upload_ova_to_catalog(client, catalog_name, filepath, update=False,
@@ -418,6 +635,56 @@ def wait_for_catalog_item_to_resolve(client, catalog_name, catalog_item_name,
     client.get_task_monitor().wait_for_success(resource.Tasks.Task[0])
 
 
+def wait_for_tasks(client, tasks, timeout=TASK_MONITOR_TIMEOUT_SECONDS):
+    """Wait for tasks that run concurrently in vCD.
+
+    Tasks are tracked by the server wide task monitor if it is started, and
+    polled with the task monitor of @client otherwise. All tasks are waited
+    on even if some of them fail, so that none of them is still running when
+    this function returns or raises, unless they time out.
+
+    :param pyvcloud.vcd.client.Client client:
+    :param list tasks: task XML resources, as returned by the calls that
+        started the tasks.
+    :param float timeout: max time in seconds to wait for all tasks, None
+        waits without limit.
+
+    :raises VcdException: of the first task in @tasks that failed.
+    :raises TaskTimeoutException: if a task didn't finish in time.
+    """
+    multi_task_monitor = task_monitor.get_task_monitor()
+    if multi_task_monitor is not None:
+        multi_task_monitor.wait_for_tasks(tasks, timeout=timeout)
+        return
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    # wait_for_status() doesn't enforce its own timeout, the deadline is
+    # checked on each poll instead.
+    def check_deadline(task):
+        if deadline is not None and time.monotonic() > deadline:
+            raise TaskTimeoutException(
+                f"Task {task.get('href')} didn't finish in {timeout} "
+                "seconds")
+
+    client_task_monitor = client.get_task_monitor()
+    error = None
+    for task in tasks:
+        try:
+            client_task_monitor.wait_for_status(task,
+                                                callback=check_deadline)
+        except Exception as err:
+            if error is None:
+                error = err
+    if error is not None:
+        raise error
+
+
+def wait_for_task(client, task, timeout=TASK_MONITOR_TIMEOUT_SECONDS):
+    """Wait for a task, see wait_for_tasks()."""
+    wait_for_tasks(client, [task], timeout=timeout)
+
+
 def get_all_vapps_in_ovdc(client, ovdc_id):
     resource_type = vcd_client.ResourceType.VAPP.value
     if client.is_sysadmin():
@@ -438,6 +705,80 @@ def get_all_vapps_in_ovdc(client, ovdc_id):
     return vapps
 
 
+def get_vms_by_name(vapp: vcd_vapp.VApp):
+    """Index the vms of a vApp by name.
+
+    Lookups in the index don't walk the vApp resource again, unlike
+    vapp.get_vm().
+
+    :param pyvcloud.vcd.vapp.VApp vapp:
+
+    :return: vm resources keyed by vm name, in the order of the vApp.
+
+    :rtype: dict
+    """
+    return {vm.get('name'): vm for vm in vapp.get_all_vms()}
+
+
+def get_primary_ip(vm_resource):
+    """Get the primary ip of a vm from its resource.
+
+    Same as vapp.get_primary_ip(), without looking up the vm in the vApp.
+
+    :param lxml.objectify.ObjectifiedElement vm_resource: vm resource, as
+        returned by vapp.get_all_vms().
+
+    :return: ip address of the first connected nic of the vm, or None.
+
+    :rtype: str
+    """
+    connections = vm_resource.xpath(
+        'ovf:VirtualHardwareSection/ovf:Item/rasd:Connection',
+        namespaces=vcd_client.NSMAP)
+    if not connections:
+        return None
+    return connections[0].get(f"{{{vcd_client.NSMAP['vcloud']}}}ipAddress")
+
+
+def get_vm_ips(vapp: vcd_vapp.VApp):
+    """Get the primary ip of every vm of a vApp in a single pass.
+
+    :param pyvcloud.vcd.vapp.VApp vapp:
+
+    :return: primary ip, or None if the vm has no connected nic, keyed by vm
+        name in the order of the vApp.
+
+    :rtype: dict
+    """
+    return {name: get_primary_ip(vm)
+            for name, vm in get_vms_by_name(vapp).items()}
+
+
+def execute_typed_query_page(query, page):
+    """Fetch a single page of a typed query.
+
+    pyvcloud's query.execute() follows the next page links of the query
+    results till the last page, this function only fetches @page.
+
+    :param pyvcloud.vcd.client._TypedQuery query: query created with
+        client.get_typed_query(), with a page size set.
+    :param int page: page number, starting at 1.
+
+    :return: records of the page, and the total number of records across
+        all pages.
+
+    :rtype: tuple
+    """
+    query_href = query._find_query_uri(query._query_result_format)
+    query_uri = query._build_query_uri(query_href, page, query._page_size,
+                                       query._filter, query._include_links,
+                                       fields=query.fields)
+    query_results = query._client.get_resource(query_uri)
+    records = [r for r in query_results.iterchildren()
+               if etree.QName(r.tag).localname != 'Link']
+    return records, int(query_results.get('total', len(records)))
+
+
 def get_cloudapi_client_from_vcd_client(client: vcd_client.Client,
                                         logger_debug=NULL_LOGGER,
                                         logger_wire=NULL_LOGGER):
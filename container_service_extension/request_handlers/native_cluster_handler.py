@@ -3,7 +3,9 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 import container_service_extension.operation_context as ctx
+import container_service_extension.request_handlers.request_utils as req_utils
 from container_service_extension.server_constants import K8S_PROVIDER_KEY
+from container_service_extension.shared_constants import RequestKey
 from container_service_extension.telemetry.constants import CseOperation
 from container_service_extension.telemetry.telemetry_handler import \
     record_user_action_telemetry
@@ -66,7 +68,8 @@ def cluster_info(request_data, op_ctx: ctx.OperationContext):
     """Request handler for cluster info operation.
 
     Required data: cluster_name
-    Optional data and default values: org_name=None, ovdc_name=None
+    Optional data and default values: org_name=None, ovdc_name=None,
+        cluster_id=None, vapp_href=None
 
     (data validation handled in broker)
 
@@ -81,7 +84,8 @@ def cluster_config(request_data, op_ctx: ctx.OperationContext):
     """Request handler for cluster config operation.
 
     Required data: cluster_name
-    Optional data and default values: org_name=None, ovdc_name=None
+    Optional data and default values: org_name=None, ovdc_name=None,
+        cluster_id=None, vapp_href=None
 
     (data validation handled in broker)
 
@@ -120,14 +124,34 @@ def cluster_list(request_data, op_ctx: ctx.OperationContext):
     """Request handler for cluster list operation.
 
     Optional data and default values: org_name=None, ovdc_name=None
+    Optional pagination data: page, pageSize
 
     (data validation handled in broker)
 
-    :return: List
+    :return: List, or Dict with a single page of the list if pagination data
+        is present in the request.
     """
     vcd_broker = VcdBroker(op_ctx)
+    if req_utils.is_paginated_request(request_data):
+        page, page_size = req_utils.get_pagination_params(request_data)
+        data = {
+            **request_data,
+            RequestKey.PAGE: page,
+            RequestKey.PAGE_SIZE: page_size
+        }
+        vcd_clusters_info, result_total = \
+            vcd_broker.list_clusters_page(data=data)
+        return req_utils.construct_paginated_response(
+            values=_filter_cluster_list_properties(vcd_clusters_info),
+            result_total=result_total,
+            page=page,
+            page_size=page_size)
+
     vcd_clusters_info = vcd_broker.list_clusters(data=request_data)
+    return _filter_cluster_list_properties(vcd_clusters_info)
+
 
+def _filter_cluster_list_properties(vcd_clusters_info):
     common_cluster_properties = [
         'name',
         'vdc',
@@ -184,7 +208,8 @@ def node_info(request_data, op_ctx: ctx.OperationContext):
     """Request handler for node info operation.
 
     Required data: cluster_name, node_name
-    Optional data and default values: org_name=None, ovdc_name=None
+    Optional data and default values: org_name=None, ovdc_name=None,
+        cluster_id=None, vapp_href=None
 
     (data validation handled in broker)
 
@@ -2,11 +2,17 @@
 # Copyright (c) 2017 VMware, Inc. All Rights Reserved.
 # SPDX-License-Identifier: BSD-2-Clause
 import functools
+import math
 
 import container_service_extension.exceptions as cse_exception
 from container_service_extension.exceptions import BadRequestError
 from container_service_extension.logger import SERVER_LOGGER as LOGGER
 from container_service_extension.minor_error_codes import MinorErrorCode
+from container_service_extension.shared_constants import \
+    CSE_PAGINATION_DEFAULT_PAGE_SIZE
+from container_service_extension.shared_constants import \
+    CSE_PAGINATION_MAX_PAGE_SIZE
+from container_service_extension.shared_constants import PaginationKey
 from container_service_extension.shared_constants import RequestKey
 
 
@@ -86,6 +92,68 @@ def validate_payload(payload, required_keys):
     return valid
 
 
+def is_paginated_request(request_data):
+    """Check if a list request asked for a single page of results.
+
+    :param dict request_data: request data, including query parameters.
+
+    :rtype: bool
+    """
+    return request_data.get(RequestKey.PAGE) is not None or \
+        request_data.get(RequestKey.PAGE_SIZE) is not None
+
+
+def get_pagination_params(request_data):
+    """Get validated page number and page size of a list request.
+
+    :param dict request_data: request data, including query parameters.
+
+    :return: page number (starting at 1) and page size.
+
+    :rtype: tuple
+
+    :raises BadRequestError: if page or page size is not a positive integer,
+        or if page size is larger than the max page size.
+    """
+    try:
+        page = int(request_data.get(RequestKey.PAGE) or 1)
+        page_size = int(request_data.get(RequestKey.PAGE_SIZE)
+                        or CSE_PAGINATION_DEFAULT_PAGE_SIZE)
+    except ValueError:
+        raise BadRequestError(
+            error_message="Page and page size should be integers.")
+    if page < 1 or page_size < 1:
+        raise BadRequestError(
+            error_message="Page and page size should be greater than 0.")
+    if page_size > CSE_PAGINATION_MAX_PAGE_SIZE:
+        raise BadRequestError(
+            error_message=f"Page size should be at most "
+                          f"{CSE_PAGINATION_MAX_PAGE_SIZE}.")
+    return page, page_size
+
+
+def construct_paginated_response(values, result_total, page, page_size):
+    """Construct the body of a paginated list response.
+
+    The link to the next page is added by request_processor, which knows the
+    request url.
+
+    :param list values: items of the requested page.
+    :param int result_total: total number of items across all pages.
+    :param int page: page number.
+    :param int page_size: max number of items per page.
+
+    :rtype: dict
+    """
+    return {
+        PaginationKey.RESULT_TOTAL: result_total,
+        PaginationKey.PAGE_COUNT: math.ceil(result_total / page_size),
+        PaginationKey.PAGE: page,
+        PaginationKey.PAGE_SIZE: page_size,
+        PaginationKey.VALUES: values
+    }
+
+
 def v35_api_exception_handler(func):
     """Decorate to trap exceptions and process them.
 
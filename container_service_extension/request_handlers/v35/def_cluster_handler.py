@@ -134,9 +134,22 @@ def cluster_upgrade(request_data, op_ctx: ctx.OperationContext):
 def cluster_list(data: dict, op_ctx: ctx.OperationContext):
     """Request handler for cluster list operation.
 
-    :return: List
+    Optional pagination data: page, pageSize
+
+    :return: List, or Dict with a single page of the list if pagination data
+        is present in the request.
     """
     svc = cluster_svc.ClusterService(op_ctx)
+    if request_utils.is_paginated_request(data):
+        page, page_size = request_utils.get_pagination_params(data)
+        def_entities, result_total = svc.list_clusters_page(
+            data.get(RequestKey.V35_QUERY, None), page, page_size)
+        return request_utils.construct_paginated_response(
+            values=[asdict(def_entity) for def_entity in def_entities],
+            result_total=result_total,
+            page=page,
+            page_size=page_size)
+
     return [asdict(def_entity) for def_entity in
             svc.list_clusters(data.get(RequestKey.V35_QUERY, None))]
 
@@ -4,14 +4,17 @@
 
 import base64
 import json
+import logging
 import sys
 from urllib.parse import parse_qsl
+from urllib.parse import urlencode
 
 import container_service_extension.def_.utils as def_utils
 from container_service_extension.exception_handler import handle_exception
 import container_service_extension.exceptions as cse_exception
 from container_service_extension.logger import SERVER_LOGGER as LOGGER
 import container_service_extension.operation_context as ctx
+import container_service_extension.pyvcloud_utils as vcd_utils
 import container_service_extension.request_handlers.native_cluster_handler as native_cluster_handler  # noqa: E501
 import container_service_extension.request_handlers.ovdc_handler as ovdc_handler  # noqa: E501
 import container_service_extension.request_handlers.pks_cluster_handler as pks_cluster_handler  # noqa: E501
@@ -21,6 +24,7 @@ import container_service_extension.request_handlers.v35.def_cluster_handler as v
 from container_service_extension.server_constants import CseOperation
 from container_service_extension.server_constants import PKS_SERVICE_NAME
 from container_service_extension.shared_constants import OperationType
+from container_service_extension.shared_constants import PaginationKey
 from container_service_extension.shared_constants import RequestKey
 from container_service_extension.shared_constants import RequestMethod
 from container_service_extension.shared_constants import RESPONSE_MESSAGE_KEY
@@ -131,7 +135,8 @@ def _is_v35_endpoint(url: str):
 @handle_exception
 def process_request(body):
     from container_service_extension.service import Service
-    LOGGER.debug(f"Incoming request body: {json.dumps(body)}")
+    if LOGGER.isEnabledFor(logging.DEBUG):
+        LOGGER.debug(f"Incoming request body: {json.dumps(body)}")
 
     url_data = _get_url_data(body['method'], body['requestUri'])
     operation = url_data[_OPERATION_KEY]
@@ -159,6 +164,10 @@ def process_request(body):
         if is_v35_request:
             request_data[RequestKey.V35_QUERY] = query_params.get(
                 RequestKey.V35_QUERY, None)
+            request_data[RequestKey.PAGE] = query_params.get(
+                RequestKey.PAGE, None)
+            request_data[RequestKey.PAGE_SIZE] = query_params.get(
+                RequestKey.PAGE_SIZE, None)
         else:
             request_data.update(query_params)
         LOGGER.debug(f"query parameters: {query_params}")
@@ -183,20 +192,48 @@ def process_request(body):
 
     try:
         body_content = OPERATION_TO_HANDLER[operation](data, operation_ctx)
+    except Exception as err:
+        if vcd_utils.is_unauthorized_error(err):
+            operation_ctx.invalidate_session()
+        raise
     finally:
         if not operation_ctx.is_async:
             operation_ctx.end()
 
     if not isinstance(body_content, (list, dict)):
         body_content = {RESPONSE_MESSAGE_KEY: str(body_content)}
+    elif isinstance(body_content, dict) and \
+            PaginationKey.PAGE_COUNT in body_content:
+        _add_next_page_link(body_content, body)
     response = {
         'status_code': operation.ideal_response_code,
         'body': body_content,
     }
-    LOGGER.debug(f"Outgoing response: {str(response)}")
+    if LOGGER.isEnabledFor(logging.DEBUG):
+        LOGGER.debug(f"Outgoing response: {str(response)}")
     return response
 
 
+def _add_next_page_link(page_content, body):
+    """Add the uri of the next page to a paginated response.
+
+    The uri is the request uri with the page query parameter incremented,
+    and is omitted on the last page.
+
+    :param dict page_content: paginated response body.
+    :param dict body: request message.
+    """
+    page = page_content[PaginationKey.PAGE]
+    if page >= page_content[PaginationKey.PAGE_COUNT]:
+        return
+    query_params = dict(parse_qsl(body['queryString'] or ''))
+    query_params[RequestKey.PAGE.value] = page + 1
+    query_params[RequestKey.PAGE_SIZE.value] = \
+        page_content[PaginationKey.PAGE_SIZE]
+    page_content[PaginationKey.NEXT_PAGE_URI] = \
+        f"{body['requestUri']}?{urlencode(query_params)}"
+
+
 def _get_v35_cluster_url_data(method: str, url: str):
     """Parse url and http method to get v35 cluster specific data.
 
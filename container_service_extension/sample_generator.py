@@ -104,8 +104,21 @@ SAMPLE_VCS_CONFIG = {
 SAMPLE_SERVICE_CONFIG = {
     'service': {
         'listeners': 10,
+        'processors': 0,
+        'late_ack': False,
+        'late_ack_mutating_requests': False,
+        'engine': 'threads',
+        'sysadmin_client_pool_size': 4,
+        'rights_cache_ttl': 300,
+        'cluster_inventory_refresh_interval': 0,
+        'cluster_inventory_max_staleness': 120,
+        'kubeconfig_cache_ttl': 300,
+        'max_guest_ops_per_vcenter': 8,
+        'upgrade_max_unavailable': '20%',
         'enforce_authorization': False,
         'log_wire': False,
+        'debug_logging': True,
+        'async_logging': False,
         'telemetry': {
             'enable': True
         }
@@ -4,6 +4,8 @@
 
 import logging
 import re
+import sys
+import timeit
 
 
 class RedactingFilter(logging.Filter):
@@ -13,6 +15,9 @@ class RedactingFilter(logging.Filter):
     value will be redacted. The value are expected to be strings. If they are
     dictionaries or iterables, resulting redaction will be partial. Normally
     the value for a sensitive key will be a plain string.
+
+    Strings that don't contain any of the sensitive keys are returned as is,
+    and objects are copied only if something in them had to be redacted.
     """
 
     _SENSITIVE_KEYS = ['authorization',
@@ -22,37 +27,45 @@ class RedactingFilter(logging.Filter):
                        'secret',
                        'password']
 
+    # Sensitive keys that don't contain another sensitive key, finding one
+    # of these is enough to tell if a string contains any sensitive key.
+    _SENSITIVE_SUBSTRINGS = ('authorization',
+                             'x-vmware-vcloud-access-token',
+                             'username',
+                             'secret',
+                             'password')
+
     _REDACTED_MSG = r"[REDACTED]"
 
-    def __init__(self):
-        """."""
-        super(RedactingFilter, self).__init__()
-
-        pattern_key = r""
-        # concatenate all sensitive keys with | symbol
-        for key in self._SENSITIVE_KEYS:
-            pattern_key += key + r"|"
-        # remove the last | symbol
-        pattern_key = pattern_key[:-1]
-
-        # The following pattern will match key-value pairs as follows
-        # key: value
-        # key: 'value'
-        # 'key': value
-        # 'key': 'value'
-        # where key is one of the keys defined in the list of sensitive keys
-        # and value will be accessible as group 1
-        # Regex explanation :
-        #   1. Look for a match with one of the keys
-        #   2. Look for 0 or 1 instance of '
-        #   3. Look for a colon
-        #   4. Look for 1 or more instances of space
-        #   5. Look for 0 or more instances of [ or { <-- looking for starting
-        #      token for a dict or list
-        #   6. Look for 0 or 1 instance of '
-        #   7. Put everything that is not ', space or } in a group,
-        #      this group must be atleast of length 1.
-        self._pattern = r"((" + pattern_key + r")'?:\s+[{\[]*'?)([^',}]+)"
+    # The following pattern will match key-value pairs as follows
+    # key: value
+    # key: 'value'
+    # 'key': value
+    # 'key': 'value'
+    # where key is one of the keys defined in the list of sensitive keys
+    # and value will be accessible as group 3
+    # Regex explanation :
+    #   1. Look for a match with one of the keys
+    #   2. Look for 0 or 1 instance of '
+    #   3. Look for a colon
+    #   4. Look for 1 or more instances of space
+    #   5. Look for 0 or more instances of [ or { <-- looking for starting
+    #      token for a dict or list
+    #   6. Look for 0 or 1 instance of '
+    #   7. Put everything that is not ', space or } in a group,
+    #      this group must be atleast of length 1.
+    _PATTERN_STR = r"((" \
+        + r"|".join(re.escape(key) for key in _SENSITIVE_KEYS) \
+        + r")'?:\s+[{\[]*'?)([^',}]+)"
+    # Case insensitive matching is an order of magnitude slower, hence the
+    # pattern is matched against the lowercased string when possible.
+    _PATTERN = re.compile(_PATTERN_STR)
+    _PATTERN_IGNORECASE = re.compile(_PATTERN_STR, flags=re.IGNORECASE)
+
+    _REPLACEMENT = r"\1" + _REDACTED_MSG
+
+    # Objects nested deeper than this are redacted as strings.
+    _MAX_DEPTH = 32
 
     def filter(self, record):
         """Overridden filter method to redact log records.
@@ -68,50 +81,87 @@ class RedactingFilter(logging.Filter):
         :rtype: boolean
         """
         record.msg = self.redact(record.msg)
-        if len(record.args) != 0:
+        if record.args:
             record.args = self.redact(record.args)
         return True
 
     def redact(self, obj):
         """Redact sensitive data in an object.
 
-        The redaction algorithm will preserve dictionary structure. Iterables
-        like list etc. will be converted to n-tuple. Everything else will be
+        The redaction algorithm will preserve dictionary structure, lists and
+        tuples. Any other object that contains sensitive data will be
         converted to string.
 
         :param object obj: the object which contains sensitive data to be
             redacted.
 
-        :return: the redacted version of the object.
+        :return: the redacted version of the object, or the object itself if
+            it doesn't contain sensitive data.
 
         :rtype: object
         """
-        if obj is None:
+        return self._redact(obj, 0)
+
+    def _redact(self, obj, depth):
+        if obj is None or isinstance(obj, (bool, int, float)):
             return obj
 
-        is_iterable = True
-        try:
-            iter(theElement)
-        except (NameError, TypeError):
-            is_iterable = False
-
-        if isinstance(obj, dict):
-            result = {}
-            for k in obj.keys():
-                if str(k).lower() in self._SENSITIVE_KEYS:
-                    result[k] = self._REDACTED_MSG
-                else:
-                    result[k] = self.redact(obj[k])
-            return result
-        elif is_iterable:
-            return tuple(self.redact(item) for item in obj)
-        else:
-            msg_str = str(obj)
-            redacted_msg = re.sub(pattern=self._pattern,
-                                  string=msg_str,
-                                  repl=r"\1" + self._REDACTED_MSG,
-                                  flags=re.IGNORECASE)
-            return redacted_msg
+        if isinstance(obj, str):
+            return self._redact_str(obj)
+
+        if depth < self._MAX_DEPTH and isinstance(obj, (dict, list, tuple)):
+            if not self._has_sensitive_key(str(obj).lower()):
+                # Skips walking sub trees that don't contain secrets.
+                return obj
+            if isinstance(obj, dict):
+                return self._redact_dict(obj, depth + 1)
+            return self._redact_sequence(obj, depth + 1)
+
+        msg_str = str(obj)
+        redacted_msg = self._redact_str(msg_str)
+        if redacted_msg is msg_str:
+            return obj
+        return redacted_msg
+
+    def _has_sensitive_key(self, lowered):
+        return any(key in lowered for key in self._SENSITIVE_SUBSTRINGS)
+
+    def _redact_str(self, msg_str):
+        lowered = msg_str.lower()
+        if not self._has_sensitive_key(lowered):
+            return msg_str
+        if len(lowered) != len(msg_str):
+            # Lowercasing some non ascii characters changes the offsets.
+            return self._PATTERN_IGNORECASE.sub(self._REPLACEMENT, msg_str)
+        parts = []
+        pos = 0
+        for match in self._PATTERN.finditer(lowered):
+            parts.append(msg_str[pos:match.start(3)])
+            parts.append(self._REDACTED_MSG)
+            pos = match.end(3)
+        if pos == 0:
+            return msg_str
+        parts.append(msg_str[pos:])
+        return ''.join(parts)
+
+    def _redact_dict(self, obj, depth):
+        result = None
+        for k, v in obj.items():
+            if str(k).lower() in self._SENSITIVE_KEYS:
+                redacted_v = self._REDACTED_MSG
+            else:
+                redacted_v = self._redact(v, depth)
+            if redacted_v is not v and result is None:
+                result = dict(obj)
+            if result is not None:
+                result[k] = redacted_v
+        return obj if result is None else result
+
+    def _redact_sequence(self, obj, depth):
+        items = [self._redact(item, depth) for item in obj]
+        if all(item is orig for item, orig in zip(items, obj)):
+            return obj
+        return tuple(items) if isinstance(obj, tuple) else items
 
 
 def _test_redaction_filter():
@@ -212,5 +262,53 @@ def _test_redaction_filter():
     logger.debug(msg)
 
 
+def _benchmark_redaction_filter(number=2000):
+    """Time redaction of typical and large log records.
+
+    Run with: python -m container_service_extension.security --benchmark
+    """
+    redacting_filter = RedactingFilter()
+    entity = {
+        'entityType': 'urn:vcloud:type:cse:nativeCluster:1.0.0',
+        'name': 'mycluster',
+        'entity': {
+            'spec': {
+                'workers': {'count': 10, 'storage_profile': '*'},
+                'control_plane': {'count': 1, 'storage_profile': '*'},
+                'settings': {'network': 'ovdc-net', 'ssh_key': 'ssh-rsa A'}
+            },
+            'status': {
+                'nodes': {
+                    'workers': [{'name': f"node-{i}", 'ip': f"10.0.0.{i}"}
+                                for i in range(100)]
+                }
+            }
+        }
+    }
+    entity_with_secret = dict(entity, password='super secret password')
+    cases = [
+        ('short message', "Cluster mycluster created", ()),
+        ('large payload', f"Response body : {entity}", ()),
+        ('large payload with secret',
+         f"Response body : {entity_with_secret}", ()),
+        ('dict args', "Response body : %s", (entity,)),
+        ('dict args with secret', "Response body : %s", (entity_with_secret,))
+    ]
+    for name, msg, args in cases:
+        record = logging.LogRecord('benchmark', logging.DEBUG, __file__, 0,
+                                   msg, args, None)
+
+        def redact_record():
+            record.msg = msg
+            record.args = args
+            redacting_filter.filter(record)
+
+        elapsed = timeit.timeit(redact_record, number=number)
+        print(f"{name:<28}{elapsed / number * 10**6:10.2f} us/record")
+
+
 if __name__ == "__main__":
-    _test_redaction_filter()
+    if '--benchmark' in sys.argv:
+        _benchmark_redaction_filter()
+    else:
+        _test_redaction_filter()
@@ -1002,31 +1002,36 @@ def convert_cluster(ctx, config_file_path, skip_config_decryption,
                 except Exception as err:
                     console_message_printer.error(str(err))
 
-                for href in vm_hrefs_for_password_update:
-                    vm = VM(client=client, href=href)
+                # Each step is started on all vms before waiting, so that
+                # the vms are processed concurrently in vCD.
+                vms = [VM(client=client, href=href)
+                       for href in vm_hrefs_for_password_update]
+                tasks = []
+                for vm in vms:
                     msg = f"Processing vm {vm.get_resource().get('name')}'." \
                           "\nUpdating vm admin password"
                     SERVER_CLI_LOGGER.debug(msg)
                     console_message_printer.info(msg)
-                    task = vm.update_guest_customization_section(
+                    tasks.append(vm.update_guest_customization_section(
                         enabled=True,
                         admin_password_enabled=True,
                         admin_password_auto=not admin_password,
                         admin_password=admin_password,
-                    )
-                    client.get_task_monitor().wait_for_success(task)
-                    msg = "Successfully updated vm"
-                    SERVER_CLI_LOGGER.debug(msg)
-                    console_message_printer.general(msg)
+                    ))
+                vcd_utils.wait_for_tasks(client, tasks)
+                msg = "Successfully updated vms"
+                SERVER_CLI_LOGGER.debug(msg)
+                console_message_printer.general(msg)
 
-                    msg = "Deploying vm."
-                    SERVER_CLI_LOGGER.debug(msg)
-                    console_message_printer.info(msg)
-                    task = vm.power_on_and_force_recustomization()
-                    client.get_task_monitor().wait_for_success(task)
-                    msg = "Successfully deployed vm"
-                    SERVER_CLI_LOGGER.debug(msg)
-                    console_message_printer.general(msg)
+                msg = "Deploying vms."
+                SERVER_CLI_LOGGER.debug(msg)
+                console_message_printer.info(msg)
+                tasks = [vm.power_on_and_force_recustomization()
+                         for vm in vms]
+                vcd_utils.wait_for_tasks(client, tasks)
+                msg = "Successfully deployed vms"
+                SERVER_CLI_LOGGER.debug(msg)
+                console_message_printer.general(msg)
 
                 msg = "Deploying cluster"
                 SERVER_CLI_LOGGER.debug(msg)
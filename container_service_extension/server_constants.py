@@ -55,6 +55,77 @@ CSE_GLOBAL_PVDC_COMPUTE_POLICY_DESCRIPTION = 'global PVDC compute policy for' \
                                              'cse'
 CLUSTER_PLACEMENT_POLICIES = ['native', 'tkg_plus']
 
+# Sysadmin client pool
+DEFAULT_SYSADMIN_CLIENT_POOL_SIZE = 4
+# vCD sessions expire after 30 minutes of inactivity by default, idle clients
+# are checked well before that, which also keeps their sessions alive.
+SYSADMIN_CLIENT_HEALTH_CHECK_INTERVAL_SECONDS = 300
+# Clients are replaced before vCD's maximum session duration is reached.
+SYSADMIN_CLIENT_MAX_AGE_SECONDS = 3600
+
+# Guest operations (script execution etc.) in cluster nodes
+DEFAULT_MAX_GUEST_OPS_PER_VCENTER = 8
+# Max number of threads running guest operations for a single cluster call,
+# across all vCenters of the cluster
+MAX_GUEST_OP_THREADS_PER_CALL = 32
+
+# Guest readiness of VMs, watched through vCenter property collector updates
+GUEST_READINESS_WAIT_SECONDS = 1
+# A vCenter whose watcher failed is polled till the watcher is retried.
+GUEST_READINESS_WATCHER_RETRY_SECONDS = 300
+# A watcher whose update loop is silent for that long is considered hung.
+GUEST_READINESS_WATCHER_MAX_SILENCE_SECONDS = 30
+GUEST_READINESS_POLL_MIN_SECONDS = 0.5
+GUEST_READINESS_POLL_MAX_SECONDS = 8
+# Retries of the first script in a VM whose guest operations just got ready
+GUEST_EXEC_RETRY_MIN_SECONDS = 0.5
+GUEST_EXEC_RETRY_MAX_SECONDS = 4
+
+# Prefix of the per node status lines printed by kubectl scripts run in a
+# master node for many nodes, e.g. to drain them
+KUBECTL_NODE_STATUS_PREFIX = 'CSE_NODE_STATUS'
+
+# Rolling upgrades of worker nodes, as a number or a percentage of workers
+DEFAULT_UPGRADE_MAX_UNAVAILABLE = '20%'
+
+# vCenter session pools, one per vCenter
+# vCenter sessions expire after 30 minutes of inactivity by default.
+VCENTER_SESSION_HEALTH_CHECK_INTERVAL_SECONDS = 300
+VCENTER_SESSION_MAX_AGE_SECONDS = 3600
+
+# Tenant session cache
+TENANT_SESSION_CACHE_MAX_SIZE = 1024
+# Kept short, since a token might be logged out without CSE knowing about it.
+TENANT_SESSION_CACHE_TTL_SECONDS = 120
+
+# Role rights cache
+ROLE_RIGHTS_CACHE_MAX_SIZE = 1024
+DEFAULT_ROLE_RIGHTS_CACHE_TTL_SECONDS = 300
+
+# Cache of cluster kubeconfigs, used by cluster config
+KUBECONFIG_CACHE_MAX_SIZE = 1024
+DEFAULT_KUBECONFIG_CACHE_TTL_SECONDS = 300
+
+# Cache of the org name of each org vdc, used by cluster list
+OVDC_TO_ORG_CACHE_MAX_SIZE = 4096
+# Entries expire so that renamed orgs are eventually picked up.
+OVDC_TO_ORG_CACHE_TTL_SECONDS = 600
+# Max number of org vdc ids looked up per query, keeps query urls short
+OVDC_TO_ORG_QUERY_BATCH_SIZE = 25
+
+# Index of the vApp href of each cluster id, used by cluster info/config
+CLUSTER_ID_INDEX_MAX_SIZE = 10000
+
+# Server wide monitor of vCD tasks, polling all tracked tasks at once
+# The poll interval doubles from min to max while no task finishes.
+TASK_MONITOR_MIN_POLL_INTERVAL_SECONDS = 1
+TASK_MONITOR_MAX_POLL_INTERVAL_SECONDS = 8
+# Max number of tasks looked up per query, keeps query urls short
+TASK_MONITOR_QUERY_BATCH_SIZE = 25
+# Default max time a request waits for its vCD tasks, same as pyvcloud's
+# default. vApp instantiation and VM addition wait without limit.
+TASK_MONITOR_TIMEOUT_SECONDS = 600
+
 
 @unique
 class NodeType(str, Enum):
@@ -63,6 +134,16 @@ class NodeType(str, Enum):
     NFS = 'nfsd'
 
 
+@unique
+class ConsumerEngine(str, Enum):
+    """Types of AMQP consumer engines that CSE server can run."""
+
+    # one thread and one AMQP connection per listener
+    THREADS = 'threads'
+    # one asyncio event loop and one AMQP connection, one channel per listener
+    ASYNCIO = 'asyncio'
+
+
 @unique
 class K8sProvider(str, Enum):
     """Types of Kubernetes providers.
@@ -4,6 +4,7 @@
 
 from enum import Enum
 from enum import unique
+import logging
 import signal
 import sys
 import threading
@@ -18,6 +19,8 @@ from pyvcloud.vcd.client import Client
 from pyvcloud.vcd.exceptions import EntityNotFoundException
 from pyvcloud.vcd.exceptions import OperationNotSupportedException
 
+from container_service_extension.async_consumer import AsyncMessageConsumer
+import container_service_extension.cluster_inventory as cluster_inventory
 import container_service_extension.compute_policy_manager \
     as compute_policy_manager
 from container_service_extension.config_validator import get_validated_config
@@ -28,15 +31,20 @@ import container_service_extension.def_.schema_service as def_schema_svc
 import container_service_extension.def_.utils as def_utils
 from container_service_extension.def_.utils import raise_error_if_def_not_supported  # noqa: E501
 import container_service_extension.exceptions as cse_exception
+from container_service_extension.guest_readiness import \
+    stop_guest_readiness_watchers
+from container_service_extension.kubeconfig_cache import get_kubeconfig_cache
 import container_service_extension.local_template_manager as ltm
 import container_service_extension.logger as logger
 from container_service_extension.pks_cache import PksCache
 import container_service_extension.pyvcloud_utils as vcd_utils
 import container_service_extension.server_constants as server_constants
+from container_service_extension.server_constants import ConsumerEngine
 from container_service_extension.server_constants import LocalTemplateKey
 from container_service_extension.server_constants import SYSTEM_ORG_NAME
 from container_service_extension.shared_constants import CSE_SERVER_API_VERSION
 from container_service_extension.shared_constants import ServerAction
+import container_service_extension.task_monitor as task_monitor
 from container_service_extension.telemetry.constants import CseOperation
 from container_service_extension.telemetry.constants import PayloadKey
 from container_service_extension.telemetry.telemetry_handler \
@@ -45,6 +53,8 @@ from container_service_extension.telemetry.telemetry_handler import \
     record_user_action_details
 from container_service_extension.template_rule import TemplateRule
 import container_service_extension.utils as utils
+import container_service_extension.vcdbroker as vcdbroker
+import container_service_extension.vsphere_utils as vs_utils
 from container_service_extension.vsphere_utils import populate_vsphere_list
 
 
@@ -170,6 +180,19 @@ class Service(object, metaclass=Singleton):
             result['requests_in_progress'] = self.active_requests_count()
             result['config_file'] = self.config_file
             result['status'] = self.get_status()
+            result['tenant_session_cache'] = \
+                vcd_utils.TENANT_SESSION_CACHE.get_stats()
+            inventory = cluster_inventory.get_cluster_inventory()
+            if inventory is not None:
+                result['cluster_inventory'] = inventory.get_stats()
+            kubeconfig_cache = get_kubeconfig_cache()
+            if kubeconfig_cache is not None:
+                result['kubeconfig_cache'] = kubeconfig_cache.get_stats()
+            result['vcenter_sessions'] = \
+                vs_utils.get_vsphere_pool_stats()
+            multi_task_monitor = task_monitor.get_task_monitor()
+            if multi_task_monitor is not None:
+                result['task_monitor'] = multi_task_monitor.get_stats()
         else:
             del result['python']
         return result
@@ -233,6 +256,11 @@ class Service(object, metaclass=Singleton):
             logger_debug=logger.SERVER_LOGGER,
             msg_update_callback=msg_update_callback)
 
+        if not self.config['service'].get('debug_logging', True):
+            logger.SERVER_LOGGER.setLevel(logging.INFO)
+        if self.config['service'].get('async_logging', False):
+            logger.configure_async_server_loggers()
+
         sysadmin_client = None
         try:
             sysadmin_client = vcd_utils.get_sys_admin_client()
@@ -286,28 +314,70 @@ class Service(object, metaclass=Singleton):
                 orgs=pks_config.get('orgs', []),
                 nsxt_servers=pks_config.get('nsxt_servers', []))
 
+        task_monitor.start_task_monitor(
+            vcd_utils.pooled_sys_admin_client,
+            min_poll_interval=server_constants.TASK_MONITOR_MIN_POLL_INTERVAL_SECONDS, # noqa: E501
+            max_poll_interval=server_constants.TASK_MONITOR_MAX_POLL_INTERVAL_SECONDS) # noqa: E501
+
+        refresh_interval = self.config['service'].get(
+            'cluster_inventory_refresh_interval', 0)
+        if refresh_interval > 0:
+            cluster_inventory.start_cluster_inventory(
+                vcdbroker.get_cluster_inventory_entries,
+                vcd_utils.pooled_sys_admin_client,
+                refresh_interval=refresh_interval,
+                max_staleness=self.config['service'].get(
+                    'cluster_inventory_max_staleness', 2 * refresh_interval))
+
         amqp = self.config['amqp']
         num_consumers = self.config['service']['listeners']
-        for n in range(num_consumers):
-            try:
-                c = MessageConsumer(
-                    amqp['host'], amqp['port'], amqp['ssl'], amqp['vhost'],
-                    amqp['username'], amqp['password'], amqp['exchange'],
-                    amqp['routing_key'])
-                name = 'MessageConsumer-%s' % n
-                t = Thread(name=name, target=consumer_thread, args=(c, ))
-                t.daemon = True
-                t.start()
-                msg = f"Started thread '{name} ({t.ident})'"
-                msg_update_callback.general(msg)
-                logger.SERVER_LOGGER.info(msg)
-                self.threads.append(t)
-                self.consumers.append(c)
-                time.sleep(0.25)
-            except KeyboardInterrupt:
-                break
-            except Exception:
-                logger.SERVER_LOGGER.error(traceback.format_exc())
+        num_processors = self.config['service'].get('processors', 0)
+        late_ack = self.config['service'].get('late_ack', False)
+        late_ack_mutating_requests = self.config['service'].get(
+            'late_ack_mutating_requests', False)
+        engine = self.config['service'].get('engine', ConsumerEngine.THREADS)
+        if engine == ConsumerEngine.ASYNCIO:
+            # A single consumer thread serves all listeners as channels of
+            # one AMQP connection.
+            c = AsyncMessageConsumer(
+                amqp['host'], amqp['port'], amqp['ssl'], amqp['vhost'],
+                amqp['username'], amqp['password'], amqp['exchange'],
+                amqp['routing_key'], num_channels=num_consumers,
+                num_processors=num_processors, late_ack=late_ack,
+                late_ack_mutating_requests=late_ack_mutating_requests)
+            name = 'AsyncMessageConsumer'
+            t = Thread(name=name, target=consumer_thread, args=(c, ))
+            t.daemon = True
+            t.start()
+            msg = f"Started thread '{name} ({t.ident})' with " \
+                  f"{num_consumers} channels"
+            msg_update_callback.general(msg)
+            logger.SERVER_LOGGER.info(msg)
+            self.threads.append(t)
+            self.consumers.append(c)
+        else:
+            for n in range(num_consumers):
+                try:
+                    c = MessageConsumer(
+                        amqp['host'], amqp['port'], amqp['ssl'],
+                        amqp['vhost'], amqp['username'], amqp['password'],
+                        amqp['exchange'], amqp['routing_key'],
+                        num_processors=num_processors, late_ack=late_ack,
+                        late_ack_mutating_requests=late_ack_mutating_requests)
+                    name = 'MessageConsumer-%s' % n
+                    t = Thread(name=name, target=consumer_thread, args=(c, ))
+                    t.daemon = True
+                    t.start()
+                    msg = f"Started thread '{name} ({t.ident})'"
+                    msg_update_callback.general(msg)
+                    logger.SERVER_LOGGER.info(msg)
+                    self.threads.append(t)
+                    self.consumers.append(c)
+                    time.sleep(0.25)
+                except KeyboardInterrupt:
+                    break
+                except Exception:
+                    logger.SERVER_LOGGER.error(traceback.format_exc())
 
         logger.SERVER_LOGGER.info(f"Number of threads started: {len(self.threads)}")  # noqa: E501
 
@@ -354,9 +424,15 @@ class Service(object, metaclass=Singleton):
                 c.stop()
             except Exception:
                 logger.SERVER_LOGGER.error(traceback.format_exc())
+        cluster_inventory.stop_cluster_inventory()
+        task_monitor.stop_task_monitor()
+        vcd_utils.close_sys_admin_client_pool()
+        stop_guest_readiness_watchers()
+        vs_utils.close_vsphere_pools()
 
         self._state = ServerState.STOPPED
         logger.SERVER_LOGGER.info("Done")
+        logger.stop_async_server_loggers()
 
     def _load_def_schema(self, msg_update_callback=utils.NullPrinter()):
         """Load cluster interface and cluster entity type to global context.
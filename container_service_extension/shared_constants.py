@@ -15,6 +15,11 @@ UNKNOWN_ERROR_MESSAGE = "Unknown error. Please contact your System " \
 RESPONSE_MESSAGE_KEY = "message"
 CSE_SERVER_API_VERSION = 'cse_server_api_version'
 
+# Paginated list responses
+CSE_PAGINATION_DEFAULT_PAGE_SIZE = 25
+# same as the max page size of vCD query service
+CSE_PAGINATION_MAX_PAGE_SIZE = 128
+
 
 @unique
 class OperationType(str, Enum):
@@ -65,12 +70,15 @@ class RequestKey(str, Enum):
     # common/multiple request keys
     ORG_NAME = 'org_name'
     OVDC_NAME = 'ovdc_name'
+    PAGE = 'page'
+    PAGE_SIZE = 'pageSize'
 
     # keys related to cluster requests
     V35_SPEC = 'spec_body'
     V35_QUERY = 'query_filter'
     CLUSTER_NAME = 'cluster_name'
     CLUSTER_ID = 'cluster_id'
+    VAPP_HREF = 'vapp_href'
     MB_MEMORY = 'mb_memory'
     NUM_CPU = 'num_cpu'
     NETWORK_NAME = 'network_name'
@@ -101,6 +109,18 @@ class RequestKey(str, Enum):
     PKS_EXT_HOST = 'pks_ext_host'
 
 
+@unique
+class PaginationKey(str, Enum):
+    """Keys of a paginated list response, modeled after vCD CloudAPI."""
+
+    RESULT_TOTAL = 'resultTotal'
+    PAGE_COUNT = 'pageCount'
+    PAGE = 'page'
+    PAGE_SIZE = 'pageSize'
+    VALUES = 'values'
+    NEXT_PAGE_URI = 'nextPageUri'
+
+
 @unique
 class DefEntityOperation(str, Enum):
     CREATE = 'CREATE'
@@ -0,0 +1,300 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tracking of vCD tasks of all requests with a single polling loop.
+
+pyvcloud's task monitor polls a task with a GET every few seconds, and a
+request waiting on many tasks polls them one after the other. The server
+wide MultiTaskMonitor instead polls every tracked task with one task query
+per TASK_MONITOR_QUERY_BATCH_SIZE tasks.
+"""
+
+import concurrent.futures
+import threading
+import time
+
+import pyvcloud.vcd.client as vcd_client
+from pyvcloud.vcd.exceptions import EntityNotFoundException
+from pyvcloud.vcd.exceptions import TaskTimeoutException
+from pyvcloud.vcd.exceptions import VcdException
+from pyvcloud.vcd.exceptions import VcdTaskException
+from pyvcloud.vcd.utils import extract_id
+
+from container_service_extension.logger import SERVER_LOGGER as LOGGER
+from container_service_extension.server_constants import \
+    TASK_MONITOR_QUERY_BATCH_SIZE
+from container_service_extension.server_constants import \
+    TASK_MONITOR_TIMEOUT_SECONDS
+from container_service_extension.utils import run_async
+
+_FAILED_TASK_STATUSES = (
+    vcd_client.TaskStatus.ABORTED.value.lower(),
+    vcd_client.TaskStatus.CANCELED.value.lower(),
+    vcd_client.TaskStatus.ERROR.value.lower()
+)
+
+_TASK_MONITOR = None
+_TASK_MONITOR_LOCK = threading.Lock()
+
+
+class MultiTaskMonitor(object):
+    """Thread safe monitor of vCD tasks, shared by all requests.
+
+    Callers get a future per task, which is resolved once the task finishes.
+    A single loop, run by run(), polls all unfinished tasks. It polls every
+    min_poll_interval seconds while tasks keep finishing or being submitted,
+    and backs off up to max_poll_interval seconds otherwise.
+    """
+
+    def __init__(self, client_factory, min_poll_interval, max_poll_interval):
+        """Initialize MultiTaskMonitor object.
+
+        :param function client_factory: function that returns a context
+            manager yielding a logged in sysadmin client.
+        :param float min_poll_interval: time in seconds between polls while
+            tasks keep finishing.
+        :param float max_poll_interval: max time in seconds between polls.
+        """
+        self._client_factory = client_factory
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # task id -> (task href, concurrent.futures.Future)
+        self._tasks = {}
+        self._poll_interval = min_poll_interval
+        self._stopped = False
+        self.polls = 0
+        self.poll_failures = 0
+        self.queries = 0
+        self.finished = 0
+
+    def submit(self, task):
+        """Start tracking a task.
+
+        :param lxml.objectify.ObjectifiedElement task: task XML resource, as
+            returned by the call that started the task.
+
+        :return: future that resolves to None once the task succeeds, or
+            raises VcdException once the task fails.
+
+        :rtype: concurrent.futures.Future
+        """
+        href = task.get('href')
+        task_id = href.split('/')[-1]
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Task monitor is stopped")
+            entry = self._tasks.get(task_id)
+            if entry is None:
+                entry = self._tasks[task_id] = \
+                    (href, concurrent.futures.Future())
+            self._poll_interval = self.min_poll_interval
+            self._changed.notify()
+        return entry[1]
+
+    def wait_for_tasks(self, tasks, timeout=TASK_MONITOR_TIMEOUT_SECONDS):
+        """Block till tasks finish, which run concurrently in vCD.
+
+        Tasks that are still running after @timeout seconds are no longer
+        tracked, and fail with TaskTimeoutException.
+
+        :param list tasks: task XML resources, as returned by the calls that
+            started the tasks.
+        :param float timeout: max time in seconds to wait for all tasks, None
+            waits without limit.
+
+        :raises VcdException: of the first task in @tasks that failed, once
+            all tasks finished.
+        :raises TaskTimeoutException: if a task didn't finish in time, and
+            no task before it in @tasks failed.
+        """
+        futures = [self.submit(task) for task in tasks]
+        _, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        for task, future in zip(tasks, futures):
+            if future in not_done:
+                href = task.get('href')
+                self._resolve(
+                    href.split('/')[-1], future,
+                    exception=TaskTimeoutException(
+                        f"Task {href} didn't finish in {timeout} seconds"))
+        for future in futures:
+            future.result()
+
+    def run(self):
+        """Poll tracked tasks till stopped.
+
+        Blocks the calling thread, should be run in a daemon thread.
+        """
+        polled_at = time.monotonic()
+        while True:
+            with self._lock:
+                # Submits shorten the interval, and wake up the wait to
+                # recompute the time of the next poll.
+                while not self._stopped:
+                    if not self._tasks:
+                        self._changed.wait()
+                        # New tasks are polled after min_poll_interval.
+                        polled_at = time.monotonic()
+                        continue
+                    remaining = polled_at + self._poll_interval - \
+                        time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                if self._stopped:
+                    break
+                tasks = dict(self._tasks)
+
+            polled_at = time.monotonic()
+            try:
+                with self._client_factory() as sysadmin_client:
+                    finished = self._poll(sysadmin_client, tasks)
+            except Exception as err:
+                finished = False
+                with self._lock:
+                    self.poll_failures += 1
+                LOGGER.warning(f"Polling of vCD tasks failed: {err}")
+
+            with self._lock:
+                self.polls += 1
+                if finished:
+                    self._poll_interval = self.min_poll_interval
+                else:
+                    self._poll_interval = min(2 * self._poll_interval,
+                                              self.max_poll_interval)
+
+        with self._lock:
+            entries = list(self._tasks.values())
+            self._tasks.clear()
+        for _, future in entries:
+            future.set_exception(RuntimeError("Task monitor is stopped"))
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            self._changed.notify()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'tracked': len(self._tasks),
+                'finished': self.finished,
+                'polls': self.polls,
+                'poll_failures': self.poll_failures,
+                'queries': self.queries,
+                'poll_interval': self._poll_interval
+            }
+
+    def _poll(self, sysadmin_client, tasks):
+        """Poll tasks and resolve the futures of finished tasks.
+
+        :param pyvcloud.vcd.client.Client sysadmin_client:
+        :param dict tasks: (task href, future) keyed by task id.
+
+        :return: True if any of the tasks finished.
+
+        :rtype: bool
+        """
+        task_ids = list(tasks)
+        statuses = {}
+        for i in range(0, len(task_ids), TASK_MONITOR_QUERY_BATCH_SIZE):
+            batch = task_ids[i:i + TASK_MONITOR_QUERY_BATCH_SIZE]
+            q = sysadmin_client.get_typed_query(
+                vcd_client.ResourceType.ADMIN_TASK.value,
+                query_result_format=vcd_client.QueryResultFormat.ID_RECORDS,
+                page_size=len(batch),
+                qfilter=','.join(f"id==urn:vcloud:task:{task_id}"
+                                 for task_id in batch))
+            for record in q.execute():
+                statuses[extract_id(record.get('id'))] = \
+                    record.get('status').lower()
+            with self._lock:
+                self.queries += 1
+
+        finished = False
+        for task_id, (href, future) in tasks.items():
+            task = None
+            status = statuses.get(task_id)
+            if status is None or status in _FAILED_TASK_STATUSES:
+                # Tasks missing from the query results (e.g. not yet
+                # indexed) and failed tasks are fetched on their own, the
+                # latter for their error.
+                try:
+                    task = sysadmin_client.get_resource(href)
+                except EntityNotFoundException as err:
+                    self._resolve(task_id, future, exception=err)
+                    finished = True
+                    continue
+                status = task.get('status').lower()
+            if status == vcd_client.TaskStatus.SUCCESS.value.lower():
+                self._resolve(task_id, future)
+            elif status in _FAILED_TASK_STATUSES:
+                error = getattr(task, 'Error', None)
+                if error is not None:
+                    exception = VcdTaskException(status, error)
+                else:
+                    # e.g. aborted and canceled tasks
+                    exception = VcdException(f"Task {href} {status}")
+                self._resolve(task_id, future, exception=exception)
+            else:
+                continue
+            finished = True
+        return finished
+
+    def _resolve(self, task_id, future, exception=None):
+        """Stop tracking a task and resolve its future.
+
+        The future is left as is if the task is no longer tracked, e.g. if
+        it timed out while being polled.
+        """
+        with self._lock:
+            if self._tasks.get(task_id, (None, None))[1] is not future:
+                return
+            del self._tasks[task_id]
+            self.finished += 1
+        if exception is None:
+            future.set_result(None)
+        else:
+            future.set_exception(exception)
+
+
+def start_task_monitor(client_factory, min_poll_interval, max_poll_interval):
+    """Create the server wide task monitor and start polling.
+
+    :param function client_factory: see MultiTaskMonitor.
+    :param float min_poll_interval: see MultiTaskMonitor.
+    :param float max_poll_interval: see MultiTaskMonitor.
+
+    :return: the task monitor.
+
+    :rtype: MultiTaskMonitor
+    """
+    global _TASK_MONITOR
+    with _TASK_MONITOR_LOCK:
+        if _TASK_MONITOR is None:
+            monitor = MultiTaskMonitor(client_factory, min_poll_interval,
+                                       max_poll_interval)
+            run_async(monitor.run)()
+            _TASK_MONITOR = monitor
+        return _TASK_MONITOR
+
+
+def get_task_monitor():
+    """Get the server wide task monitor.
+
+    :return: the task monitor, or None if it is not started.
+
+    :rtype: MultiTaskMonitor
+    """
+    return _TASK_MONITOR
+
+
+def stop_task_monitor():
+    """Stop polling and drop the server wide task monitor."""
+    global _TASK_MONITOR
+    with _TASK_MONITOR_LOCK:
+        if _TASK_MONITOR is not None:
+            _TASK_MONITOR.stop()
+            _TASK_MONITOR = None
@@ -0,0 +1,78 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+from collections import namedtuple
+import hashlib
+import threading
+
+from cachetools import TTLCache
+
+
+# Everything that rehydrating a pyvcloud client from a token learns from the
+# vCD session GET. session_xml is the serialized vCD session (user, org,
+# role and session links), so that each client gets its own copy of the
+# session element.
+TenantSession = namedtuple(
+    'TenantSession', ['session_xml', 'vcloud_auth_token', 'is_sysadmin'])
+
+
+class TenantSessionCache(object):
+    """Thread safe LRU cache of tenant sessions with time based expiry.
+
+    Entries are keyed by a SHA-256 hash of the auth token rather than by the
+    token itself.
+    """
+
+    def __init__(self, maxsize, ttl):
+        """Initialize TenantSessionCache object.
+
+        :param int maxsize: max number of sessions to keep, least recently
+            used sessions are evicted first.
+        :param int ttl: time in seconds for which a session is cached.
+        """
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _get_key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        """Get the cached session for an auth token.
+
+        :param str token: tenant auth token.
+
+        :return: cached session, or None if there is no valid entry.
+
+        :rtype: TenantSession
+        """
+        key = self._get_key(token)
+        with self._lock:
+            tenant_session = self._cache.get(key)
+            if tenant_session is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return tenant_session
+
+    def put(self, token, tenant_session):
+        key = self._get_key(token)
+        with self._lock:
+            self._cache[key] = tenant_session
+
+    def invalidate(self, token):
+        """Remove the session of an auth token, e.g. after vCD rejected it."""
+        key = self._get_key(token)
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses
+            }
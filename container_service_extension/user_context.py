@@ -1,3 +1,6 @@
+import threading
+
+from cachetools import TTLCache
 import lxml.objectify as lxml
 import pyvcloud.vcd.client as vcd_client
 import pyvcloud.vcd.org as vcd_org
@@ -6,6 +9,10 @@ import pyvcloud.vcd.role as vcd_role
 import container_service_extension.cloudapi.cloudapi_client as cloudApiClient
 import container_service_extension.logger as logger
 import container_service_extension.pyvcloud_utils as vcd_utils
+from container_service_extension.server_constants import \
+    DEFAULT_ROLE_RIGHTS_CACHE_TTL_SECONDS
+from container_service_extension.server_constants import \
+    ROLE_RIGHTS_CACHE_MAX_SIZE
 import container_service_extension.utils as utils
 
 
@@ -14,6 +21,42 @@ ORG_ADMIN_RIGHTS = [
     'General: Administrator View'
 ]
 
+# Process wide cache of (org href, role name) -> frozenset of right names,
+# created on first use since its ttl comes from the server config
+_ROLE_RIGHTS_CACHE = None
+_ROLE_RIGHTS_CACHE_LOCK = threading.Lock()
+
+
+def _get_role_rights_cache():
+    global _ROLE_RIGHTS_CACHE
+    if _ROLE_RIGHTS_CACHE is None:
+        ttl = utils.get_server_runtime_config()['service'].get(
+            'rights_cache_ttl', DEFAULT_ROLE_RIGHTS_CACHE_TTL_SECONDS)
+        _ROLE_RIGHTS_CACHE = TTLCache(maxsize=ROLE_RIGHTS_CACHE_MAX_SIZE,
+                                      ttl=ttl)
+    return _ROLE_RIGHTS_CACHE
+
+
+def invalidate_role_rights_cache(org_href=None, role_name=None):
+    """Drop cached rights of a role, or of all roles.
+
+    Called when rights of a role may have changed, e.g. when a request is
+    denied because of rights that were cached.
+
+    :param str org_href: href of the org of the role. If None, rights of all
+        roles are dropped.
+    :param str role_name: name of the role. If None, rights of all roles of
+        the org are dropped.
+    """
+    with _ROLE_RIGHTS_CACHE_LOCK:
+        cache = _get_role_rights_cache()
+        if org_href is None:
+            cache.clear()
+            return
+        for key in list(cache.keys()):
+            if key[0] == org_href and role_name in (None, key[1]):
+                cache.pop(key, None)
+
 
 class UserContext:
     def __init__(self, client: vcd_client.Client,
@@ -26,7 +69,8 @@ class UserContext:
         self._org_name: str = None
         self._org_href: str = None
         self._role: str = None
-        self._rights: [str] = None
+        self._rights: frozenset = None
+        self._rights_from_cache: bool = False
 
         self._sysadmin_client: vcd_client.Client = None
         self._sysadmin_cloudapi_client: cloudApiClient.CloudApiClient = None
@@ -80,20 +124,45 @@ class UserContext:
 
     @property
     def rights(self):
+        """Names of the rights of the user's role, as a frozenset."""
         if self._rights is None:
-            # Query is restricted to system administrator
-            org = vcd_org.Org(self.sysadmin_client, href=self.org_href)
-            role = vcd_role.Role(self.sysadmin_client,
-                                 resource=org.get_role_resource(self.role))
-
-            self._rights = []
-            for right_dict in role.list_rights():
-                right_name = right_dict.get('name')
-                if right_name is not None:
-                    self._rights.append(right_name)
-
+            key = (self.org_href, self.role)
+            with _ROLE_RIGHTS_CACHE_LOCK:
+                self._rights = _get_role_rights_cache().get(key)
+            self._rights_from_cache = self._rights is not None
+            if self._rights is None:
+                self._rights = self._get_role_rights()
+                with _ROLE_RIGHTS_CACHE_LOCK:
+                    _get_role_rights_cache()[key] = self._rights
         return self._rights
 
+    def refresh_rights(self):
+        """Get the rights of the user's role again, if they were cached.
+
+        :return: True if the rights were fetched again from vCD.
+
+        :rtype: bool
+        """
+        if not self._rights_from_cache:
+            return False
+        invalidate_role_rights_cache(self.org_href, self.role)
+        self._rights = None
+        self._rights_from_cache = False
+        return True
+
+    def _get_role_rights(self):
+        # Query is restricted to system administrator
+        org = vcd_org.Org(self.sysadmin_client, href=self.org_href)
+        role = vcd_role.Role(self.sysadmin_client,
+                             resource=org.get_role_resource(self.role))
+
+        rights = set()
+        for right_dict in role.list_rights():
+            right_name = right_dict.get('name')
+            if right_name is not None:
+                rights.add(right_name)
+        return frozenset(rights)
+
     @property
     def has_org_admin_rights(self):
         return all(right in self.rights for right in ORG_ADMIN_RIGHTS)
@@ -101,7 +170,8 @@ class UserContext:
     @property
     def sysadmin_client(self):
         if self._sysadmin_client is None:
-            self._sysadmin_client = vcd_utils.get_sys_admin_client()
+            self._sysadmin_client = \
+                vcd_utils.get_sys_admin_client_pool().borrow()
         return self._sysadmin_client
 
     @property
@@ -114,16 +184,18 @@ class UserContext:
                 logger_wire = logger.SERVER_CLOUDAPI_WIRE_LOGGER
             self._sysadmin_cloudapi_client = \
                 vcd_utils.get_cloudapi_client_from_vcd_client(
-                    self._sysadmin_client,
+                    self.sysadmin_client,
                     logger.SERVER_LOGGER,
                     logger_wire)
         return self._sysadmin_cloudapi_client
 
     def end(self):
         try:
-            self._sysadmin_client.logout()
+            vcd_utils.get_sys_admin_client_pool().release(
+                self._sysadmin_client)
         except Exception:
             pass
         finally:
             self._sysadmin_client = None
+            self._sysadmin_cloudapi_client = None
             self._cloudapi_client = None
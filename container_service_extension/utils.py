@@ -7,6 +7,7 @@ import hashlib
 import os
 import pathlib
 import platform
+import random
 import stat
 import sys
 import threading
@@ -364,6 +365,55 @@ def run_async(func):
     return wrapper
 
 
+def exponential_backoff(initial, maximum, factor=2, jitter=0.5):
+    """Yield an endless sequence of delays that grow exponentially.
+
+    Each delay is randomized by up to +/- @jitter of its value, so that
+    many callers retrying at the same time spread out.
+
+    :param float initial: first delay in seconds, before jitter.
+    :param float maximum: max delay in seconds, before jitter.
+    :param float factor: growth factor of the delay.
+    :param float jitter: fraction of the delay to randomize.
+
+    :return: generator of delays in seconds.
+
+    :rtype: generator
+    """
+    delay = initial
+    while True:
+        yield delay * random.uniform(1 - jitter, 1 + jitter)
+        delay = min(delay * factor, maximum)
+
+
+def get_max_unavailable_count(max_unavailable, num_nodes):
+    """Get the number of nodes that may be unavailable at a time.
+
+    :param max_unavailable: number of nodes as an int, or percentage of
+        @num_nodes as a str like '20%', which is rounded down.
+    :param int num_nodes: total number of nodes.
+
+    :return: number of nodes, at least 1.
+
+    :rtype: int
+
+    :raises ValueError: if @max_unavailable is neither a positive int nor a
+        percentage between 1% and 100%.
+    """
+    if isinstance(max_unavailable, str) and max_unavailable.endswith('%'):
+        try:
+            percentage = int(max_unavailable[:-1])
+        except ValueError:
+            percentage = 0
+        if not 1 <= percentage <= 100:
+            raise ValueError(f"Invalid percentage '{max_unavailable}'")
+        return max(1, num_nodes * percentage // 100)
+    if isinstance(max_unavailable, bool) or \
+            not isinstance(max_unavailable, int) or max_unavailable < 1:
+        raise ValueError(f"Invalid number of nodes '{max_unavailable}'")
+    return max_unavailable
+
+
 def is_v35_supported_by_cse_server():
     """Return true if CSE server is qualified to invoke Defined Entity API.
 
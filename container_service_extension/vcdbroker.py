@@ -2,15 +2,21 @@
 # Copyright (c) 2017 VMware, Inc. All Rights Reserved.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import collections
+import concurrent.futures
 import copy
 import random
 import re
 import string
+import threading
 import time
 import uuid
 
+from cachetools import LRUCache
 import pkg_resources
 import pyvcloud.vcd.client as vcd_client
+from pyvcloud.vcd.exceptions import AccessForbiddenException
+from pyvcloud.vcd.exceptions import EntityNotFoundException
 import pyvcloud.vcd.org as vcd_org
 import pyvcloud.vcd.task as vcd_task
 import pyvcloud.vcd.vapp as vcd_vapp
@@ -21,21 +27,43 @@ import semantic_version as semver
 
 import container_service_extension.abstract_broker as abstract_broker
 import container_service_extension.authorization as auth
+import container_service_extension.cluster_inventory as cluster_inventory
 import container_service_extension.exceptions as e
+from container_service_extension.guest_readiness import \
+    wait_until_guest_ready
+from container_service_extension.kubeconfig_cache import \
+    get_kubeconfig_cache
+from container_service_extension.kubeconfig_cache import \
+    invalidate_kubeconfig_cache
 import container_service_extension.local_template_manager as ltm
 from container_service_extension.logger import SERVER_LOGGER as LOGGER
+from container_service_extension.metadata_query import \
+    get_resource_with_metadata
+from container_service_extension.metadata_query import MetadataQuery
 import container_service_extension.operation_context as ctx
 import container_service_extension.pyvcloud_utils as vcd_utils
 import container_service_extension.request_handlers.request_utils as req_utils
+from container_service_extension.server_constants import \
+    CLUSTER_ID_INDEX_MAX_SIZE
 from container_service_extension.server_constants import ClusterMetadataKey
 from container_service_extension.server_constants import CSE_NATIVE_DEPLOY_RIGHT_NAME # noqa: E501
+from container_service_extension.server_constants import \
+    DEFAULT_UPGRADE_MAX_UNAVAILABLE
+from container_service_extension.server_constants import \
+    GUEST_EXEC_RETRY_MAX_SECONDS
+from container_service_extension.server_constants import \
+    GUEST_EXEC_RETRY_MIN_SECONDS
 from container_service_extension.server_constants import K8S_PROVIDER_KEY
 from container_service_extension.server_constants import K8sProvider
+from container_service_extension.server_constants import \
+    KUBECTL_NODE_STATUS_PREFIX
 from container_service_extension.server_constants import KwargKey
 from container_service_extension.server_constants import LocalTemplateKey
 from container_service_extension.server_constants import NodeType
 from container_service_extension.server_constants import ScriptFile
 from container_service_extension.server_constants import SYSTEM_ORG_NAME
+from container_service_extension.shared_constants import \
+    CSE_PAGINATION_DEFAULT_PAGE_SIZE
 from container_service_extension.shared_constants import RequestKey
 from container_service_extension.telemetry.constants import CseOperation
 from container_service_extension.telemetry.constants import PayloadKey
@@ -44,6 +72,62 @@ from container_service_extension.telemetry.telemetry_handler import \
 import container_service_extension.utils as utils
 import container_service_extension.vsphere_utils as vs_utils
 
+# cluster data dictionary key of each cluster metadata key
+METADATA_KEY_TO_CLUSTER_KEY = {
+    ClusterMetadataKey.CLUSTER_ID: 'cluster_id',
+    ClusterMetadataKey.CSE_VERSION: 'cse_version',
+    ClusterMetadataKey.MASTER_IP: 'leader_endpoint',
+    ClusterMetadataKey.TEMPLATE_NAME: 'template_name',
+    ClusterMetadataKey.TEMPLATE_REVISION: 'template_revision',
+    ClusterMetadataKey.OS: 'os',
+    ClusterMetadataKey.DOCKER_VERSION: 'docker_version',
+    ClusterMetadataKey.KUBERNETES: 'kubernetes',
+    ClusterMetadataKey.KUBERNETES_VERSION: 'kubernetes_version',
+    ClusterMetadataKey.CNI: 'cni',
+    ClusterMetadataKey.CNI_VERSION: 'cni_version'
+}
+# metadata queried by default, for the full cluster data
+ALL_CLUSTER_METADATA_KEYS = [
+    *METADATA_KEY_TO_CLUSTER_KEY,
+    ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME
+]
+# metadata needed by operations that only use the cluster id and hrefs
+CLUSTER_ID_METADATA_KEYS = [ClusterMetadataKey.CLUSTER_ID]
+# metadata needed by operations on the cluster template
+CLUSTER_TEMPLATE_METADATA_KEYS = [
+    ClusterMetadataKey.CLUSTER_ID,
+    ClusterMetadataKey.TEMPLATE_NAME,
+    ClusterMetadataKey.TEMPLATE_REVISION,
+    ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME
+]
+# status of a vApp resource, as reported by vApp query records
+VAPP_STATUS_TO_RECORD_STATUS = {
+    -1: 'FAILED_CREATION',
+    0: 'UNRESOLVED',
+    1: 'RESOLVED',
+    2: 'DEPLOYED',
+    3: 'SUSPENDED',
+    4: 'POWERED_ON',
+    5: 'WAITING_FOR_INPUT',
+    6: 'UNKNOWN',
+    7: 'UNRECOGNIZED',
+    8: 'POWERED_OFF',
+    9: 'INCONSISTENT_STATE',
+    10: 'MIXED'
+}
+
+# Index of the clusters seen by cluster queries, keyed by cluster id. Only
+# holds what doesn't change during the lifetime of a cluster, the rest is
+# read from the cluster vApp on every use.
+IndexedCluster = collections.namedtuple(
+    'IndexedCluster', ['vapp_href', 'vdc_id', 'vdc_name'])
+CLUSTER_ID_INDEX = LRUCache(maxsize=CLUSTER_ID_INDEX_MAX_SIZE)
+_CLUSTER_ID_INDEX_LOCK = threading.Lock()
+
+# vApp ids are uuids, see _get_vapp_href()
+_VAPP_ID_PATTERN = re.compile(
+    r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.I)
+
 
 class VcdBroker(abstract_broker.AbstractBroker):
     """Handles cluster operations for 'native' k8s provider."""
@@ -62,9 +146,13 @@ class VcdBroker(abstract_broker.AbstractBroker):
         Common broker function that validates data for the 'cluster info'
         operation and returns cluster/node metadata as dictionary.
 
+        Clusters identified by cluster_id or vapp_href are read straight
+        from their vApp, instead of being searched for by name.
+
         **data: Required
             Required data: cluster_name
-            Optional data and default values: org_name=None, ovdc_name=None
+            Optional data and default values: org_name=None, ovdc_name=None,
+                cluster_id=None, vapp_href=None
         **telemetry: Optional
         """
         data = kwargs[KwargKey.DATA]
@@ -78,10 +166,7 @@ class VcdBroker(abstract_broker.AbstractBroker):
         validated_data = {**defaults, **data}
         req_utils.validate_payload(validated_data, required)
 
-        cluster_name = validated_data[RequestKey.CLUSTER_NAME]
-        cluster = get_cluster(self.context.client, cluster_name,
-                              org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+        cluster, vapp = self._get_cluster_and_vapp(validated_data)
 
         if kwargs.get(KwargKey.TELEMETRY, True):
             # Record the telemetry data
@@ -91,23 +176,20 @@ class VcdBroker(abstract_broker.AbstractBroker):
                                        cse_params=cse_params)
 
         cluster[K8S_PROVIDER_KEY] = K8sProvider.NATIVE
-        vapp = vcd_vapp.VApp(self.context.client, href=cluster['vapp_href'])
-        vms = vapp.get_all_vms()
-        for vm in vms:
+        for vm_name, ip_address in vcd_utils.get_vm_ips(vapp).items():
             node_info = {
-                'name': vm.get('name'),
+                'name': vm_name,
                 'ipAddress': ''
             }
-            try:
-                node_info['ipAddress'] = vapp.get_primary_ip(vm.get('name'))
-            except Exception:
-                LOGGER.debug(f"Unable to get ip address of node "
-                             f"{vm.get('name')}")
-            if vm.get('name').startswith(NodeType.MASTER):
+            if ip_address is None:
+                LOGGER.debug(f"Unable to get ip address of node {vm_name}")
+            else:
+                node_info['ipAddress'] = ip_address
+            if vm_name.startswith(NodeType.MASTER):
                 cluster.get('master_nodes').append(node_info)
-            elif vm.get('name').startswith(NodeType.WORKER):
+            elif vm_name.startswith(NodeType.WORKER):
                 cluster.get('nodes').append(node_info)
-            elif vm.get('name').startswith(NodeType.NFS):
+            elif vm_name.startswith(NodeType.NFS):
                 cluster.get('nfs_nodes').append(node_info)
 
         return cluster
@@ -139,11 +221,47 @@ class VcdBroker(abstract_broker.AbstractBroker):
             self.context.client,
             org_name=validated_data[RequestKey.ORG_NAME],
             ovdc_name=validated_data[RequestKey.OVDC_NAME])
+        return self._get_cluster_list_data(raw_clusters)
+
+    def list_clusters_page(self, **kwargs):
+        """List a single page of native clusters and their relevant metadata.
+
+        Common broker function that validates data for the paginated 'list
+        clusters' operation and returns a page of cluster data, along with
+        the total number of clusters.
+
+        **data: Optional
+            Optional data and default values: org_name=None, ovdc_name=None,
+                page=1, pageSize=CSE_PAGINATION_DEFAULT_PAGE_SIZE
+        **telemetry: Optional
+        """
+        data = kwargs.get(KwargKey.DATA, {})
+        defaults = {
+            RequestKey.ORG_NAME: None,
+            RequestKey.OVDC_NAME: None,
+            RequestKey.PAGE: 1,
+            RequestKey.PAGE_SIZE: CSE_PAGINATION_DEFAULT_PAGE_SIZE
+        }
+        validated_data = {**defaults, **data}
+
+        if kwargs.get(KwargKey.TELEMETRY, True):
+            # Record the data for telemetry
+            record_user_action_details(cse_operation=CseOperation.CLUSTER_LIST,
+                                       cse_params=copy.deepcopy(validated_data)) # noqa: E501
+
+        raw_clusters, result_total = get_clusters_page(
+            self.context.client,
+            page=validated_data[RequestKey.PAGE],
+            page_size=validated_data[RequestKey.PAGE_SIZE],
+            org_name=validated_data[RequestKey.ORG_NAME],
+            ovdc_name=validated_data[RequestKey.OVDC_NAME])
+        return self._get_cluster_list_data(raw_clusters), result_total
 
+    def _get_cluster_list_data(self, raw_clusters):
+        org_names = vcd_utils.get_org_names_from_ovdc_ids(
+            self.context.sysadmin_client, [c['vdc_id'] for c in raw_clusters])
         clusters = []
         for c in raw_clusters:
-            org_name = vcd_utils.get_org_name_from_ovdc_id(
-                self.context.sysadmin_client, c['vdc_id'])
             clusters.append({
                 'name': c['name'],
                 'IP master': c['leader_endpoint'],
@@ -155,7 +273,7 @@ class VcdBroker(abstract_broker.AbstractBroker):
                 'vdc': c['vdc_name'],
                 'status': c['status'],
                 'vdc_id': c['vdc_id'],
-                'org_name': org_name,
+                'org_name': org_names.get(c['vdc_id']),
                 K8S_PROVIDER_KEY: K8sProvider.NATIVE
             })
         return clusters
@@ -167,9 +285,14 @@ class VcdBroker(abstract_broker.AbstractBroker):
         operation and returns the cluster's kube config file contents
         as a string.
 
+        The kube config is downloaded from the first master node that
+        returns it, and cached per cluster for 'kubeconfig_cache_ttl'
+        seconds.
+
         **data: Required
             Required data: cluster_name
-            Optional data and default values: org_name=None, ovdc_name=None
+            Optional data and default values: org_name=None, ovdc_name=None,
+                cluster_id=None, vapp_href=None
         **telemetry: Optional
         """
         data = kwargs[KwargKey.DATA]
@@ -183,14 +306,10 @@ class VcdBroker(abstract_broker.AbstractBroker):
         validated_data = {**defaults, **data}
         req_utils.validate_payload(validated_data, required)
 
-        cluster_name = validated_data[RequestKey.CLUSTER_NAME]
-        cluster = get_cluster(self.context.client, cluster_name,
-                              org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
-        vapp = vcd_vapp.VApp(self.context.client, href=cluster['vapp_href'])
-        node_names = get_node_names(vapp, NodeType.MASTER)
-
-        all_results = []
+        # The cluster is looked up even if its kube config is cached, since
+        # that is what checks that the user can see the cluster.
+        cluster, vapp = self._get_cluster_and_vapp(
+            validated_data, metadata_keys=CLUSTER_ID_METADATA_KEYS)
 
         if kwargs.get(KwargKey.TELEMETRY, True):
             # Record the telemetry data
@@ -199,22 +318,38 @@ class VcdBroker(abstract_broker.AbstractBroker):
             record_user_action_details(cse_operation=CseOperation.CLUSTER_CONFIG, # noqa: E501
                                        cse_params=cse_params)
 
-        for node_name in node_names:
+        kubeconfig_cache = get_kubeconfig_cache()
+        if kubeconfig_cache is not None:
+            kubeconfig = kubeconfig_cache.get(cluster['cluster_id'])
+            if kubeconfig is not None:
+                return kubeconfig
+
+        for node_name in get_node_names(vapp, NodeType.MASTER):
             LOGGER.debug(f"getting file from node {node_name}")
-            password = vapp.get_admin_password(node_name)
-            vs = vs_utils.get_vsphere(self.context.sysadmin_client, vapp,
-                                      vm_name=node_name, logger=LOGGER)
-            vs.connect()
-            moid = vapp.get_vm_moid(node_name)
-            vm = vs.get_vm_by_moid(moid)
-            filename = '/root/.kube/config'
-            result = vs.download_file_from_guest(vm, 'root', password,
-                                                 filename)
-            all_results.append(result)
-
-        if len(all_results) == 0 or all_results[0].status_code != requests.codes.ok: # noqa: E501
-            raise e.ClusterOperationError("Couldn't get cluster configuration")
-        return all_results[0].content.decode()
+            try:
+                password = vapp.get_admin_password(node_name)
+                with vs_utils.pooled_vsphere(self.context.sysadmin_client,
+                                             vapp, node_name,
+                                             logger=LOGGER) as vs:
+                    moid = vapp.get_vm_moid(node_name)
+                    vm = vs.get_vm_by_moid(moid)
+                    filename = '/root/.kube/config'
+                    result = vs.download_file_from_guest(vm, 'root',
+                                                         password, filename)
+            except Exception as err:
+                LOGGER.warning(f"Couldn't get kube config from node "
+                               f"{node_name}: {err}")
+                continue
+            if result.status_code != requests.codes.ok:
+                LOGGER.warning(f"Couldn't get kube config from node "
+                               f"{node_name}: {result.status_code}")
+                continue
+            kubeconfig = result.content.decode()
+            if kubeconfig_cache is not None:
+                kubeconfig_cache.put(cluster['cluster_id'], kubeconfig)
+            return kubeconfig
+
+        raise e.ClusterOperationError("Couldn't get cluster configuration")
 
     def get_cluster_upgrade_plan(self, **kwargs):
         """Get the template names/revisions that the cluster can upgrade to.
@@ -242,7 +377,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
         cluster = get_cluster(self.context.client,
                               validated_data[RequestKey.CLUSTER_NAME],
                               org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+                              ovdc_name=validated_data[RequestKey.OVDC_NAME],
+                              metadata_keys=CLUSTER_TEMPLATE_METADATA_KEYS)
 
         if kwargs.get(KwargKey.TELEMETRY, True):
             # Record the telemetry data
@@ -296,7 +432,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
         try:
             get_cluster(self.context.client, cluster_name,
                         org_name=data[RequestKey.ORG_NAME],
-                        ovdc_name=data[RequestKey.OVDC_NAME])
+                        ovdc_name=data[RequestKey.OVDC_NAME],
+                        metadata_keys=CLUSTER_ID_METADATA_KEYS)
             raise e.ClusterAlreadyExistsError(
                 f"Cluster '{cluster_name}' already exists.")
         except e.ClusterNotFoundError:
@@ -467,7 +604,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
 
         cluster = get_cluster(self.context.client, cluster_name,
                               org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+                              ovdc_name=validated_data[RequestKey.OVDC_NAME],
+                              metadata_keys=CLUSTER_ID_METADATA_KEYS)
         cluster_id = cluster['cluster_id']
 
         if kwargs.get(KwargKey.TELEMETRY, True):
@@ -484,6 +622,7 @@ class VcdBroker(abstract_broker.AbstractBroker):
         self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
         self.context.is_async = True
         self._delete_cluster_async(cluster_name=cluster_name,
+                                   cluster_id=cluster_id,
                                    cluster_vdc_href=cluster['vdc_href'])
 
         return {
@@ -571,7 +710,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
 
         **data: Required
             Required data: cluster_name, node_name
-            Optional data and default values: org_name=None, ovdc_name=None
+            Optional data and default values: org_name=None, ovdc_name=None,
+                cluster_id=None, vapp_href=None
         **telemetry: Optional
         """
         data = kwargs[KwargKey.DATA]
@@ -589,9 +729,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
         cluster_name = validated_data[RequestKey.CLUSTER_NAME]
         node_name = validated_data[RequestKey.NODE_NAME]
 
-        cluster = get_cluster(self.context.client, cluster_name,
-                              org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+        cluster, vapp = self._get_cluster_and_vapp(
+            validated_data, metadata_keys=CLUSTER_ID_METADATA_KEYS)
 
         if kwargs.get(KwargKey.TELEMETRY, True):
             # Record the telemetry data
@@ -599,7 +738,6 @@ class VcdBroker(abstract_broker.AbstractBroker):
             cse_params[PayloadKey.CLUSTER_ID] = cluster[PayloadKey.CLUSTER_ID]
             record_user_action_details(cse_operation=CseOperation.NODE_INFO, cse_params=cse_params)  # noqa: E501
 
-        vapp = vcd_vapp.VApp(self.context.client, href=cluster['vapp_href'])
         vms = vapp.get_all_vms()
         node_info = None
         for vm in vms:
@@ -617,10 +755,11 @@ class VcdBroker(abstract_broker.AbstractBroker):
             if hasattr(vm, 'VmSpecSection'):
                 node_info['numberOfCpus'] = vm.VmSpecSection.NumCpus.text
                 node_info['memoryMB'] = vm.VmSpecSection.MemoryResourceMb.Configured.text # noqa: E501
-            try:
-                node_info['ipAddress'] = vapp.get_primary_ip(vm_name)
-            except Exception:
+            ip_address = vcd_utils.get_primary_ip(vm)
+            if ip_address is None:
                 LOGGER.debug(f"Unable to get ip address of node {vm_name}")
+            else:
+                node_info['ipAddress'] = ip_address
             if vm_name.startswith(NodeType.MASTER):
                 node_info['node_type'] = 'master'
             elif vm_name.startswith(NodeType.WORKER):
@@ -693,7 +832,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
 
         cluster = get_cluster(self.context.client, cluster_name,
                               org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+                              ovdc_name=validated_data[RequestKey.OVDC_NAME],
+                              metadata_keys=CLUSTER_ID_METADATA_KEYS)
         cluster_id = cluster['cluster_id']
 
         if kwargs.get(KwargKey.TELEMETRY, True):
@@ -778,7 +918,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
 
         cluster = get_cluster(self.context.client, cluster_name,
                               org_name=validated_data[RequestKey.ORG_NAME],
-                              ovdc_name=validated_data[RequestKey.OVDC_NAME])
+                              ovdc_name=validated_data[RequestKey.OVDC_NAME],
+                              metadata_keys=CLUSTER_ID_METADATA_KEYS)
         cluster_id = cluster['cluster_id']
 
         if kwargs.get(KwargKey.TELEMETRY, True):
@@ -798,6 +939,7 @@ class VcdBroker(abstract_broker.AbstractBroker):
         self.context.is_async = True
         self._delete_nodes_async(
             cluster_name=cluster_name,
+            cluster_id=cluster_id,
             vapp_href=cluster['vapp_href'],
             node_names_list=validated_data[RequestKey.NODE_NAMES_LIST])
 
@@ -835,7 +977,11 @@ class VcdBroker(abstract_broker.AbstractBroker):
                 msg = f"Error while creating vApp: {err}"
                 LOGGER.debug(str(err))
                 raise e.ClusterOperationError(msg)
-            self.context.client.get_task_monitor().wait_for_status(vapp_resource.Tasks.Task[0]) # noqa: E501
+            # Instantiation copies the template disks, which can take longer
+            # than any fixed timeout.
+            vcd_utils.wait_for_task(self.context.client,
+                                    vapp_resource.Tasks.Task[0],
+                                    timeout=None)
 
             template = get_template(template_name, template_revision)
 
@@ -854,7 +1000,7 @@ class VcdBroker(abstract_broker.AbstractBroker):
             vapp = vcd_vapp.VApp(self.context.client,
                                  href=vapp_resource.get('href'))
             task = vapp.set_multiple_metadata(tags)
-            self.context.client.get_task_monitor().wait_for_status(task)
+            vcd_utils.wait_for_task(self.context.client, task)
 
             msg = f"Creating master node for cluster '{cluster_name}' " \
                   f"({cluster_id})"
@@ -880,38 +1026,58 @@ class VcdBroker(abstract_broker.AbstractBroker):
                 raise e.MasterNodeCreationError("Error adding master node:",
                                                 str(err))
 
-            msg = f"Initializing cluster '{cluster_name}' ({cluster_id})"
+            msg = f"Initializing cluster '{cluster_name}' ({cluster_id}) " \
+                  f"and creating {num_workers} node(s)"
             self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
             vapp.reload()
-            init_cluster(self.context.sysadmin_client,
-                         vapp,
-                         template[LocalTemplateKey.NAME],
-                         template[LocalTemplateKey.REVISION])
-            master_ip = get_master_ip(self.context.sysadmin_client, vapp)
+            # Workers and the NFS node don't need the master till they join
+            # the cluster, so they are created while the master initializes.
+            # Clients aren't thread safe, the node thread uses copies.
+            nodes_client = vcd_utils.copy_client(self.context.client)
+            nodes_cancelled = threading.Event()
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1) as executor:
+                nodes_future = executor.submit(
+                    _add_worker_and_nfs_nodes,
+                    vcd_utils.copy_client(self.context.sysadmin_client),
+                    num_workers=num_workers,
+                    enable_nfs=enable_nfs,
+                    org=vcd_org.Org(nodes_client, href=org.href,
+                                    resource=org.resource),
+                    vdc=VDC(nodes_client, href=vdc.href,
+                            resource=vdc.resource),
+                    vapp=vcd_vapp.VApp(nodes_client, href=vapp.href),
+                    catalog_name=catalog_name,
+                    template=template,
+                    network_name=network_name,
+                    num_cpu=num_cpu,
+                    memory_in_mb=mb_memory,
+                    storage_profile=storage_profile_name,
+                    ssh_key=ssh_key,
+                    cancelled=nodes_cancelled)
+                try:
+                    init_cluster(self.context.sysadmin_client,
+                                 vapp,
+                                 template[LocalTemplateKey.NAME],
+                                 template[LocalTemplateKey.REVISION])
+                    master_ip = get_master_ip(self.context.sysadmin_client,
+                                              vapp)
+                except Exception:
+                    # A vApp being recomposed can't be deleted on rollback,
+                    # so nodes not being added yet are skipped, and the nodes
+                    # being added are waited for.
+                    nodes_cancelled.set()
+                    nodes_error = nodes_future.exception()
+                    if nodes_error is not None:
+                        LOGGER.error(f"Error creating nodes of cluster "
+                                     f"'{cluster_name}': {nodes_error}")
+                    raise
+                nodes_future.result()
+
+            # The vApp can't be changed while nodes are being added to it.
             task = vapp.set_metadata('GENERAL', 'READWRITE', 'cse.master.ip',
                                      master_ip)
-            self.context.client.get_task_monitor().wait_for_status(task)
-
-            msg = f"Creating {num_workers} node(s) for cluster " \
-                  f"'{cluster_name}' ({cluster_id})"
-            self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
-            try:
-                add_nodes(self.context.sysadmin_client,
-                          num_nodes=num_workers,
-                          node_type=NodeType.WORKER,
-                          org=org,
-                          vdc=vdc,
-                          vapp=vapp,
-                          catalog_name=catalog_name,
-                          template=template,
-                          network_name=network_name,
-                          num_cpu=num_cpu,
-                          memory_in_mb=mb_memory,
-                          storage_profile=storage_profile_name,
-                          ssh_key=ssh_key)
-            except Exception as err:
-                raise e.WorkerNodeCreationError("Error creating worker node:",
-                                                str(err))
+            vcd_utils.wait_for_task(self.context.client, task)
 
             msg = f"Adding {num_workers} node(s) to cluster " \
                   f"'{cluster_name}' ({cluster_id})"
@@ -922,28 +1088,6 @@ class VcdBroker(abstract_broker.AbstractBroker):
                          template[LocalTemplateKey.NAME],
                          template[LocalTemplateKey.REVISION])
 
-            if enable_nfs:
-                msg = f"Creating NFS node for cluster " \
-                      f"'{cluster_name}' ({cluster_id})"
-                self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
-                try:
-                    add_nodes(self.context.sysadmin_client,
-                              num_nodes=1,
-                              node_type=NodeType.NFS,
-                              org=org,
-                              vdc=vdc,
-                              vapp=vapp,
-                              catalog_name=catalog_name,
-                              template=template,
-                              network_name=network_name,
-                              num_cpu=num_cpu,
-                              memory_in_mb=mb_memory,
-                              storage_profile=storage_profile_name,
-                              ssh_key=ssh_key)
-                except Exception as err:
-                    raise e.NFSNodeCreationError("Error creating NFS node:",
-                                                 str(err))
-
             msg = f"Created cluster '{cluster_name}' ({cluster_id})"
             self._update_task(vcd_client.TaskStatus.SUCCESS, message=msg)
         except (e.MasterNodeCreationError, e.WorkerNodeCreationError,
@@ -959,7 +1103,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
                                           cluster_name,
                                           cluster_id=cluster_id,
                                           org_name=org_name,
-                                          ovdc_name=ovdc_name)
+                                          ovdc_name=ovdc_name,
+                                          metadata_keys=CLUSTER_ID_METADATA_KEYS) # noqa: E501
                     _delete_vapp(self.context.client, cluster['vdc_href'],
                                  cluster_name)
                 except Exception:
@@ -976,6 +1121,7 @@ class VcdBroker(abstract_broker.AbstractBroker):
             self._update_task(vcd_client.TaskStatus.ERROR,
                               error_message=str(err))
         finally:
+            self._update_cluster_inventory(cluster_id)
             self.context.end()
 
     # all parameters following '*args' are required and keyword-only
@@ -1065,12 +1211,14 @@ class VcdBroker(abstract_broker.AbstractBroker):
             self._update_task(vcd_client.TaskStatus.ERROR,
                               error_message=str(err))
         finally:
+            self._update_cluster_inventory(cluster_id)
             self.context.end()
 
     # all parameters following '*args' are required and keyword-only
     @utils.run_async
     def _delete_nodes_async(self, *args,
-                            cluster_name, vapp_href, node_names_list):
+                            cluster_name, cluster_id, vapp_href,
+                            node_names_list):
         try:
             msg = f"Draining {len(node_names_list)} node(s) from cluster " \
                   f"'{cluster_name}': {node_names_list}"
@@ -1106,11 +1254,13 @@ class VcdBroker(abstract_broker.AbstractBroker):
             self._update_task(vcd_client.TaskStatus.ERROR,
                               error_message=str(err))
         finally:
+            self._update_cluster_inventory(cluster_id)
             self.context.end()
 
     # all parameters following '*args' are required and keyword-only
     @utils.run_async
-    def _delete_cluster_async(self, *args, cluster_name, cluster_vdc_href):
+    def _delete_cluster_async(self, *args, cluster_name, cluster_id,
+                              cluster_vdc_href):
         try:
             msg = f"Deleting cluster '{cluster_name}'"
             self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
@@ -1123,6 +1273,8 @@ class VcdBroker(abstract_broker.AbstractBroker):
             self._update_task(vcd_client.TaskStatus.ERROR,
                               error_message=str(err))
         finally:
+            invalidate_kubeconfig_cache(cluster_id)
+            self._update_cluster_inventory(cluster_id)
             self.context.end()
 
     # all parameters following '*args' are required and keyword-only
@@ -1178,28 +1330,9 @@ class VcdBroker(abstract_broker.AbstractBroker):
                                                    template_revision,
                                                    ScriptFile.WORKER_K8S_UPGRADE) # noqa: E501
                 script = utils.read_data_file(filepath, logger=LOGGER)
-                for node in worker_node_names:
-                    msg = f"Draining node {node}"
-                    self._update_task(vcd_client.TaskStatus.RUNNING,
-                                      message=msg)
-                    _drain_nodes(self.context.sysadmin_client,
-                                 vapp_href,
-                                 [node],
-                                 cluster_name=cluster_name)
-
-                    msg = f"Upgrading Kubernetes ({c_k8s} " \
-                          f"-> {t_k8s}) in node {node}"
-                    self._update_task(vcd_client.TaskStatus.RUNNING,
-                                      message=msg)
-                    run_script_in_nodes(self.context.sysadmin_client,
-                                        vapp_href, [node], script)
-
-                    msg = f"Uncordoning node {node}"
-                    self._update_task(vcd_client.TaskStatus.RUNNING,
-                                      message=msg)
-                    _uncordon_nodes(self.context.sysadmin_client,
-                                    vapp_href, [node],
-                                    cluster_name=cluster_name)
+                self._upgrade_worker_nodes(
+                    vapp_href, worker_node_names, script, cluster_name,
+                    upgrade_msg=f"Upgrading Kubernetes ({c_k8s} -> {t_k8s})")
 
             if upgrade_docker or upgrade_cni:
                 msg = f"Draining all nodes {all_node_names}"
@@ -1249,7 +1382,7 @@ class VcdBroker(abstract_broker.AbstractBroker):
             }
             vapp = vcd_vapp.VApp(self.context.client, href=vapp_href)
             task = vapp.set_multiple_metadata(metadata)
-            self.context.client.get_task_monitor().wait_for_status(task)
+            vcd_utils.wait_for_task(self.context.client, task)
 
             msg = f"Successfully upgraded cluster '{cluster_name}' software " \
                   f"to match template {template_name} (revision " \
@@ -1264,8 +1397,123 @@ class VcdBroker(abstract_broker.AbstractBroker):
             LOGGER.error(msg, exc_info=True)
             self._update_task(vcd_client.TaskStatus.ERROR, error_message=msg)
         finally:
+            # kubeadm upgrades renew the cluster certificates
+            invalidate_kubeconfig_cache(cluster['cluster_id'])
+            self._update_cluster_inventory(cluster['cluster_id'])
             self.context.end()
 
+    def _upgrade_worker_nodes(self, vapp_href, worker_node_names, script,
+                              cluster_name, upgrade_msg):
+        """Upgrade worker nodes in rolling batches.
+
+        Up to 'upgrade_max_unavailable' (server config) workers at a time are
+        drained, upgraded concurrently and uncordoned. Stops after the first
+        batch in which a node failed.
+
+        :param str vapp_href:
+        :param list worker_node_names:
+        :param str script: upgrade script to run in the workers.
+        :param str cluster_name:
+        :param str upgrade_msg: task message describing the upgrade.
+
+        :raises NodeOperationError: if a node failed, along with the nodes
+            that were upgraded and the ones that were not.
+        """
+        max_unavailable = utils.get_server_runtime_config()['service'].get(
+            'upgrade_max_unavailable', DEFAULT_UPGRADE_MAX_UNAVAILABLE)
+        batch_size = utils.get_max_unavailable_count(max_unavailable,
+                                                     len(worker_node_names))
+        vapp = vcd_vapp.VApp(self.context.sysadmin_client, href=vapp_href)
+        upgraded = []
+        for i in range(0, len(worker_node_names), batch_size):
+            batch = worker_node_names[i:i + batch_size]
+            msg = f"Draining node(s) {batch}"
+            self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
+            try:
+                _drain_nodes(self.context.sysadmin_client, vapp_href, batch,
+                             cluster_name=cluster_name)
+            except Exception as err:
+                errors = {node: str(err) for node in batch}
+            else:
+                msg = f"{upgrade_msg} in node(s) {batch} " \
+                      f"({len(upgraded)}/{len(worker_node_names)} upgraded)"
+                self._update_task(vcd_client.TaskStatus.RUNNING, message=msg)
+                errors = _execute_script_in_nodes_with_errors(
+                    self.context.sysadmin_client, vapp, batch, script)
+
+                # Nodes upgraded successfully are uncordoned even if other
+                # nodes of the batch failed.
+                succeeded = [node for node in batch if node not in errors]
+                if succeeded:
+                    msg = f"Uncordoning node(s) {succeeded}"
+                    self._update_task(vcd_client.TaskStatus.RUNNING,
+                                      message=msg)
+                    try:
+                        _uncordon_nodes(self.context.sysadmin_client,
+                                        vapp_href, succeeded,
+                                        cluster_name=cluster_name)
+                        upgraded.extend(succeeded)
+                    except Exception as err:
+                        errors.update(
+                            (node, f"upgraded, but not uncordoned: {err}")
+                            for node in succeeded)
+
+            if errors:
+                not_upgraded = [node for node in worker_node_names
+                                if node not in upgraded
+                                and node not in errors]
+                raise e.NodeOperationError(
+                    f"Upgrade stopped, failed on node(s) {list(errors)}. "
+                    f"Upgraded node(s): {upgraded}. Node(s) not upgraded: "
+                    f"{not_upgraded}. Errors: {errors}")
+
+    def _get_cluster_and_vapp(self, validated_data, metadata_keys=None):
+        """Get the cluster of a request along with its vApp.
+
+        Clusters identified by cluster id or vApp href are read straight from
+        their vApp, others are queried by name, org and ovdc.
+
+        :param dict validated_data: request data, with defaults applied.
+        :param list metadata_keys: see get_all_clusters(), only used for
+            clusters queried by name.
+
+        :return: cluster data dictionary and pyvcloud.vcd.vapp.VApp
+
+        :rtype: tuple
+        """
+        cluster_name = validated_data[RequestKey.CLUSTER_NAME]
+        cluster_id = validated_data.get(RequestKey.CLUSTER_ID)
+        vapp_href = validated_data.get(RequestKey.VAPP_HREF)
+        ovdc_name = validated_data[RequestKey.OVDC_NAME]
+        if cluster_id is None and vapp_href is None:
+            cluster = get_cluster(self.context.client, cluster_name,
+                                  org_name=validated_data[RequestKey.ORG_NAME],
+                                  ovdc_name=ovdc_name,
+                                  metadata_keys=metadata_keys)
+            vapp = vcd_vapp.VApp(self.context.client,
+                                 href=cluster['vapp_href'])
+            return cluster, vapp
+
+        cluster, vapp = get_cluster_by_id(self.context.client,
+                                          cluster_id=cluster_id,
+                                          vapp_href=vapp_href)
+        if cluster['name'] != cluster_name or \
+                (ovdc_name is not None and cluster['vdc_name'] != ovdc_name):
+            raise e.ClusterNotFoundError(
+                f"Cluster '{cluster_name}' not found.")
+        return cluster, vapp
+
+    def _update_cluster_inventory(self, cluster_id):
+        """Update a cluster changed by this broker in the inventory."""
+        inventory = cluster_inventory.get_cluster_inventory()
+        if inventory is None:
+            return
+        try:
+            inventory.update_cluster(self.context.sysadmin_client, cluster_id)
+        except Exception as err:
+            LOGGER.warning(f"Failed to update cluster '{cluster_id}' in "
+                           f"cluster inventory: {err}")
+
     def _update_task(self, status, message='', error_message=None,
                      stack_trace=''):
         """Update task or create it if it does not exist.
@@ -1314,20 +1562,64 @@ class VcdBroker(abstract_broker.AbstractBroker):
         )
 
 
+def _run_kubectl_for_nodes(sysadmin_client, vapp_href, node_names,
+                           kubectl_command):
+    """Run a kubectl command for nodes of a cluster in parallel.
+
+    A single script is run in the first master node, which runs the command
+    once per node in the background and prints a status line per node.
+
+    :param pyvcloud.vcd.client.Client sysadmin_client:
+    :param str vapp_href:
+    :param list node_names: names of the nodes, each of which is passed as
+        the first argument of the command.
+    :param str kubectl_command: kubectl sub command and flags, e.g.
+        'uncordon'.
+
+    :return: exit code of the command keyed by node name.
+
+    :rtype: dict
+
+    :raises NodeOperationError: if the command failed for any node.
+    """
+    script = "#!/usr/bin/env bash\n" \
+             "run() {\n" \
+             f"    out=$(kubectl {kubectl_command} \"$1\" 2>&1)\n" \
+             "    rc=$?\n" \
+             "    if [ $rc -ne 0 ]; then echo \"$1: $out\" >&2; fi\n" \
+             f"    echo \"{KUBECTL_NODE_STATUS_PREFIX} $1 $rc\"\n" \
+             "}\n"
+    for node_name in node_names:
+        script += f"run '{node_name}' &\n"
+    script += "wait\n"
+
+    vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
+    master_node_names = get_node_names(vapp, NodeType.MASTER)
+    result = execute_script_in_nodes(sysadmin_client, vapp=vapp,
+                                     node_names=[master_node_names[0]],
+                                     script=script, check_tools=False)[0]
+    exit_codes = {}
+    for line in result[1].content.decode().splitlines():
+        tokens = line.split()
+        if len(tokens) == 3 and tokens[0] == KUBECTL_NODE_STATUS_PREFIX:
+            exit_codes[tokens[1]] = int(tokens[2])
+    failed_nodes = [node_name for node_name in node_names
+                    if exit_codes.get(node_name, -1) != 0]
+    if failed_nodes:
+        raise e.NodeOperationError(
+            f"kubectl {kubectl_command} failed for node(s) {failed_nodes}:\n"
+            f"{result[2].content.decode()}")
+    return exit_codes
+
+
 def _drain_nodes(sysadmin_client: vcd_client.Client, vapp_href, node_names,
                  cluster_name=''):
     LOGGER.debug(f"Draining nodes {node_names} in cluster '{cluster_name}' "
                  f"(vapp: {vapp_href})")
-    script = "#!/usr/bin/env bash\n"
-    for node_name in node_names:
-        script += f"kubectl drain {node_name} " \
-                  f"--ignore-daemonsets --timeout=60s --delete-local-data\n"
-
     try:
-        vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
-        master_node_names = get_node_names(vapp, NodeType.MASTER)
-        run_script_in_nodes(sysadmin_client, vapp_href, [master_node_names[0]],
-                            script)
+        _run_kubectl_for_nodes(
+            sysadmin_client, vapp_href, node_names,
+            "drain --ignore-daemonsets --timeout=60s --delete-local-data")
     except Exception as err:
         LOGGER.warning(f"Failed to drain nodes {node_names} in cluster "
                        f"'{cluster_name}' (vapp: {vapp_href}) with "
@@ -1344,15 +1636,9 @@ def _uncordon_nodes(sysadmin_client: vcd_client.Client, vapp_href, node_names,
 
     LOGGER.debug(f"Uncordoning nodes {node_names} in cluster '{cluster_name}' "
                  f"(vapp: {vapp_href})")
-    script = "#!/usr/bin/env bash\n"
-    for node_name in node_names:
-        script += f"kubectl uncordon {node_name}\n"
-
     try:
-        vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
-        master_node_names = get_node_names(vapp, NodeType.MASTER)
-        run_script_in_nodes(sysadmin_client, vapp_href, [master_node_names[0]],
-                            script)
+        _run_kubectl_for_nodes(sysadmin_client, vapp_href, node_names,
+                               "uncordon")
     except Exception as err:
         LOGGER.warning(f"Failed to uncordon nodes {node_names} in cluster "
                        f"'{cluster_name}' (vapp: {vapp_href}) "
@@ -1369,7 +1655,7 @@ def _delete_vapp(client, vdc_href, vapp_name):
     try:
         vdc = VDC(client, href=vdc_href)
         task = vdc.delete_vapp(vapp_name, force=True)
-        client.get_task_monitor().wait_for_status(task)
+        vcd_utils.wait_for_task(client, task)
     except Exception as err:
         LOGGER.warning(f"Failed to delete vapp {vapp_name} "
                        f"(vdc: {vdc_href}) with error: {err}")
@@ -1392,24 +1678,34 @@ def _delete_nodes(sysadmin_client: vcd_client.Client, vapp_href, node_names,
     vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
     try:
         master_node_names = get_node_names(vapp, NodeType.MASTER)
-        run_script_in_nodes(sysadmin_client, vapp_href, [master_node_names[0]],
-                            script)
+        results = execute_script_in_nodes(sysadmin_client, vapp=vapp,
+                                          node_names=[master_node_names[0]],
+                                          script=script, check_tools=False)
+        errors = get_script_execution_errors(results)
+        if errors:
+            raise e.ScriptExecutionError(errors)
     except Exception:
         LOGGER.warning(f"Failed to delete node(s) {node_names} from cluster "
                        f"'{cluster_name}' using kubectl (vapp: {vapp_href})")
 
-    vapp = vcd_vapp.VApp(sysadmin_client, href=vapp_href)
+    # Undeploy tasks of different VMs run concurrently in vCD, so they are
+    # all started before waiting for any of them.
+    tasks = []
     for vm_name in node_names:
         vm = vcd_vm.VM(sysadmin_client, resource=vapp.get_vm(vm_name))
         try:
-            task = vm.undeploy()
-            sysadmin_client.get_task_monitor().wait_for_status(task)
+            tasks.append(vm.undeploy())
         except Exception:
             LOGGER.warning(f"Failed to undeploy VM {vm_name} "
                            f"(vapp: {vapp_href})")
+    try:
+        vcd_utils.wait_for_tasks(sysadmin_client, tasks)
+    except Exception as err:
+        LOGGER.warning(f"Failed to undeploy VM(s) of {node_names} "
+                       f"(vapp: {vapp_href}): {err}")
 
     task = vapp.delete_vms(node_names)
-    sysadmin_client.get_task_monitor().wait_for_status(task)
+    vcd_utils.wait_for_task(sysadmin_client, task)
     LOGGER.debug(f"Successfully deleted node(s) {node_names} from "
                  f"cluster '{cluster_name}' (vapp: {vapp_href})")
 
@@ -1447,7 +1743,7 @@ def is_valid_cluster_name(name):
 
 
 def get_all_clusters(client, cluster_name=None, cluster_id=None,
-                     org_name=None, ovdc_name=None):
+                     org_name=None, ovdc_name=None, metadata_keys=None):
     """Get list of dictionaries containing data for each visible cluster.
 
     TODO define these cluster data dictionary keys better:
@@ -1456,7 +1752,115 @@ def get_all_clusters(client, cluster_name=None, cluster_id=None,
         'number_of_vms', 'template_name', 'template_revision',
         'cse_version', 'cluster_id', 'status', 'os', 'docker_version',
         'kubernetes', 'kubernetes_version', 'cni', 'cni_version'
+
+    Keys filled from cluster metadata are left empty unless their metadata
+    key is in @metadata_keys, which defaults to ALL_CLUSTER_METADATA_KEYS.
+    Fewer metadata keys take fewer vCD queries.
+    """
+    clusters, _ = _get_clusters(client, cluster_name=cluster_name,
+                                cluster_id=cluster_id, org_name=org_name,
+                                ovdc_name=ovdc_name,
+                                metadata_keys=metadata_keys)
+    return clusters
+
+
+def get_clusters_page(client, page, page_size, org_name=None,
+                      ovdc_name=None):
+    """Get a single page of the visible clusters, sorted by name.
+
+    :param pyvcloud.vcd.client.Client client:
+    :param int page: page number, starting at 1.
+    :param int page_size: max number of clusters per page.
+    :param str org_name: restrict clusters to this org.
+    :param str ovdc_name: restrict clusters to this org vdc.
+
+    :return: list of cluster data dictionaries as in get_all_clusters(), and
+        the total number of visible clusters.
+
+    :rtype: tuple
+    """
+    return _get_clusters(client, org_name=org_name, ovdc_name=ovdc_name,
+                         page=page, page_size=page_size)
+
+
+def get_cluster_inventory_entries(sysadmin_client, cluster_id=None):
+    """Get clusters along with their org names, for the cluster inventory.
+
+    :param pyvcloud.vcd.client.Client sysadmin_client:
+    :param str cluster_id: get only this cluster, all clusters if None.
+
+    :return: list of cluster_inventory.InventoryCluster
+
+    :rtype: list
+    """
+    clusters, _ = _query_clusters(sysadmin_client, cluster_id=cluster_id)
+    org_names = vcd_utils.get_org_names_from_ovdc_ids(
+        sysadmin_client, [c['vdc_id'] for c in clusters])
+    return [cluster_inventory.InventoryCluster(org_names.get(c['vdc_id']), c)
+            for c in clusters]
+
+
+def _get_clusters(client, cluster_name=None, cluster_id=None, org_name=None,
+                  ovdc_name=None, page=None, page_size=None,
+                  metadata_keys=None):
+    inventory = cluster_inventory.get_cluster_inventory()
+    if inventory is not None:
+        clusters = _find_inventory_clusters(inventory, client, cluster_name,
+                                            cluster_id, org_name, ovdc_name)
+        inventory.record_lookup(hit=clusters is not None)
+        if clusters is not None:
+            if page is None:
+                return clusters, None
+            # vApp ids break ties between clusters with the same name, so
+            # that pages don't overlap.
+            clusters.sort(key=lambda c: (c['name'], c['vapp_id']))
+            return clusters[(page - 1) * page_size:page * page_size], \
+                len(clusters)
+
+    return _query_clusters(client, cluster_name=cluster_name,
+                           cluster_id=cluster_id, org_name=org_name,
+                           ovdc_name=ovdc_name, page=page,
+                           page_size=page_size, metadata_keys=metadata_keys)
+
+
+def _find_inventory_clusters(inventory, client, cluster_name, cluster_id,
+                             org_name, ovdc_name):
+    """Find clusters visible to the client in the cluster inventory.
+
+    :return: list of cluster data dictionaries, or None if the inventory
+        can't be used, because it is stale or misses clusters that the
+        client can see.
+
+    :rtype: list
     """
+    # As with queries, org name is only considered for sysadmin.
+    entries = inventory.find_clusters(
+        cluster_name=cluster_name, cluster_id=cluster_id,
+        org_name=org_name if client.is_sysadmin() else None,
+        ovdc_name=ovdc_name)
+    if entries is None:
+        return None
+    clusters = [entry.cluster for entry in entries]
+    if client.is_sysadmin():
+        return clusters
+
+    # Tenants only see the clusters that vCD lets them see. Listing the
+    # visible vApps doesn't need their metadata, which is what makes
+    # cluster queries expensive.
+    query = client.get_typed_query(
+        vcd_client.ResourceType.VAPP.value,
+        query_result_format=vcd_client.QueryResultFormat.ID_RECORDS,
+        qfilter=_get_cluster_query_filter(cluster_name, cluster_id,
+                                          ovdc_name),
+        fields='name')
+    visible_vapp_ids = {record.get('id').split(':')[-1]
+                        for record in query.execute()}
+    if not visible_vapp_ids.issubset(c['vapp_id'] for c in clusters):
+        return None
+    return [c for c in clusters if c['vapp_id'] in visible_vapp_ids]
+
+
+def _get_cluster_query_filter(cluster_name, cluster_id, ovdc_name):
     query_filter = f'metadata:{ClusterMetadataKey.CLUSTER_ID}==STRING:*'
     if cluster_id is not None:
         query_filter = f'metadata:{ClusterMetadataKey.CLUSTER_ID}==STRING:{cluster_id}' # noqa: E501
@@ -1464,6 +1868,14 @@ def get_all_clusters(client, cluster_name=None, cluster_id=None,
         query_filter += f';name=={cluster_name}'
     if ovdc_name is not None:
         query_filter += f";vdcName=={ovdc_name}"
+    return query_filter
+
+
+def _query_clusters(client, cluster_name=None, cluster_id=None,
+                    org_name=None, ovdc_name=None, page=None, page_size=None,
+                    metadata_keys=None):
+    query_filter = _get_cluster_query_filter(cluster_name, cluster_id,
+                                             ovdc_name)
     resource_type = 'vApp'
     if client.is_sysadmin():
         resource_type = 'adminVApp'
@@ -1471,106 +1883,88 @@ def get_all_clusters(client, cluster_name=None, cluster_id=None,
             org_resource = client.get_org_by_name(org_name)
             org = vcd_org.Org(client, resource=org_resource)
             query_filter += f";org=={org.resource.get('id')}"
-
-    # 2 queries are required because each query can only return 8 metadata
-    q = client.get_typed_query(
-        resource_type,
-        query_result_format=vcd_client.QueryResultFormat.ID_RECORDS,
-        qfilter=query_filter,
-        fields=f'metadata:{ClusterMetadataKey.CLUSTER_ID}'
-               f',metadata:{ClusterMetadataKey.MASTER_IP}'
-               f',metadata:{ClusterMetadataKey.CSE_VERSION}'
-               f',metadata:{ClusterMetadataKey.TEMPLATE_NAME}'
-               f',metadata:{ClusterMetadataKey.TEMPLATE_REVISION}'
-               f',metadata:{ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME}' # noqa: E501
-               f',metadata:{ClusterMetadataKey.OS}')
-    q2 = client.get_typed_query(
-        resource_type,
-        query_result_format=vcd_client.QueryResultFormat.ID_RECORDS,
-        qfilter=query_filter,
-        fields=f'metadata:{ClusterMetadataKey.DOCKER_VERSION}'
-               f',metadata:{ClusterMetadataKey.KUBERNETES}'
-               f',metadata:{ClusterMetadataKey.KUBERNETES_VERSION}'
-               f',metadata:{ClusterMetadataKey.CNI}'
-               f',metadata:{ClusterMetadataKey.CNI_VERSION}')
-
-    metadata_key_to_cluster_key = {
-        ClusterMetadataKey.CLUSTER_ID: 'cluster_id',
-        ClusterMetadataKey.CSE_VERSION: 'cse_version',
-        ClusterMetadataKey.MASTER_IP: 'leader_endpoint',
-        ClusterMetadataKey.TEMPLATE_NAME: 'template_name',
-        ClusterMetadataKey.TEMPLATE_REVISION: 'template_revision',
-        ClusterMetadataKey.OS: 'os',
-        ClusterMetadataKey.DOCKER_VERSION: 'docker_version',
-        ClusterMetadataKey.KUBERNETES: 'kubernetes',
-        ClusterMetadataKey.KUBERNETES_VERSION: 'kubernetes_version',
-        ClusterMetadataKey.CNI: 'cni',
-        ClusterMetadataKey.CNI_VERSION: 'cni_version'
+    if metadata_keys is None:
+        metadata_keys = ALL_CLUSTER_METADATA_KEYS
+
+    # Paged queries are sorted, so that pages don't overlap.
+    sort_asc = 'name' if page is not None else None
+    query = MetadataQuery(client, resource_type, metadata_keys,
+                          qfilter=query_filter, sort_asc=sort_asc,
+                          page_size=page_size)
+
+    if page is None:
+        clusters = [_to_cluster_data(client, record, metadata)
+                    for record, metadata in query.execute()]
+        return clusters, None
+
+    results, result_total = query.execute_page(page)
+    clusters = [_to_cluster_data(client, record, metadata)
+                for record, metadata in results]
+    return clusters, result_total
+
+
+def _to_cluster_data(client, record, metadata):
+    """Get cluster data dictionary from a vApp query record."""
+    cluster = _get_cluster_data(
+        client, name=record.get('name'),
+        vapp_id=record.get('id').split(':')[-1],
+        vdc_id=record.get('vdc').split(':')[-1],
+        vdc_name=record.get('vdcName'),
+        number_of_vms=record.get('numberOfVMs'),
+        status=record.get('status'), metadata=metadata)
+    if cluster['cluster_id']:
+        with _CLUSTER_ID_INDEX_LOCK:
+            CLUSTER_ID_INDEX[cluster['cluster_id']] = IndexedCluster(
+                cluster['vapp_href'], cluster['vdc_id'], cluster['vdc_name'])
+    return cluster
+
+
+def _get_cluster_data(client, name, vapp_id, vdc_id, vdc_name,
+                      number_of_vms, status, metadata):
+    cluster = {
+        'name': name,
+        'vapp_id': vapp_id,
+        'vapp_href': f'{client.get_api_uri()}/vApp/vapp-{vapp_id}',
+        'vdc_name': vdc_name,
+        'vdc_href': f'{client.get_api_uri()}/vdc/{vdc_id}',
+        'vdc_id': vdc_id,
+        'leader_endpoint': '',
+        'master_nodes': [],
+        'nodes': [],
+        'nfs_nodes': [],
+        'number_of_vms': number_of_vms,
+        'template_name': '',
+        'template_revision': '',
+        'cse_version': '',
+        'cluster_id': '',
+        'status': status,
+        'os': '',
+        'docker_version': '',
+        'kubernetes': '',
+        'kubernetes_version': '',
+        'cni': '',
+        'cni_version': ''
     }
+    for metadata_key, cluster_key in METADATA_KEY_TO_CLUSTER_KEY.items():
+        if metadata_key in metadata:
+            cluster[cluster_key] = metadata[metadata_key]
 
-    clusters = {}
-    for record in q.execute():
-        vapp_id = record.get('id').split(':')[-1]
-        vdc_id = record.get('vdc').split(':')[-1]
-        vapp_href = f'{client.get_api_uri()}/vApp/vapp-{vapp_id}'
-
-        clusters[vapp_id] = {
-            'name': record.get('name'),
-            'vapp_id': vapp_id,
-            'vapp_href': vapp_href,
-            'vdc_name': record.get('vdcName'),
-            'vdc_href': f'{client.get_api_uri()}/vdc/{vdc_id}',
-            'vdc_id': vdc_id,
-            'leader_endpoint': '',
-            'master_nodes': [],
-            'nodes': [],
-            'nfs_nodes': [],
-            'number_of_vms': record.get('numberOfVMs'),
-            'template_name': '',
-            'template_revision': '',
-            'cse_version': '',
-            'cluster_id': '',
-            'status': record.get('status'),
-            'os': '',
-            'docker_version': '',
-            'kubernetes': '',
-            'kubernetes_version': '',
-            'cni': '',
-            'cni_version': ''
-        }
-
-        if hasattr(record, 'Metadata'):
-            for element in record.Metadata.MetadataEntry:
-                if element.Key in metadata_key_to_cluster_key:
-                    clusters[vapp_id][metadata_key_to_cluster_key[element.Key]] = str(element.TypedValue.Value) # noqa: E501
-                # for pre-2.5.0 cluster backwards compatibility
-                elif element.Key == ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME and clusters[vapp_id]['template_name'] == '': # noqa: E501
-                    clusters[vapp_id]['template_name'] = str(element.TypedValue.Value) # noqa: E501
-
-        # pre-2.6 clusters may not have kubernetes version metadata
-        if clusters[vapp_id]['kubernetes_version'] == '':
-            clusters[vapp_id]['kubernetes_version'] = ltm.get_k8s_version_from_template_name(clusters[vapp_id]['template_name']) # noqa: E501
-
-    # api query can fetch only 8 metadata at a time
-    # since we have more than 8 metadata, we need to use 2 queries
-    for record in q2.execute():
-        vapp_id = record.get('id').split(':')[-1]
-        if hasattr(record, 'Metadata'):
-            for element in record.Metadata.MetadataEntry:
-                if element.Key in metadata_key_to_cluster_key:
-                    clusters[vapp_id][metadata_key_to_cluster_key[element.Key]] = str(element.TypedValue.Value) # noqa: E501
-                # for pre-2.5.0 cluster backwards compatibility
-                elif element.Key == ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME and clusters[vapp_id]['template_name'] == '': # noqa: E501
-                    clusters[vapp_id]['template_name'] = str(element.TypedValue.Value) # noqa: E501
-
-    return list(clusters.values())
+    # for pre-2.5.0 cluster backwards compatibility
+    if cluster['template_name'] == '':
+        cluster['template_name'] = metadata.get(
+            ClusterMetadataKey.BACKWARD_COMPATIBILE_TEMPLATE_NAME, '')
+    # pre-2.6 clusters may not have kubernetes version metadata
+    if cluster['kubernetes_version'] == '':
+        cluster['kubernetes_version'] = ltm.get_k8s_version_from_template_name(cluster['template_name']) # noqa: E501
+    return cluster
 
 
 def get_cluster(client, cluster_name, cluster_id=None, org_name=None,
-                ovdc_name=None):
+                ovdc_name=None, metadata_keys=None):
     clusters = get_all_clusters(client, cluster_name=cluster_name,
                                 cluster_id=cluster_id, org_name=org_name,
-                                ovdc_name=ovdc_name)
+                                ovdc_name=ovdc_name,
+                                metadata_keys=metadata_keys)
     if len(clusters) > 1:
         raise e.CseDuplicateClusterError(f"Found multiple clusters named"
                                          f" '{cluster_name}'.")
@@ -1580,6 +1974,107 @@ def get_cluster(client, cluster_name, cluster_id=None, org_name=None,
     return clusters[0]
 
 
+def get_cluster_by_id(client, cluster_id=None, vapp_href=None):
+    """Get a cluster by id or vApp href, straight from its vApp.
+
+    The vApp and its metadata are fetched concurrently, along with the org
+    vdc of the cluster from CLUSTER_ID_INDEX. Clusters missing from the
+    index are queried, which indexes them for the next calls.
+
+    :param pyvcloud.vcd.client.Client client:
+    :param str cluster_id: id of the cluster, ignored if @vapp_href is set.
+    :param str vapp_href: href of the cluster vApp.
+
+    :return: cluster data dictionary as in get_all_clusters(), and the
+        cluster vApp.
+
+    :rtype: tuple
+
+    :raises ClusterNotFoundError: if the cluster doesn't exist or isn't
+        visible to the client.
+    :raises BadRequestError: if @vapp_href isn't a vApp href of the vCD of
+        the client.
+    """
+    if vapp_href is not None:
+        vapp_href = _get_vapp_href(client, vapp_href)
+    else:
+        with _CLUSTER_ID_INDEX_LOCK:
+            entry = CLUSTER_ID_INDEX.get(cluster_id)
+        if entry is None:
+            return _query_cluster_by_id(client, cluster_id)
+        vapp_href = entry.vapp_href
+
+    try:
+        vapp_resource, metadata = get_resource_with_metadata(client,
+                                                             vapp_href)
+    except (EntityNotFoundException, AccessForbiddenException) as err:
+        # Keep clusters that are only hidden from this client indexed.
+        if cluster_id is not None and \
+                isinstance(err, EntityNotFoundException):
+            _drop_indexed_cluster(cluster_id)
+        raise e.ClusterNotFoundError(
+            f"Cluster '{cluster_id or vapp_href}' not found.")
+
+    vapp_cluster_id = metadata.get(ClusterMetadataKey.CLUSTER_ID)
+    if vapp_cluster_id is None:
+        raise e.ClusterNotFoundError(
+            f"Cluster '{cluster_id or vapp_href}' not found.")
+    with _CLUSTER_ID_INDEX_LOCK:
+        entry = CLUSTER_ID_INDEX.get(vapp_cluster_id)
+    if entry is None or entry.vapp_href != vapp_href or \
+            (cluster_id is not None and cluster_id != vapp_cluster_id):
+        _drop_indexed_cluster(vapp_cluster_id)
+        return _query_cluster_by_id(client, vapp_cluster_id)
+
+    vms = vapp_resource.Children.Vm \
+        if hasattr(vapp_resource, 'Children') else []
+    status = int(vapp_resource.get('status'))
+    cluster = _get_cluster_data(
+        client, name=vapp_resource.get('name'),
+        vapp_id=vapp_resource.get('id').split(':')[-1],
+        vdc_id=entry.vdc_id, vdc_name=entry.vdc_name,
+        number_of_vms=str(len(vms)),
+        status=VAPP_STATUS_TO_RECORD_STATUS.get(status, str(status)),
+        metadata=metadata)
+    return cluster, vcd_vapp.VApp(client, resource=vapp_resource)
+
+
+def _get_vapp_href(client, vapp_href):
+    """Rebuild a vApp href sent in a request from the vApp id.
+
+    The href is fetched with the credentials of the client, so it must not
+    point anywhere else than a vApp of the vCD of the client.
+
+    :param pyvcloud.vcd.client.Client client:
+    :param str vapp_href: vApp href from the request.
+
+    :return: vApp href, as built by _get_cluster_data().
+
+    :rtype: str
+
+    :raises BadRequestError: if @vapp_href isn't a vApp href of the vCD of
+        @client.
+    """
+    prefix = f"{client.get_api_uri()}/vApp/vapp-"
+    vapp_id = vapp_href[len(prefix):] if vapp_href.startswith(prefix) else ''
+    if not _VAPP_ID_PATTERN.fullmatch(vapp_id):
+        raise e.BadRequestError(f"Invalid vApp href '{vapp_href}'.")
+    return f"{client.get_api_uri()}/vApp/vapp-{vapp_id}"
+
+
+def _query_cluster_by_id(client, cluster_id):
+    clusters = get_all_clusters(client, cluster_id=cluster_id)
+    if len(clusters) == 0:
+        raise e.ClusterNotFoundError(f"Cluster '{cluster_id}' not found.")
+    cluster = clusters[0]
+    return cluster, vcd_vapp.VApp(client, href=cluster['vapp_href'])
+
+
+def _drop_indexed_cluster(cluster_id):
+    with _CLUSTER_ID_INDEX_LOCK:
+        CLUSTER_ID_INDEX.pop(cluster_id, None)
+
+
 def get_template(name=None, revision=None):
     if (name is None and revision is not None) or (name is not None and revision is None): # noqa: E501
         raise ValueError("If template revision is specified, then template "
@@ -1635,14 +2130,14 @@ def add_nodes(sysadmin_client, num_nodes, node_type, org, vdc, vapp,
                 "fi"
 
         vapp.reload()
+        vm_names = set(vcd_utils.get_vms_by_name(vapp))
         for n in range(num_nodes):
             name = None
             while True:
                 name = f"{node_type}-{''.join(random.choices(string.ascii_lowercase + string.digits, k=4))}" # noqa: E501
-                try:
-                    vapp.get_vm(name)
-                except Exception:
+                if name not in vm_names:
                     break
+            vm_names.add(name)
             spec = {
                 'source_vm_name': source_vm,
                 'vapp': source_vapp.resource,
@@ -1659,7 +2154,7 @@ def add_nodes(sysadmin_client, num_nodes, node_type, org, vdc, vapp,
             specs.append(spec)
 
         task = vapp.add_vms(specs, power_on=False)
-        sysadmin_client.get_task_monitor().wait_for_status(task)
+        vcd_utils.wait_for_task(sysadmin_client, task, timeout=None)
         vapp.reload()
 
         if not num_cpu:
@@ -1667,36 +2162,36 @@ def add_nodes(sysadmin_client, num_nodes, node_type, org, vdc, vapp,
         if not memory_in_mb:
             memory_in_mb = template[LocalTemplateKey.MEMORY]
 
-        for spec in specs:
-            vm_name = spec['target_vm_name']
-            vm_resource = vapp.get_vm(vm_name)
-            vm = vcd_vm.VM(sysadmin_client, resource=vm_resource)
-
-            task = vm.modify_cpu(num_cpu)
-            sysadmin_client.get_task_monitor().wait_for_status(task)
-
-            task = vm.modify_memory(memory_in_mb)
-            sysadmin_client.get_task_monitor().wait_for_status(task)
-
-            task = vm.power_on()
-            sysadmin_client.get_task_monitor().wait_for_status(task)
-            vapp.reload()
-
-            if node_type == NodeType.NFS:
-                LOGGER.debug(f"Enabling NFS server on {vm_name}")
-                script_filepath = ltm.get_script_filepath(
-                    template[LocalTemplateKey.NAME],
-                    template[LocalTemplateKey.REVISION],
-                    ScriptFile.NFSD)
-                script = utils.read_data_file(script_filepath, logger=LOGGER)
-                exec_results = execute_script_in_nodes(
-                    sysadmin_client, vapp=vapp, node_names=[vm_name],
-                    script=script)
-                errors = get_script_execution_errors(exec_results)
-                if errors:
-                    raise e.ScriptExecutionError(
-                        "NFSD script execution failed on node "
-                        f"{vm_name}:{errors}")
+        # Tasks of different VMs run concurrently in vCD, so every step is
+        # started on all VMs before waiting for any of them.
+        vms = [vcd_vm.VM(sysadmin_client,
+                         resource=vapp.get_vm(spec['target_vm_name']))
+               for spec in specs]
+        vcd_utils.wait_for_tasks(
+            sysadmin_client, [vm.modify_cpu(num_cpu) for vm in vms])
+        vcd_utils.wait_for_tasks(
+            sysadmin_client, [vm.modify_memory(memory_in_mb) for vm in vms])
+        power_on_tasks = [vm.power_on() for vm in vms]
+        vcd_utils.wait_for_tasks(sysadmin_client, power_on_tasks)
+        if power_on_tasks:
+            task = power_on_tasks[-1]
+
+        if node_type == NodeType.NFS:
+            node_names = [spec['target_vm_name'] for spec in specs]
+            LOGGER.debug(f"Enabling NFS server on {node_names}")
+            script_filepath = ltm.get_script_filepath(
+                template[LocalTemplateKey.NAME],
+                template[LocalTemplateKey.REVISION],
+                ScriptFile.NFSD)
+            script = utils.read_data_file(script_filepath, logger=LOGGER)
+            exec_results = execute_script_in_nodes(
+                sysadmin_client, vapp=vapp, node_names=node_names,
+                script=script)
+            errors = get_script_execution_errors(exec_results)
+            if errors:
+                raise e.ScriptExecutionError(
+                    "NFSD script execution failed on node "
+                    f"{node_names}:{errors}")
     except Exception as err:
         # TODO: get details of the exception to determine cause of failure,
         # e.g. not enough resources available.
@@ -1707,14 +2202,62 @@ def add_nodes(sysadmin_client, num_nodes, node_type, org, vdc, vapp,
     return {'task': task, 'specs': specs}
 
 
-def get_node_names(vapp, node_type):
-    return [vm.get('name') for vm in vapp.get_all_vms() if vm.get('name').startswith(node_type)] # noqa: E501
+def _add_worker_and_nfs_nodes(sysadmin_client, num_workers, enable_nfs, org,
+                              vdc, vapp, catalog_name, template, network_name,
+                              num_cpu=None, memory_in_mb=None,
+                              storage_profile=None, ssh_key=None,
+                              cancelled=None):
+    """Add the worker nodes and the NFS node of a new cluster.
 
+    Meant to run while the master initializes, so @vapp should not be shared
+    with the caller. Workers are added before the NFS node, since a vApp
+    can't be recomposed by two tasks at once.
 
-def _wait_for_tools_ready_callback(message, exception=None):
-    LOGGER.debug(f"waiting for guest tools, status: {message}")
-    if exception is not None:
-        LOGGER.error(f"exception: {str(exception)}")
+    :param threading.Event cancelled: once set, nodes that are not being
+        added yet are skipped.
+    """
+    try:
+        add_nodes(sysadmin_client,
+                  num_nodes=num_workers,
+                  node_type=NodeType.WORKER,
+                  org=org,
+                  vdc=vdc,
+                  vapp=vapp,
+                  catalog_name=catalog_name,
+                  template=template,
+                  network_name=network_name,
+                  num_cpu=num_cpu,
+                  memory_in_mb=memory_in_mb,
+                  storage_profile=storage_profile,
+                  ssh_key=ssh_key)
+    except Exception as err:
+        raise e.WorkerNodeCreationError("Error creating worker node:",
+                                        str(err))
+
+    if cancelled is not None and cancelled.is_set():
+        return
+
+    if enable_nfs:
+        try:
+            add_nodes(sysadmin_client,
+                      num_nodes=1,
+                      node_type=NodeType.NFS,
+                      org=org,
+                      vdc=vdc,
+                      vapp=vapp,
+                      catalog_name=catalog_name,
+                      template=template,
+                      network_name=network_name,
+                      num_cpu=num_cpu,
+                      memory_in_mb=memory_in_mb,
+                      storage_profile=storage_profile,
+                      ssh_key=ssh_key)
+        except Exception as err:
+            raise e.NFSNodeCreationError("Error creating NFS node:", str(err))
+
+
+def get_node_names(vapp, node_type):
+    return [name for name in vcd_utils.get_vms_by_name(vapp) if name.startswith(node_type)] # noqa: E501
 
 
 def _wait_for_guest_execution_callback(message, exception=None):
@@ -1811,6 +2354,8 @@ def _wait_until_ready_to_exec(vs, vm, password, tries=30):
     ready = False
     script = "#!/usr/bin/env bash\n" \
              "uname -a\n"
+    delays = utils.exponential_backoff(GUEST_EXEC_RETRY_MIN_SECONDS,
+                                       GUEST_EXEC_RETRY_MAX_SECONDS)
     for _ in range(tries):
         result = vs.execute_script_in_guest(
             vm, 'root', password, script,
@@ -1825,7 +2370,7 @@ def _wait_until_ready_to_exec(vs, vm, password, tries=30):
             break
         LOGGER.info(f"Script returned {result[0]}; VM is not "
                     f"ready to execute scripts, yet")
-        time.sleep(2)
+        time.sleep(next(delays))
 
     if not ready:
         raise e.CseServerError('VM is not ready to execute scripts')
@@ -1834,24 +2379,77 @@ def _wait_until_ready_to_exec(vs, vm, password, tries=30):
 def execute_script_in_nodes(sysadmin_client: vcd_client.Client,
                             vapp, node_names, script,
                             check_tools=True, wait=True):
+    """Execute a script in nodes of a cluster, concurrently.
+
+    At most 'max_guest_ops_per_vcenter' nodes of a vCenter are worked on at
+    a time, see vsphere_utils.run_guest_ops() for errors.
+
+    :return: script results, in the order of @node_names.
+
+    :rtype: list
+    """
     vcd_utils.raise_error_if_not_sysadmin(sysadmin_client)
-    all_results = []
-    for node_name in node_names:
-        LOGGER.debug(f"will try to execute script on {node_name}:\n"
-                     f"{script}")
+    # Load the vApp once, instead of in every node thread.
+    vapp.get_resource()
+    # Nodes are worked on in threads, each with its own copy of the client.
+    return vs_utils.run_guest_ops(
+        lambda node_name: _execute_script_in_node(
+            vcd_utils.copy_client(sysadmin_client), vapp, node_name, script,
+            check_tools=check_tools, wait=wait),
+        node_names, logger=LOGGER)
+
+
+def _execute_script_in_nodes_with_errors(sysadmin_client: vcd_client.Client,
+                                         vapp, node_names, script):
+    """Execute a script in nodes concurrently, collecting errors per node.
 
-        vs = vs_utils.get_vsphere(sysadmin_client, vapp, vm_name=node_name,
-                                  logger=LOGGER)
-        vs.connect()
+    Unlike execute_script_in_nodes(), nodes don't fail each other: a node
+    fails if the script can't be run in it or exits with non zero status.
+
+    :return: error messages keyed by the names of the failed nodes.
+
+    :rtype: dict
+    """
+    vcd_utils.raise_error_if_not_sysadmin(sysadmin_client)
+    # Load the vApp once, instead of in every node thread.
+    vapp.get_resource()
+
+    # Nodes are worked on in threads, each with its own copy of the client.
+    def execute_script(node_name):
+        try:
+            result = _execute_script_in_node(
+                vcd_utils.copy_client(sysadmin_client), vapp, node_name,
+                script, check_tools=False)
+        except Exception as err:
+            LOGGER.error(f"Failed to execute script in node {node_name}: "
+                         f"{err}")
+            return str(err)
+        if result[0] != 0:
+            return result[2].content.decode()
+        return None
+
+    errors = vs_utils.run_guest_ops(execute_script, node_names,
+                                    logger=LOGGER)
+    return {node_name: error for node_name, error in zip(node_names, errors)
+            if error is not None}
+
+
+def _execute_script_in_node(sysadmin_client: vcd_client.Client,
+                            vapp, node_name, script,
+                            check_tools=True, wait=True):
+    LOGGER.debug(f"will try to execute script on {node_name}:\n"
+                 f"{script}")
+
+    if check_tools:
+        LOGGER.debug(f"waiting for tools on {node_name}")
+        wait_until_guest_ready(sysadmin_client, vapp, node_name,
+                               logger=LOGGER)
+    with vs_utils.pooled_vsphere(sysadmin_client, vapp, node_name,
+                                 logger=LOGGER) as vs:
         moid = vapp.get_vm_moid(node_name)
         vm = vs.get_vm_by_moid(moid)
         password = vapp.get_admin_password(node_name)
         if check_tools:
-            LOGGER.debug(f"waiting for tools on {node_name}")
-            vs.wait_until_tools_ready(
-                vm,
-                sleep=5,
-                callback=_wait_for_tools_ready_callback)
             _wait_until_ready_to_exec(vs, vm, password)
         LOGGER.debug(f"about to execute script on {node_name} "
                      f"(vm={vm}), wait={wait}")
@@ -1874,12 +2472,10 @@ def execute_script_in_nodes(sysadmin_client: vcd_client.Client,
             ]
             result_stdout = ''
             result_stderr = ''
-        LOGGER.debug(result[0])
-        LOGGER.debug(result_stderr)
-        LOGGER.debug(result_stdout)
-        all_results.append(result)
-
-    return all_results
+    LOGGER.debug(result[0])
+    LOGGER.debug(result_stderr)
+    LOGGER.debug(result_stdout)
+    return result
 
 
 def run_script_in_nodes(sysadmin_client: vcd_client.Client, vapp_href,
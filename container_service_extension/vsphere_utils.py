@@ -2,20 +2,107 @@
 # Copyright (c) 2019 VMware, Inc. All Rights Reserved.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import concurrent.futures
+import contextlib
+import threading
 from urllib.parse import urlparse
 
 from cachetools import LRUCache
 from pyvcloud.vcd.platform import Platform
 from pyvcloud.vcd.vapp import VApp
 from pyvcloud.vcd.vm import VM
+from pyVim.connect import Disconnect
+from pyVmomi import vim
 from vsphere_guest_run.vsphere import VSphere
 
+from container_service_extension.client_pool import ClientPool
+import container_service_extension.exceptions as e
 from container_service_extension.logger import NULL_LOGGER
+from container_service_extension.server_constants import \
+    DEFAULT_MAX_GUEST_OPS_PER_VCENTER
+from container_service_extension.server_constants import \
+    MAX_GUEST_OP_THREADS_PER_CALL
+from container_service_extension.server_constants import \
+    VCENTER_SESSION_HEALTH_CHECK_INTERVAL_SECONDS
+from container_service_extension.server_constants import \
+    VCENTER_SESSION_MAX_AGE_SECONDS
+from container_service_extension.utils import get_server_runtime_config
 from container_service_extension.utils import NullPrinter
+from container_service_extension.utils import run_async
 
 cache = LRUCache(maxsize=1024)
+cache_lock = threading.Lock()
 vsphere_list = []
 
+# vCenter name -> VSpherePool
+_vsphere_pools = {}
+_vsphere_pools_lock = threading.Lock()
+
+
+class VSpherePool(ClientPool):
+    """Thread safe pool of connected VSphere objects of a single vCenter.
+
+    On top of ClientPool, the number of borrowed VSphere objects is capped
+    at @max_sessions, borrow() blocks till one is released. Idle sessions
+    are kept for reuse up to the same number.
+    """
+
+    def __init__(self, vsphere_factory, size, max_sessions, max_age,
+                 health_check_interval, name):
+        """Initialize VSpherePool object.
+
+        :param function vsphere_factory: function that returns a new
+            connected VSphere object.
+        :param int max_sessions: max number of VSphere objects borrowed at a
+            time.
+
+        See ClientPool for other parameters.
+        """
+        super().__init__(vsphere_factory, size, max_age,
+                         health_check_interval, name=name)
+        self.max_sessions = max_sessions
+        self._sessions = threading.BoundedSemaphore(max_sessions)
+
+    def borrow(self):
+        self._sessions.acquire()
+        try:
+            return super().borrow()
+        except Exception:
+            self._sessions.release()
+            raise
+
+    def release(self, client):
+        if client is None:
+            return
+        try:
+            super().release(client)
+        finally:
+            self._sessions.release()
+
+    def discard(self, client):
+        if client is None:
+            return
+        try:
+            super().discard(client)
+        finally:
+            self._sessions.release()
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['max_sessions'] = self.max_sessions
+        return stats
+
+    def _check_session(self, client):
+        # Reading the current session also resets vCenter's idle timer.
+        if client.service_instance.content.sessionManager.currentSession is None: # noqa: E501
+            raise Exception(f"{self.name} session is not authenticated")
+
+    def _logout(self, client):
+        try:
+            Disconnect(client.service_instance)
+        except Exception:
+            pass
+
 
 def populate_vsphere_list(vcs):
     """Populate the gloabl variable holding info on vCenter servers.
@@ -29,23 +116,23 @@ def populate_vsphere_list(vcs):
     vsphere_list = vcs
 
 
-def get_vsphere(sys_admin_client, vapp, vm_name, logger=NULL_LOGGER):
-    """Get the VSphere object for a specific VM inside a VApp.
+def get_vcenter_info(sys_admin_client, vapp, vm_name):
+    """Get the vCenter of a specific VM inside a VApp.
 
     :param pyvcloud.vcd.vapp.VApp vapp: VApp used to get the VM ID.
     :param str vm_name:
-    :param logging.Logger logger: logger to log with.
 
-    :return: VSphere object for a specific VM inside a VApp
+    :return: name, hostname, port, username and password of the vCenter.
 
-    :rtype: vsphere_guest_run.vsphere.VSphere
+    :rtype: dict
     """
-    global cache
     global vsphere_list
 
     # get vm id from vm resource
     vm_id = vapp.get_vm(vm_name).get('id')
-    if vm_id not in cache:
+    with cache_lock:
+        cache_item = cache.get(vm_id)
+    if cache_item is None:
         # recreate vapp with sys admin client
         vapp = VApp(sys_admin_client, href=vapp.href)
         vm_resource = vapp.get_vm(vm_name)
@@ -55,6 +142,7 @@ def get_vsphere(sys_admin_client, vapp, vm_name, logger=NULL_LOGGER):
         vcenter = platform.get_vcenter(vcenter_name)
         vcenter_url = urlparse(vcenter.Url.text)
         cache_item = {
+            'name': vcenter_name,
             'hostname': vcenter_url.hostname,
             'port': vcenter_url.port
         }
@@ -66,12 +154,172 @@ def get_vsphere(sys_admin_client, vapp, vm_name, logger=NULL_LOGGER):
                 cache_item['username'] = vc['username']
                 cache_item['password'] = vc['password']
                 break
-        cache[vm_id] = cache_item
+        with cache_lock:
+            cache[vm_id] = cache_item
+    return cache_item
+
+
+def get_vsphere(sys_admin_client, vapp, vm_name, logger=NULL_LOGGER):
+    """Get the VSphere object for a specific VM inside a VApp.
+
+    :param pyvcloud.vcd.vapp.VApp vapp: VApp used to get the VM ID.
+    :param str vm_name:
+    :param logging.Logger logger: logger to log with.
+
+    :return: VSphere object for a specific VM inside a VApp
+
+    :rtype: vsphere_guest_run.vsphere.VSphere
+    """
+    vcenter = get_vcenter_info(sys_admin_client, vapp, vm_name)
+    logger.debug(f"VM: {vm_name}, Hostname: {vcenter['hostname']}")
+
+    return VSphere(vcenter['hostname'], vcenter['username'],
+                   vcenter['password'], vcenter['port'])
+
+
+def connect_vsphere(vcenter):
+    """Log in to a vCenter.
+
+    :param dict vcenter: vCenter as returned by get_vcenter_info().
+
+    :return: connected VSphere object.
+
+    :rtype: vsphere_guest_run.vsphere.VSphere
+    """
+    vs = VSphere(vcenter['hostname'], vcenter['username'],
+                 vcenter['password'], vcenter['port'])
+    vs.connect()
+    return vs
+
+
+def get_vsphere_pool(vcenter):
+    """Get the server wide pool of sessions of a vCenter.
+
+    The pool is created on first use. At most 'max_guest_ops_per_vcenter'
+    (server config) sessions of the vCenter are in use at a time, across
+    all requests.
+
+    :param dict vcenter: vCenter as returned by get_vcenter_info().
+
+    :rtype: VSpherePool
+    """
+    with _vsphere_pools_lock:
+        pool = _vsphere_pools.get(vcenter['name'])
+        if pool is None:
+            max_sessions = get_server_runtime_config()['service'].get(
+                'max_guest_ops_per_vcenter',
+                DEFAULT_MAX_GUEST_OPS_PER_VCENTER)
+            pool = VSpherePool(
+                lambda: connect_vsphere(vcenter),
+                size=max_sessions,
+                max_sessions=max_sessions,
+                max_age=VCENTER_SESSION_MAX_AGE_SECONDS,
+                health_check_interval=VCENTER_SESSION_HEALTH_CHECK_INTERVAL_SECONDS, # noqa: E501
+                name=f"vCenter '{vcenter['name']}' session")
+            run_async(pool.run_keepalive)()
+            _vsphere_pools[vcenter['name']] = pool
+        return pool
+
+
+@contextlib.contextmanager
+def pooled_vsphere(sys_admin_client, vapp, vm_name, logger=NULL_LOGGER):
+    """Borrow a connected VSphere object for the vCenter of a VM.
+
+    Usage:
+        with pooled_vsphere(sys_admin_client, vapp, vm_name) as vs:
+            ...
+
+    Blocks while the vCenter has 'max_guest_ops_per_vcenter' sessions in
+    use. A session that vCenter no longer accepts is discarded, so that the
+    next caller gets a new one.
+
+    :param pyvcloud.vcd.vapp.VApp vapp: VApp used to get the VM ID.
+    :param str vm_name:
+    :param logging.Logger logger: logger to log with.
+
+    :return: connected VSphere object, which must not be used after the
+        block.
+
+    :rtype: vsphere_guest_run.vsphere.VSphere
+    """
+    vcenter = get_vcenter_info(sys_admin_client, vapp, vm_name)
+    logger.debug(f"VM: {vm_name}, vCenter: {vcenter['name']}")
+    pool = get_vsphere_pool(vcenter)
+    vs = pool.borrow()
+    try:
+        yield vs
+    except vim.fault.NotAuthenticated:
+        pool.discard(vs)
+        vs = None
+        raise
+    finally:
+        pool.release(vs)
+
+
+def get_vsphere_pool_stats():
+    """Get stats of the vCenter session pools, keyed by vCenter name."""
+    with _vsphere_pools_lock:
+        pools = dict(_vsphere_pools)
+    return {name: pool.get_stats() for name, pool in pools.items()}
+
+
+def close_vsphere_pools():
+    """Log out all pooled vCenter sessions."""
+    with _vsphere_pools_lock:
+        pools = list(_vsphere_pools.values())
+        _vsphere_pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def run_guest_ops(guest_op, vm_names, logger=NULL_LOGGER):
+    """Run guest operations on VMs concurrently.
+
+    :param function guest_op: function that takes a VM name, works on the
+        VM and returns a result. It should use the VM's vCenter through
+        pooled_vsphere(), which limits the VMs worked on at a time. It runs
+        in several threads at once, so it must not share a vCD client with
+        them, see pyvcloud_utils.copy_client().
+    :param list vm_names: names of the VMs to work on.
+    :param logging.Logger logger: logger to log errors of VMs with.
+
+    :return: results of @guest_op, in the order of @vm_names.
+
+    :rtype: list
+
+    :raises Exception: once all VMs are done, the error of the failed VM if
+        there is a single one.
+    :raises NodeOperationError: once all VMs are done, if several VMs
+        failed. The error message holds the error of every failed VM.
+    """
+    if len(vm_names) <= 1:
+        return [guest_op(vm_name) for vm_name in vm_names]
 
-    logger.debug(f"VM ID: {vm_id}, Hostname: {cache[vm_id]['hostname']}")
+    max_workers = min(len(vm_names), MAX_GUEST_OP_THREADS_PER_CALL)
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='guest-op') as executor:
+        futures = [executor.submit(guest_op, vm_name)
+                   for vm_name in vm_names]
+        concurrent.futures.wait(futures)
 
-    return VSphere(cache[vm_id]['hostname'], cache[vm_id]['username'],
-                   cache[vm_id]['password'], cache[vm_id]['port'])
+    results = []
+    errors = {}
+    for vm_name, future in zip(vm_names, futures):
+        err = future.exception()
+        if err is None:
+            results.append(future.result())
+        else:
+            logger.error(f"Guest operation failed on VM {vm_name}: {err}")
+            errors[vm_name] = err
+    if len(errors) == 1:
+        raise next(iter(errors.values()))
+    if errors:
+        details = '\n'.join(f"{vm_name}: {err}"
+                            for vm_name, err in errors.items())
+        raise e.NodeOperationError(
+            f"Guest operations failed on nodes {list(errors)}:\n{details}")
+    return results
 
 
 def vgr_callback(prepend_msg='',
@@ -0,0 +1,355 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Benchmark of the CSE server request path against local stand-ins.
+
+Requests go through MessageConsumer.on_message() and
+request_processor.process_request(), exactly as in a running server. vCD is
+replaced by FakeVcd, RabbitMQ by InMemoryBroker and vCenter by
+FakeVSphere.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+import click
+
+import container_service_extension.cluster_inventory as cluster_inventory
+from container_service_extension.consumer import MessageConsumer
+import container_service_extension.pyvcloud_utils as vcd_utils
+from container_service_extension.server_constants import ConsumerEngine
+from container_service_extension.service import ServerState
+from container_service_extension.service import Service
+import container_service_extension.vcdbroker as vcdbroker
+import container_service_extension.vsphere_utils as vs_utils
+from perf_tests.fake_amqp import InMemoryBroker
+from perf_tests.fake_amqp import InMemoryConnection
+from perf_tests.fake_vcd import FakeVcd
+from perf_tests.fake_vcd import KUBECONFIG
+from perf_tests.fake_vcd import SYSADMIN_PASSWORD
+from perf_tests.fake_vcd import SYSADMIN_USER
+
+TEMPLATE_NAME = 'ubuntu-16.04_k8-1.18_weave-2.6.5'
+TEMPLATE_REVISION = 1
+OPERATIONS = ['list', 'info', 'config', 'create']
+
+
+# vCenter of all cluster VMs, as returned by vsphere_utils.get_vcenter_info()
+FAKE_VCENTER = {
+    'name': 'vc1',
+    'hostname': 'localhost',
+    'port': 443,
+    'username': 'administrator@vsphere.local',
+    'password': 'password'
+}
+
+
+class FakeVSphere(object):
+    """Stand-in for vsphere_utils' VSphere, for cluster config requests."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.host = FAKE_VCENTER['hostname']
+
+    def connect(self):
+        time.sleep(self.latency)
+
+    def get_vm_by_moid(self, moid):
+        time.sleep(self.latency)
+        return moid
+
+    def download_file_from_guest(self, vm, user, password, filename):
+        time.sleep(self.latency)
+        return _FileResponse(200, KUBECONFIG.encode())
+
+
+class _FileResponse(object):
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+
+def _get_server_config(vcd_url, processors, late_ack,
+                       inventory_refresh_interval, kubeconfig_cache_ttl):
+    return {
+        'vcd': {
+            'host': vcd_url,
+            'port': 443,
+            'username': SYSADMIN_USER,
+            'password': SYSADMIN_PASSWORD,
+            'api_version': '34.0',
+            'verify': False,
+            'log': False
+        },
+        'vcs': [],
+        'service': {
+            'listeners': 1,
+            'processors': processors,
+            'late_ack': late_ack,
+            'engine': ConsumerEngine.THREADS,
+            'cluster_inventory_refresh_interval': inventory_refresh_interval,
+            'kubeconfig_cache_ttl': kubeconfig_cache_ttl,
+            'enforce_authorization': False,
+            'log_wire': False,
+            'telemetry': {
+                'enable': False
+            }
+        },
+        'broker': {
+            'default_template_name': TEMPLATE_NAME,
+            'default_template_revision': TEMPLATE_REVISION,
+            'templates': [{
+                'name': TEMPLATE_NAME,
+                'revision': TEMPLATE_REVISION
+            }],
+            'storage_profile': '*'
+        }
+    }
+
+
+def _start_server(vcd_url, processors, late_ack, inventory_refresh_interval,
+                  kubeconfig_cache_ttl):
+    service = Service(config_file=None, should_check_config=False)
+    service.config = _get_server_config(vcd_url, processors, late_ack,
+                                        inventory_refresh_interval,
+                                        kubeconfig_cache_ttl)
+    service._state = ServerState.RUNNING
+    if inventory_refresh_interval > 0:
+        inventory = cluster_inventory.start_cluster_inventory(
+            vcdbroker.get_cluster_inventory_entries,
+            vcd_utils.pooled_sys_admin_client,
+            refresh_interval=inventory_refresh_interval,
+            max_staleness=2 * inventory_refresh_interval)
+        while inventory.get_stats()['sweeps'] == 0:
+            time.sleep(0.01)
+
+
+def _get_request(operation, fake_vcd, index, by_id):
+    """Get method, uri, query string and body of a request."""
+    clusters = list(fake_vcd.clusters.values())
+    org_clusters = [c for c in clusters
+                    if c.vdc.org.name == clusters[0].vdc.org.name]
+    cluster = org_clusters[index % len(org_clusters)]
+    query_string = urlencode({'cluster_id': cluster.cluster_id}) \
+        if by_id else ''
+    if operation == 'list':
+        return 'GET', '/api/cse/clusters', '', None
+    if operation == 'info':
+        return 'GET', f"/api/cse/cluster/{cluster.name}", query_string, None
+    if operation == 'config':
+        return 'GET', f"/api/cse/cluster/{cluster.name}/config", \
+            query_string, None
+    if operation == 'create':
+        return 'POST', '/api/cse/clusters', '', {
+            'cluster_name': f"new-{index}-{threading.get_ident()}",
+            'org_name': cluster.vdc.org.name,
+            'ovdc_name': cluster.vdc.name,
+            'network_name': 'ovdc-net',
+            'rollback': False
+        }
+    raise ValueError(f"Unknown operation '{operation}'")
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def run_benchmark(fake_vcd, broker, operation, listeners, processors,
+                  late_ack, num_requests, concurrency, warmup, by_id=False):
+    """Run requests of one operation through a set of listeners.
+
+    :return: latency percentiles in ms, throughput in requests per second,
+        number of failed requests and vCD calls per request.
+
+    :rtype: dict
+    """
+    connections = []
+    for _ in range(listeners):
+        consumer = MessageConsumer(
+            host='localhost', port=5672, ssl=False, vhost='/',
+            username='guest', password='guest', exchange='cse-exchange',
+            routing_key='cse', num_processors=processors, late_ack=late_ack)
+        connection = InMemoryConnection(broker, consumer)
+        connection.start()
+        connections.append(connection)
+
+    token = fake_vcd.tenant_token()
+    counter = iter(range(10**9))
+    counter_lock = threading.Lock()
+
+    def send_request():
+        with counter_lock:
+            index = next(counter)
+        method, uri, query_string, body = \
+            _get_request(operation, fake_vcd, index, by_id)
+        return broker.call(method, uri, token, query_string=query_string,
+                           body=body)
+
+    try:
+        for _ in range(warmup):
+            send_request()
+        fake_vcd.reset_request_counts()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            replies = list(executor.map(lambda _: send_request(),
+                                        range(num_requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        for connection in connections:
+            connection.stop()
+            if connection.consumer._ctpe is not None:
+                connection.consumer._ctpe.shutdown(wait=True)
+
+    latencies = sorted(reply.latency * 1000 for reply in replies)
+    failed = [reply for reply in replies if reply.status_code >= 400]
+    vcd_calls = sum(fake_vcd.request_counts.values())
+    return {
+        'operation': operation,
+        'listeners': listeners,
+        'requests': num_requests,
+        'failed': len(failed),
+        'p50_ms': _percentile(latencies, 50),
+        'p90_ms': _percentile(latencies, 90),
+        'p99_ms': _percentile(latencies, 99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+        'throughput': num_requests / elapsed if elapsed else 0.0,
+        'vcd_calls_per_request': vcd_calls / num_requests,
+        'first_error': failed[0].body if failed else None
+    }
+
+
+def _check_regressions(results, baseline_file, tolerance):
+    """Compare results with a baseline, return the regressions found."""
+    with open(baseline_file) as f:
+        baseline = {(r['operation'], r['listeners']): r
+                    for r in json.load(f)}
+    regressions = []
+    for result in results:
+        base = baseline.get((result['operation'], result['listeners']))
+        if base is None:
+            continue
+        name = f"{result['operation']} with {result['listeners']} listeners"
+        if result['p50_ms'] > base['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {result['p50_ms']:.1f} ms, "
+                               f"baseline {base['p50_ms']:.1f} ms")
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput "
+                               f"{result['throughput']:.1f} req/s, "
+                               f"baseline {base['throughput']:.1f} req/s")
+        if result['vcd_calls_per_request'] > base['vcd_calls_per_request']:
+            regressions.append(f"{name}: "
+                               f"{result['vcd_calls_per_request']:.1f} vCD "
+                               f"calls per request, baseline "
+                               f"{base['vcd_calls_per_request']:.1f}")
+    return regressions
+
+
+@click.command()
+@click.option('--operation', '-o', 'operations', multiple=True,
+              type=click.Choice(OPERATIONS), default=OPERATIONS,
+              help='Operation to benchmark, can be repeated')
+@click.option('--listeners', '-l', 'listener_counts', multiple=True,
+              type=int, default=[1, 4, 10],
+              help='Number of listeners, can be repeated')
+@click.option('--processors', type=int, default=0,
+              help='Worker threads per listener (service.processors)')
+@click.option('--late-ack', is_flag=True,
+              help='Acknowledge messages after replying (service.late_ack)')
+@click.option('--requests', '-n', 'num_requests', type=int, default=200,
+              help='Number of measured requests per run')
+@click.option('--concurrency', '-c', type=int, default=16,
+              help='Number of requests in flight')
+@click.option('--warmup', type=int, default=10,
+              help='Number of unmeasured requests per run')
+@click.option('--clusters', type=int, default=50,
+              help='Number of clusters in the fake vCD')
+@click.option('--vcd-latency', type=float, default=0.005,
+              help='Seconds added to every fake vCD/vCenter response')
+@click.option('--cluster-inventory', 'inventory_refresh_interval', type=int,
+              default=0, help='Refresh interval in seconds of the cluster '
+                              'inventory (service.cluster_inventory_refresh_'
+                              'interval), 0 to disable it')
+@click.option('--kubeconfig-cache-ttl', type=int, default=0,
+              help='Time in seconds for which kube configs are cached '
+                   '(service.kubeconfig_cache_ttl), 0 to disable caching')
+@click.option('--by-id', is_flag=True,
+              help='Identify clusters of info and config requests by '
+                   'cluster id as well as by name')
+@click.option('--output', type=click.Path(resolve_path=True),
+              help='Write results to this json file')
+@click.option('--baseline', type=click.Path(exists=True, resolve_path=True),
+              help='Fail if results regress from this json file')
+@click.option('--tolerance', type=float, default=0.2,
+              help='Allowed latency/throughput regression from baseline')
+def main(operations, listener_counts, processors, late_ack, num_requests,
+         concurrency, warmup, clusters, vcd_latency,
+         inventory_refresh_interval, kubeconfig_cache_ttl, by_id, output,
+         baseline, tolerance):
+    """Benchmark CSE server request processing."""
+    # pyvcloud and vcd-cli write their log files to the working directory,
+    # so the benchmark runs in a temporary directory to keep them out of the
+    # source tree. Paths of options are already resolved.
+    log_dir = tempfile.mkdtemp(prefix='cse-perf-tests-')
+    os.chdir(log_dir)
+    fake_vcd = FakeVcd(clusters_per_vdc=clusters, latency=vcd_latency)
+    fake_vcd.start()
+    vs_utils.get_vcenter_info = lambda *args, **kwargs: FAKE_VCENTER
+    vs_utils.VSphere = lambda *args, **kwargs: FakeVSphere(vcd_latency)
+    _start_server(fake_vcd.url, processors, late_ack,
+                  inventory_refresh_interval, kubeconfig_cache_ttl)
+    broker = InMemoryBroker()
+
+    results = []
+    click.echo(f"{'operation':<10}{'listeners':>10}{'failed':>8}"
+               f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+               f"{'req/s':>10}{'vCD calls':>11}")
+    try:
+        for operation in operations:
+            for listeners in listener_counts:
+                result = run_benchmark(
+                    fake_vcd, broker, operation, listeners, processors,
+                    late_ack, num_requests, concurrency, warmup, by_id)
+                results.append(result)
+                click.echo(f"{operation:<10}{listeners:>10}"
+                           f"{result['failed']:>8}"
+                           f"{result['p50_ms']:>10.1f}"
+                           f"{result['p90_ms']:>10.1f}"
+                           f"{result['p99_ms']:>10.1f}"
+                           f"{result['max_ms']:>10.1f}"
+                           f"{result['throughput']:>10.1f}"
+                           f"{result['vcd_calls_per_request']:>11.1f}")
+                if result['first_error']:
+                    click.echo(f"  first error: {result['first_error']}")
+    finally:
+        cluster_inventory.stop_cluster_inventory()
+        vcd_utils.close_sys_admin_client_pool()
+        vs_utils.close_vsphere_pools()
+        fake_vcd.stop()
+    click.echo(f"pyvcloud and vcd-cli logs are in {log_dir}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        regressions = _check_regressions(results, baseline, tolerance)
+        for regression in regressions:
+            click.secho(f"Regression: {regression}", fg='red')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
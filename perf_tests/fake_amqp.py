@@ -0,0 +1,156 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""In-memory stand-in for the AMQP broker and pika connections.
+
+Requests are delivered to MessageConsumer.on_message() the way pika does it:
+on a single thread per connection, which also runs the callbacks scheduled
+with add_callback_threadsafe(), and no more than prefetch count messages
+are left unacknowledged.
+"""
+
+import base64
+import collections
+import json
+import queue
+import threading
+import time
+import uuid
+
+import pika
+
+REPLY_EXCHANGE = 'reply-exchange'
+REPLY_QUEUE = 'reply-queue'
+
+Reply = collections.namedtuple('Reply', ['status_code', 'body', 'latency'])
+
+
+class InMemoryBroker(object):
+    """Request queue shared by all listeners, and the replies to requests."""
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        # correlation id -> [send time, reply event, reply]
+        self._pending = {}
+        self._delivery_tag = 0
+
+    def call(self, method, uri, auth_token, query_string='', body=None,
+             timeout=300):
+        """Send a CSE request and wait for its reply.
+
+        :return: status code, body and latency of the reply.
+
+        :rtype: Reply
+        """
+        request_id = str(uuid.uuid4())
+        message = [{
+            'id': request_id,
+            'method': method,
+            'requestUri': uri,
+            'queryString': query_string,
+            'headers': {
+                'Accept': 'application/*+json;version=34.0',
+                'x-vcloud-authorization': auth_token
+            },
+            'body': base64.b64encode(json.dumps(body).encode()).decode()
+            if body is not None else ''
+        }]
+        properties = pika.BasicProperties(
+            correlation_id=request_id,
+            reply_to=REPLY_QUEUE,
+            app_id='perf_tests',
+            headers={'replyToExchange': REPLY_EXCHANGE})
+        pending = [time.perf_counter(), threading.Event(), None]
+        with self._lock:
+            self._pending[request_id] = pending
+        self._requests.put((properties, json.dumps(message).encode()))
+        if not pending[1].wait(timeout):
+            raise TimeoutError(f"No reply to {method} {uri}")
+        return pending[2]
+
+    def get_request(self, timeout):
+        properties, body = self._requests.get(timeout=timeout)
+        with self._lock:
+            self._delivery_tag += 1
+            delivery_tag = self._delivery_tag
+        basic_deliver = pika.spec.Basic.Deliver(delivery_tag=delivery_tag,
+                                                redelivered=False)
+        return basic_deliver, properties, body
+
+    def publish_reply(self, properties, body):
+        now = time.perf_counter()
+        with self._lock:
+            pending = self._pending.pop(properties.correlation_id, None)
+        if pending is None:
+            return
+        reply = json.loads(body)
+        reply_body = json.loads(base64.b64decode(reply['body']).decode())
+        pending[2] = Reply(reply['statusCode'], reply_body, now - pending[0])
+        pending[1].set()
+
+
+class InMemoryChannel(object):
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self.unacked = 0
+
+    def basic_ack(self, delivery_tag):
+        self.unacked -= 1
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.broker.publish_reply(properties, body)
+
+
+class InMemoryConnection(object):
+    """A pika connection along with its ioloop, run by one listener thread.
+
+    As with pika, the channel is only used from the listener thread.
+    """
+
+    def __init__(self, broker, consumer):
+        self.broker = broker
+        self.consumer = consumer
+        self.channel = InMemoryChannel(broker)
+        self._callbacks = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = None
+        consumer._connection = self
+        consumer._channel = self.channel
+
+    def add_callback_threadsafe(self, callback):
+        self._callbacks.put(callback)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        prefetch_count = self.consumer.num_processors
+        while not self._stopped.is_set():
+            while True:
+                try:
+                    self._callbacks.get_nowait()()
+                except queue.Empty:
+                    break
+            if prefetch_count and self.channel.unacked >= prefetch_count:
+                try:
+                    self._callbacks.get(timeout=0.01)()
+                except queue.Empty:
+                    pass
+                continue
+            try:
+                basic_deliver, properties, body = \
+                    self.broker.get_request(timeout=0.001)
+            except queue.Empty:
+                continue
+            self.channel.unacked += 1
+            self.consumer.on_message(self.channel, basic_deliver, properties,
+                                     body)
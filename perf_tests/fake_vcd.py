@@ -0,0 +1,533 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Local stand-in for the vCD REST api, backed by an in-memory inventory.
+
+Only the calls made by CSE server for cluster list, info, config and create
+are served. Responses are modelled on real vCD responses closely enough for
+pyvcloud to parse them.
+"""
+
+import collections
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import re
+import threading
+import time
+from urllib.parse import parse_qs
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+import uuid
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+
+from container_service_extension.server_constants import ClusterMetadataKey
+from container_service_extension.server_constants import NodeType
+
+SYSADMIN_USER = 'administrator'
+SYSADMIN_PASSWORD = 'password'
+SYSADMIN_TOKEN = 'sysadmin-token'
+TENANT_TOKEN_PREFIX = 'tenant-token-'
+KUBECONFIG = 'apiVersion: v1\nkind: Config\nclusters: []\n'
+
+_NAMESPACES = 'xmlns="http://www.vmware.com/vcloud/v1.5" ' \
+    'xmlns:ovf="http://schemas.dmtf.org/ovf/envelope/1" ' \
+    'xmlns:ovfenv="http://schemas.dmtf.org/ovf/environment/1" ' \
+    'xmlns:rasd="http://schemas.dmtf.org/wbem/wscim/1/cim-schema/2/' \
+    'CIM_ResourceAllocationSettingData" ' \
+    'xmlns:ve="http://www.vmware.com/schema/ovfenv" ' \
+    'xmlns:vcloud="http://www.vmware.com/vcloud/v1.5" ' \
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+
+# (query type, query format) served by the typed query endpoint
+_QUERY_TYPES = [
+    ('vApp', 'idrecords'),
+    ('adminVApp', 'idrecords'),
+    ('adminOrgVdc', 'idrecords'),
+    ('user', 'records'),
+    ('adminUser', 'records')
+]
+
+FakeOrg = collections.namedtuple('FakeOrg', ['name', 'id', 'user_id'])
+FakeVdc = collections.namedtuple('FakeVdc', ['name', 'id', 'org'])
+FakeVm = collections.namedtuple('FakeVm', ['name', 'id', 'ip', 'moid'])
+FakeCluster = collections.namedtuple(
+    'FakeCluster', ['name', 'vapp_id', 'cluster_id', 'vdc', 'vms'])
+
+
+def _attrs(**kwargs):
+    return ' '.join(f"{k}={quoteattr(str(v))}" for k, v in kwargs.items())
+
+
+class FakeVcd(object):
+    """In-memory vCD inventory served over HTTP on localhost.
+
+    Every tenant org has one user, whose token is returned by tenant_token().
+    Each cluster is a vApp with one control plane vm and
+    @workers_per_cluster worker vms, tagged with CSE cluster metadata.
+    """
+
+    def __init__(self, num_orgs=1, vdcs_per_org=1, clusters_per_vdc=10,
+                 workers_per_cluster=2, latency=0.0):
+        """Initialize FakeVcd object.
+
+        :param int num_orgs: number of tenant orgs.
+        :param int vdcs_per_org: number of org vdcs in every org.
+        :param int clusters_per_vdc: number of clusters in every org vdc.
+        :param int workers_per_cluster: number of worker vms per cluster.
+        :param float latency: time in seconds added to every response, to
+            emulate vCD processing time.
+        """
+        self.latency = latency
+        self.system_org = FakeOrg('System', str(uuid.uuid4()),
+                                  str(uuid.uuid4()))
+        self.orgs = {}
+        self.vdcs = {}
+        self.clusters = {}
+        self.tasks = {}
+        ip_suffix = 0
+        for i in range(num_orgs):
+            org = FakeOrg(f"org{i}", str(uuid.uuid4()), str(uuid.uuid4()))
+            self.orgs[org.id] = org
+            for j in range(vdcs_per_org):
+                vdc = FakeVdc(f"ovdc{j}", str(uuid.uuid4()), org)
+                self.vdcs[vdc.id] = vdc
+                for k in range(clusters_per_vdc):
+                    vms = []
+                    node_names = [f"{NodeType.MASTER}-{k:04d}"] + \
+                        [f"{NodeType.WORKER}-{k:04d}-{w}"
+                         for w in range(workers_per_cluster)]
+                    for node_name in node_names:
+                        ip_suffix += 1
+                        vms.append(FakeVm(
+                            node_name, str(uuid.uuid4()),
+                            f"10.{ip_suffix // 65536 % 256}."
+                            f"{ip_suffix // 256 % 256}.{ip_suffix % 256}",
+                            f"vm-{ip_suffix}"))
+                    cluster = FakeCluster(f"cluster-{i}-{j}-{k}",
+                                          str(uuid.uuid4()),
+                                          str(uuid.uuid4()), vdc, vms)
+                    self.clusters[cluster.vapp_id] = cluster
+        self.request_counts = collections.Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.url = None
+
+    def tenant_token(self, org_index=0):
+        """Get the auth token of the user of a tenant org."""
+        return f"{TENANT_TOKEN_PREFIX}{list(self.orgs.values())[org_index].name}"  # noqa: E501
+
+    def start(self):
+        handler = type('_Handler', (_FakeVcdRequestHandler,), {'vcd': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset_request_counts(self):
+        with self._lock:
+            self.request_counts.clear()
+
+    def count_request(self, route):
+        with self._lock:
+            self.request_counts[route] += 1
+
+    def get_org_by_token(self, token):
+        if token == SYSADMIN_TOKEN:
+            return self.system_org
+        if token and token.startswith(TENANT_TOKEN_PREFIX):
+            org_name = token[len(TENANT_TOKEN_PREFIX):]
+            for org in self.orgs.values():
+                if org.name == org_name:
+                    return org
+        return None
+
+    def get_org(self, org_id):
+        if org_id == self.system_org.id:
+            return self.system_org
+        return self.orgs.get(org_id)
+
+    def find_clusters(self, caller_org, qfilter):
+        """Get clusters visible to an org, matching a vCD query filter.
+
+        Only the conditions used by CSE are supported: name, vdcName, org,
+        the cluster id metadata, and vApp ids joined by ','.
+        """
+        conditions = {}
+        vapp_ids = None
+        for condition in qfilter.split(';') if qfilter else []:
+            if condition.startswith('id=='):
+                vapp_ids = {unquote(id_condition).split(':')[-1]
+                            for id_condition in condition.split(',')}
+                continue
+            key, _, value = condition.partition('==')
+            conditions[key] = unquote(value)
+        cluster_id_key = f"metadata:{ClusterMetadataKey.CLUSTER_ID}"
+        cluster_id = conditions.get(cluster_id_key, 'STRING:*')
+        cluster_id = cluster_id.split(':', 1)[-1]
+        clusters = []
+        for cluster in self.clusters.values():
+            org = cluster.vdc.org
+            if caller_org is not self.system_org and org is not caller_org:
+                continue
+            if 'org' in conditions and \
+                    conditions['org'].split(':')[-1] != org.id:
+                continue
+            if 'name' in conditions and conditions['name'] != cluster.name:
+                continue
+            if 'vdcName' in conditions and \
+                    conditions['vdcName'] != cluster.vdc.name:
+                continue
+            if cluster_id != '*' and cluster_id != cluster.cluster_id:
+                continue
+            if vapp_ids is not None and cluster.vapp_id not in vapp_ids:
+                continue
+            clusters.append(cluster)
+        return clusters
+
+    def get_cluster_metadata(self, cluster):
+        return {
+            ClusterMetadataKey.CLUSTER_ID: cluster.cluster_id,
+            ClusterMetadataKey.MASTER_IP: cluster.vms[0].ip,
+            ClusterMetadataKey.CSE_VERSION: '3.0.0',
+            ClusterMetadataKey.TEMPLATE_NAME: 'ubuntu-16.04_k8-1.18_weave-2.6.5',  # noqa: E501
+            ClusterMetadataKey.TEMPLATE_REVISION: '1',
+            ClusterMetadataKey.OS: 'ubuntu-16.04',
+            ClusterMetadataKey.DOCKER_VERSION: '19.03.5',
+            ClusterMetadataKey.KUBERNETES: 'upstream',
+            ClusterMetadataKey.KUBERNETES_VERSION: '1.18.6',
+            ClusterMetadataKey.CNI: 'weave',
+            ClusterMetadataKey.CNI_VERSION: '2.6.5'
+        }
+
+
+class _FakeVcdRequestHandler(BaseHTTPRequestHandler):
+    # keep-alive, as pyvcloud reuses connections
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+    vcd: FakeVcd = None
+
+    _ROUTES = [
+        ('POST', r'/cloudapi/1\.0\.0/sessions/provider', '_login'),
+        ('GET', r'/api/session', '_get_session'),
+        ('DELETE', r'/api/session', '_logout'),
+        ('GET', r'/api/org', '_get_org_list'),
+        ('GET', r'/api/org/(?P<org_id>[^/]+)', '_get_org'),
+        ('GET', r'/api/admin/org/(?P<org_id>[^/]+)', '_get_admin_org'),
+        ('GET', r'/api/admin/vdc/(?P<vdc_id>[^/]+)', '_get_admin_vdc'),
+        ('GET', r'/api/vdc/(?P<vdc_id>[^/]+)', '_get_vdc'),
+        ('POST', r'/api/vdc/(?P<vdc_id>[^/]+)/action/composeVApp',
+         '_compose_vapp'),
+        ('GET', r'/api/query', '_query'),
+        ('GET', r'/api/admin/user/(?P<user_id>[^/]+)', '_get_user'),
+        ('POST', r'/api/tasksList/(?P<org_id>[^/]+)', '_create_task'),
+        ('PUT', r'/api/task/(?P<task_id>[^/]+)', '_update_task'),
+        ('GET', r'/api/task/(?P<task_id>[^/]+)', '_get_task'),
+        ('GET', r'/api/vApp/vapp-(?P<vapp_id>[^/]+)', '_get_vapp'),
+        ('GET', r'/api/vApp/vapp-(?P<vapp_id>[^/]+)/metadata',
+         '_get_vapp_metadata'),
+    ]
+    _COMPILED_ROUTES = [(method, re.compile(f"^{pattern}$"), name)
+                        for method, pattern, name in _ROUTES]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        length = int(self.headers.get('Content-Length') or 0)
+        self.request_body = self.rfile.read(length) if length else b''
+        if self.vcd.latency:
+            time.sleep(self.vcd.latency)
+
+        for route_method, pattern, name in self._COMPILED_ROUTES:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                self.vcd.count_request(f"{method} {pattern.pattern[1:-1]}")
+                if name != '_login' and self._get_caller_org() is None:
+                    self._send_error(401, 'Unauthorized')
+                    return
+                getattr(self, name)(**match.groupdict())
+                return
+        self.vcd.count_request(f"{method} <unknown>")
+        self._send_error(404, f"Resource not found: {method} {url.path}")
+
+    def _get_caller_org(self):
+        token = self.headers.get('x-vcloud-authorization')
+        authorization = self.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):]
+        return self.vcd.get_org_by_token(token)
+
+    def _send(self, status, body='', content_type='application/*+xml',
+              headers=None):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message):
+        self._send(status, f'<Error {_NAMESPACES} '
+                           f'{_attrs(majorErrorCode=status, message=message, minorErrorCode="ERROR")}/>')  # noqa: E501
+
+    def _href(self, path):
+        return f"{self.vcd.url}/api/{path}"
+
+    def _login(self):
+        self._send(200, '{}', content_type='application/json',
+                   headers={'X-VMWARE-VCLOUD-ACCESS-TOKEN': SYSADMIN_TOKEN})
+
+    def _logout(self):
+        self._send(204)
+
+    def _get_session(self):
+        org = self._get_caller_org()
+        is_sysadmin = org is self.vcd.system_org
+        user = SYSADMIN_USER if is_sysadmin else f"{org.name}-user"
+        role = 'System Administrator' if is_sysadmin \
+            else 'Organization Administrator'
+        body = f'<Session {_NAMESPACES} ' \
+            f'{_attrs(org=org.name, user=user, userId=f"urn:vcloud:user:{org.user_id}", roles=role, href=self._href("session"), type="application/vnd.vmware.vcloud.session+xml")}>' \
+            f'<Link {_attrs(rel="down", type="application/vnd.vmware.vcloud.orgList+xml", href=self._href("org"))}/>' \
+            f'<Link {_attrs(rel="down", type="application/vnd.vmware.vcloud.org+xml", name=org.name, href=self._href(f"org/{org.id}"))}/>' \
+            f'<Link {_attrs(rel="down", type="application/vnd.vmware.vcloud.query.queryList+xml", href=self._href("query"))}/>' \
+            f'</Session>'  # noqa: E501
+        token = self.headers.get('x-vcloud-authorization') or SYSADMIN_TOKEN
+        self._send(200, body, headers={'x-vcloud-authorization': token})
+
+    def _get_org_list(self):
+        caller_org = self._get_caller_org()
+        orgs = list(self.vcd.orgs.values())
+        if caller_org is not self.vcd.system_org:
+            orgs = [caller_org]
+        links = ''.join(
+            f'<Org {_attrs(name=org.name, href=self._href(f"org/{org.id}"), type="application/vnd.vmware.vcloud.org+xml")}/>'  # noqa: E501
+            for org in orgs)
+        self._send(200, f'<OrgList {_NAMESPACES}>{links}</OrgList>')
+
+    def _get_org(self, org_id, tag='Org'):
+        org = self.vcd.get_org(org_id)
+        if org is None:
+            self._send_error(404, f"Org {org_id} not found")
+            return
+        links = [
+            f'<Link {_attrs(rel="down", type="application/vnd.vmware.vcloud.tasksList+xml", href=self._href(f"tasksList/{org.id}"))}/>'  # noqa: E501
+        ]
+        for vdc in self.vcd.vdcs.values():
+            if vdc.org is org:
+                links.append(f'<Link {_attrs(rel="down", type="application/vnd.vmware.vcloud.vdc+xml", name=vdc.name, href=self._href(f"vdc/{vdc.id}"))}/>')  # noqa: E501
+        self._send(200, f'<{tag} {_NAMESPACES} '
+                        f'{_attrs(name=org.name, id=f"urn:vcloud:org:{org.id}", href=self._href(f"org/{org.id}"))}>'  # noqa: E501
+                        f'{"".join(links)}</{tag}>')
+
+    def _get_admin_org(self, org_id):
+        self._get_org(org_id, tag='AdminOrg')
+
+    def _get_vdc(self, vdc_id, tag='Vdc', org_path='org', org_type='application/vnd.vmware.vcloud.org+xml'):  # noqa: E501
+        vdc = self.vcd.vdcs.get(vdc_id)
+        if vdc is None:
+            self._send_error(404, f"Vdc {vdc_id} not found")
+            return
+        self._send(200, f'<{tag} {_NAMESPACES} '
+                        f'{_attrs(name=vdc.name, id=f"urn:vcloud:vdc:{vdc.id}", href=self._href(f"vdc/{vdc.id}"))}>'  # noqa: E501
+                        f'<Link {_attrs(rel="up", type=org_type, href=self._href(f"{org_path}/{vdc.org.id}"))}/>'  # noqa: E501
+                        f'<Link {_attrs(rel="add", type="application/vnd.vmware.vcloud.composeVAppParams+xml", href=self._href(f"vdc/{vdc.id}/action/composeVApp"))}/>'  # noqa: E501
+                        f'</{tag}>')
+
+    def _get_admin_vdc(self, vdc_id):
+        self._get_vdc(vdc_id, tag='AdminVdc', org_path='admin/org',
+                      org_type='application/vnd.vmware.admin.organization+xml')  # noqa: E501
+
+    def _compose_vapp(self, vdc_id):
+        # vApp creation is not emulated, create requests fail at this point
+        # in the background, after the request has been answered.
+        self._send_error(400, 'Composing vApps is not supported by fake vCD')
+
+    def _query(self):
+        query_type = self.query.get('type', [None])[0]
+        if query_type is None:
+            links = ''.join(
+                f'<Link {_attrs(rel="down", type=f"application/vnd.vmware.vcloud.query.{query_format}+xml", name=name, href=self._href(f"query?type={name}&format={query_format}"))}/>'  # noqa: E501
+                for name, query_format in _QUERY_TYPES)
+            self._send(200, f'<QueryList {_NAMESPACES}>{links}</QueryList>')
+            return
+        if query_type in ('user', 'adminUser'):
+            self._query_users(query_type)
+        elif query_type == 'adminOrgVdc':
+            self._query_vdcs(query_type)
+        else:
+            self._query_vapps(query_type)
+
+    def _query_users(self, query_type):
+        caller_org = self._get_caller_org()
+        orgs = list(self.vcd.orgs.values()) + [self.vcd.system_org]
+        qfilter = self.query.get('filter', [''])[0]
+        records = []
+        for org in orgs:
+            user = SYSADMIN_USER if org is self.vcd.system_org \
+                else f"{org.name}-user"
+            if query_type == 'user' and org is not caller_org:
+                continue
+            if f"name=={user}" not in qfilter and 'name==' in qfilter:
+                continue
+            tag = 'AdminUserRecord' if query_type == 'adminUser' \
+                else 'UserRecord'
+            records.append(f'<{tag} {_attrs(name=user, href=self._href(f"admin/user/{org.user_id}"))}/>')  # noqa: E501
+        self._send(200, self._query_result(query_type, 'records', records,
+                                           len(records), 1, len(records)))
+
+    def _query_vdcs(self, query_type):
+        # Only a filter on vdc ids, joined by ',' is supported.
+        qfilter = self.query.get('filter', [''])[0]
+        vdc_ids = [unquote(condition).split(':')[-1]
+                   for condition in qfilter.split(',') if condition]
+        vdcs = [vdc for vdc in self.vcd.vdcs.values()
+                if not vdc_ids or vdc.id in vdc_ids]
+        records = [f'<AdminVdcRecord {_attrs(id=f"urn:vcloud:vdc:{vdc.id}", name=vdc.name, org=f"urn:vcloud:org:{vdc.org.id}", orgName=vdc.org.name, href=self._href(f"admin/vdc/{vdc.id}"))}/>'  # noqa: E501
+                   for vdc in vdcs]
+        self._send(200, self._query_result(query_type, 'idrecords', records,
+                                           len(records), 1, len(records)))
+
+    def _query_vapps(self, query_type):
+        caller_org = self._get_caller_org()
+        page = int(self.query.get('page', ['1'])[0])
+        page_size = int(self.query.get('pageSize', ['25'])[0])
+        qfilter = self.query.get('filter', [''])[0]
+        fields = self.query.get('fields', [''])[0].split(',')
+        metadata_keys = [field[len('metadata:'):] for field in fields
+                         if field.startswith('metadata:')]
+        clusters = self.vcd.find_clusters(caller_org, qfilter)
+        if self.query.get('sortAsc', [None])[0] == 'name':
+            clusters.sort(key=lambda c: c.name)
+        total = len(clusters)
+        clusters = clusters[(page - 1) * page_size:page * page_size]
+
+        tag = 'AdminVAppRecord' if query_type == 'adminVApp' \
+            else 'VAppRecord'
+        records = []
+        for cluster in clusters:
+            metadata = self.vcd.get_cluster_metadata(cluster)
+            entries = ''.join(
+                f'<MetadataEntry><Key>{escape(key)}</Key>'
+                f'<TypedValue xsi:type="MetadataStringValue">'
+                f'<Value>{escape(metadata[key])}</Value></TypedValue>'
+                f'</MetadataEntry>'
+                for key in metadata_keys if key in metadata)
+            records.append(
+                f'<{tag} {_attrs(id=f"urn:vcloud:vapp:{cluster.vapp_id}", name=cluster.name, vdc=f"urn:vcloud:vdc:{cluster.vdc.id}", vdcName=cluster.vdc.name, numberOfVMs=len(cluster.vms), status="POWERED_ON", href=self._href(f"vApp/vapp-{cluster.vapp_id}"))}>'  # noqa: E501
+                f'<Metadata>{entries}</Metadata></{tag}>')
+        self._send(200, self._query_result(query_type, 'idrecords', records,
+                                           total, page, page_size))
+
+    def _query_result(self, query_type, query_format, records, total, page,
+                      page_size):
+        next_page = ''
+        if page * page_size < total:
+            query = '&'.join(f"{k}={v[0]}" for k, v in self.query.items()
+                             if k != 'page')
+            next_page = f'<Link {_attrs(rel="nextPage", href=self._href(f"query?{query}&page={page + 1}"))}/>'  # noqa: E501
+        attrs = _attrs(name=query_type, total=total, page=page,
+                       pageSize=page_size,
+                       type=f"application/vnd.vmware.vcloud.query.{query_format}+xml")  # noqa: E501
+        return f'<QueryResultRecords {_NAMESPACES} {attrs}>' \
+            f'{next_page}{"".join(records)}</QueryResultRecords>'
+
+    def _get_user(self, user_id):
+        for org in list(self.vcd.orgs.values()) + [self.vcd.system_org]:
+            if org.user_id == user_id:
+                user = SYSADMIN_USER if org is self.vcd.system_org \
+                    else f"{org.name}-user"
+                self._send(200, f'<User {_NAMESPACES} '
+                                f'{_attrs(name=user, href=self._href(f"admin/user/{user_id}"))}/>')  # noqa: E501
+                return
+        self._send_error(404, f"User {user_id} not found")
+
+    def _create_task(self, org_id):
+        self._update_task(str(uuid.uuid4()))
+
+    def _update_task(self, task_id):
+        body = self.request_body.decode()
+        match = re.search(r'status="([^"]*)"', body)
+        status = match.group(1) if match else 'running'
+        with self.vcd._lock:
+            self.vcd.tasks[task_id] = status
+        self._get_task(task_id)
+
+    def _get_task(self, task_id):
+        status = self.vcd.tasks.get(task_id)
+        if status is None:
+            self._send_error(404, f"Task {task_id} not found")
+            return
+        self._send(200, f'<Task {_NAMESPACES} '
+                        f'{_attrs(status=status, id=f"urn:vcloud:task:{task_id}", href=self._href(f"task/{task_id}"))}/>')  # noqa: E501
+
+    def _get_visible_cluster(self, vapp_id):
+        """Get the cluster of a vApp, or send an error if not visible."""
+        cluster = self.vcd.clusters.get(vapp_id)
+        if cluster is None:
+            self._send_error(404, f"vApp {vapp_id} not found")
+            return None
+        caller_org = self._get_caller_org()
+        if caller_org is not self.vcd.system_org and \
+                cluster.vdc.org is not caller_org:
+            self._send_error(403, f"vApp {vapp_id} not accessible")
+            return None
+        return cluster
+
+    def _get_vapp(self, vapp_id):
+        cluster = self._get_visible_cluster(vapp_id)
+        if cluster is None:
+            return
+        vms = ''.join(
+            f'<Vm {_attrs(name=vm.name, id=f"urn:vcloud:vm:{vm.id}", href=self._href(f"vApp/vm-{vm.id}"))}>'  # noqa: E501
+            f'<ovf:VirtualHardwareSection><ovf:Item>'
+            f'<rasd:Connection vcloud:ipAddress="{vm.ip}">ovdc-net</rasd:Connection>'  # noqa: E501
+            f'</ovf:Item></ovf:VirtualHardwareSection>'
+            f'<GuestCustomizationSection><AdminPassword>password</AdminPassword></GuestCustomizationSection>'  # noqa: E501
+            f'<ovfenv:Environment ve:vCenterId="{vm.moid}"/>'
+            f'</Vm>'
+            for vm in cluster.vms)
+        self._send(200, f'<VApp {_NAMESPACES} '
+                        f'{_attrs(name=cluster.name, id=f"urn:vcloud:vapp:{cluster.vapp_id}", status=4, href=self._href(f"vApp/vapp-{cluster.vapp_id}"))}>'  # noqa: E501
+                        f'<Children>{vms}</Children></VApp>')
+
+    def _get_vapp_metadata(self, vapp_id):
+        cluster = self._get_visible_cluster(vapp_id)
+        if cluster is None:
+            return
+        metadata = self.vcd.get_cluster_metadata(cluster)
+        entries = ''.join(
+            f'<MetadataEntry><Key>{escape(key)}</Key>'
+            f'<TypedValue xsi:type="MetadataStringValue">'
+            f'<Value>{escape(value)}</Value></TypedValue>'
+            f'</MetadataEntry>'
+            for key, value in metadata.items())
+        self._send(200, f'<Metadata {_NAMESPACES}>{entries}</Metadata>')
@@ -0,0 +1,208 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+from container_service_extension.cluster_inventory import ClusterInventory
+from container_service_extension.cluster_inventory import InventoryCluster
+from container_service_extension.vcdbroker import _find_inventory_clusters
+
+
+def _entry(cluster_id, vapp_id, status='POWERED_ON', org_name='org1'):
+    return InventoryCluster(org_name, {
+        'name': f'cluster-{cluster_id}',
+        'cluster_id': cluster_id,
+        'vapp_id': vapp_id,
+        'vdc_name': 'vdc1',
+        'status': status
+    })
+
+
+class FakeVcd:
+    """Clusters in vCD, as returned by the fetch_clusters function."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        # called by a sweep once it fetched all clusters
+        self.on_sweep_fetched = None
+
+    def fetch_clusters(self, sysadmin_client, cluster_id):
+        if cluster_id is not None:
+            return [entry for entry in self.entries
+                    if entry.cluster['cluster_id'] == cluster_id]
+        entries = list(self.entries)
+        if self.on_sweep_fetched is not None:
+            self.on_sweep_fetched()
+        return entries
+
+
+class FakeQuery:
+    def __init__(self, records):
+        self.records = records
+
+    def execute(self):
+        return iter(self.records)
+
+
+class FakeClient:
+    """vCD client to which the vApps with @visible_vapp_ids are visible."""
+
+    def __init__(self, is_sysadmin, visible_vapp_ids=()):
+        self._is_sysadmin = is_sysadmin
+        self.visible_vapp_ids = visible_vapp_ids
+        self.qfilters = []
+
+    def is_sysadmin(self):
+        return self._is_sysadmin
+
+    def get_typed_query(self, resource_type, query_result_format,
+                        qfilter=None, fields=None):
+        self.qfilters.append(qfilter)
+        return FakeQuery([{'id': f'urn:vcloud:vapp:{vapp_id}'}
+                          for vapp_id in self.visible_vapp_ids])
+
+
+def _get_statuses(inventory):
+    return {entry.cluster['cluster_id']: entry.cluster['status']
+            for entry in inventory.find_clusters()}
+
+
+def test_find_clusters_before_first_sweep():
+    inventory = ClusterInventory(FakeVcd([]).fetch_clusters,
+                                 refresh_interval=60, max_staleness=120)
+    assert inventory.find_clusters() is None
+
+
+def test_sweep():
+    vcd = FakeVcd([_entry('c1', 'v1'), _entry('c2', 'v2', org_name='org2')])
+    inventory = ClusterInventory(vcd.fetch_clusters, refresh_interval=60,
+                                 max_staleness=120)
+    inventory.sweep(None)
+    assert _get_statuses(inventory) == {'c1': 'POWERED_ON',
+                                        'c2': 'POWERED_ON'}
+    assert len(inventory.find_clusters(org_name='ORG2')) == 1
+    assert len(inventory.find_clusters(org_name='System')) == 2
+    assert inventory.find_clusters(cluster_name='cluster-c3') == []
+
+    vcd.entries = [_entry('c2', 'v2')]
+    inventory.sweep(None)
+    assert _get_statuses(inventory) == {'c2': 'POWERED_ON'}
+    assert inventory.get_stats()['sweeps'] == 2
+
+
+def test_find_clusters_returns_copies():
+    vcd = FakeVcd([_entry('c1', 'v1')])
+    inventory = ClusterInventory(vcd.fetch_clusters, refresh_interval=60,
+                                 max_staleness=120)
+    inventory.sweep(None)
+    inventory.find_clusters()[0].cluster['status'] = 'DELETED'
+    assert _get_statuses(inventory) == {'c1': 'POWERED_ON'}
+
+
+def test_find_clusters_when_stale():
+    vcd = FakeVcd([_entry('c1', 'v1')])
+    inventory = ClusterInventory(vcd.fetch_clusters, refresh_interval=60,
+                                 max_staleness=-1)
+    inventory.sweep(None)
+    assert inventory.find_clusters() is None
+
+
+def test_update_cluster():
+    vcd = FakeVcd([_entry('c1', 'v1')])
+    inventory = ClusterInventory(vcd.fetch_clusters, refresh_interval=60,
+                                 max_staleness=120)
+    inventory.sweep(None)
+
+    vcd.entries = [_entry('c1', 'v1', status='POWERED_OFF'),
+                   _entry('c2', 'v2')]
+    inventory.update_cluster(None, 'c1')
+    inventory.update_cluster(None, 'c2')
+    assert _get_statuses(inventory) == {'c1': 'POWERED_OFF',
+                                        'c2': 'POWERED_ON'}
+
+    vcd.entries = [_entry('c2', 'v2')]
+    inventory.update_cluster(None, 'c1')
+    assert _get_statuses(inventory) == {'c2': 'POWERED_ON'}
+
+
+def test_update_cluster_during_sweep_is_kept():
+    vcd = FakeVcd([_entry('c1', 'v1'), _entry('c2', 'v2')])
+    inventory = ClusterInventory(vcd.fetch_clusters, refresh_interval=60,
+                                 max_staleness=120)
+    inventory.sweep(None)
+
+    # c1 is changed by CSE and c2 is deleted while the next sweep runs,
+    # after the sweep fetched the clusters.
+    def update_clusters():
+        vcd.entries = [_entry('c1', 'v1', status='POWERED_OFF')]
+        inventory.update_cluster(None, 'c1')
+        inventory.update_cluster(None, 'c2')
+    vcd.on_sweep_fetched = update_clusters
+    inventory.sweep(None)
+    assert _get_statuses(inventory) == {'c1': 'POWERED_OFF'}
+
+    # Updates are only kept over the sweep that was running.
+    vcd.on_sweep_fetched = None
+    vcd.entries = [_entry('c1', 'v1', status='POWERED_ON')]
+    inventory.sweep(None)
+    assert _get_statuses(inventory) == {'c1': 'POWERED_ON'}
+
+
+def test_update_cluster_before_sweep_is_overwritten():
+    vcd = FakeVcd([_entry('c1', 'v1')])
+    inventory = ClusterInventory(vcd.fetch_clusters, refresh_interval=60,
+                                 max_staleness=120)
+    inventory.update_cluster(None, 'c1')
+
+    vcd.entries = [_entry('c1', 'v1', status='POWERED_OFF')]
+    inventory.sweep(None)
+    assert _get_statuses(inventory) == {'c1': 'POWERED_OFF'}
+
+
+def _find_cluster_ids(inventory, client, cluster_name=None, org_name=None):
+    clusters = _find_inventory_clusters(inventory, client, cluster_name,
+                                        None, org_name, None)
+    if clusters is None:
+        return None
+    return sorted(cluster['cluster_id'] for cluster in clusters)
+
+
+def _swept_inventory(entries):
+    inventory = ClusterInventory(FakeVcd(entries).fetch_clusters,
+                                 refresh_interval=60, max_staleness=120)
+    inventory.sweep(None)
+    return inventory
+
+
+def test_find_inventory_clusters_sysadmin():
+    inventory = _swept_inventory([_entry('c1', 'v1'),
+                                  _entry('c2', 'v2', org_name='org2')])
+    client = FakeClient(is_sysadmin=True)
+    assert _find_cluster_ids(inventory, client) == ['c1', 'c2']
+    assert _find_cluster_ids(inventory, client, org_name='org2') == ['c2']
+    # vCD isn't asked which clusters are visible
+    assert client.qfilters == []
+
+
+def test_find_inventory_clusters_tenant_sees_visible_clusters_only():
+    inventory = _swept_inventory([_entry('c1', 'v1'),
+                                  _entry('c2', 'v2', org_name='org2')])
+    client = FakeClient(is_sysadmin=False, visible_vapp_ids=['v1'])
+    # org name is ignored for tenants, as with cluster queries
+    assert _find_cluster_ids(inventory, client, org_name='org2') == ['c1']
+
+    _find_cluster_ids(inventory, client, cluster_name='cluster-c1')
+    assert 'name==cluster-c1' in client.qfilters[-1]
+
+
+def test_find_inventory_clusters_tenant_sees_missing_cluster():
+    # e.g. a cluster created by another CSE server since the last sweep
+    inventory = _swept_inventory([_entry('c1', 'v1')])
+    client = FakeClient(is_sysadmin=False, visible_vapp_ids=['v1', 'v2'])
+    assert _find_cluster_ids(inventory, client) is None
+
+
+def test_find_inventory_clusters_when_stale():
+    inventory = ClusterInventory(FakeVcd([_entry('c1', 'v1')]).fetch_clusters,
+                                 refresh_interval=60, max_staleness=-1)
+    inventory.sweep(None)
+    assert _find_cluster_ids(inventory, FakeClient(is_sysadmin=True)) is None
@@ -0,0 +1,89 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import json
+import time
+
+from container_service_extension.consumer import MessageConsumer
+from container_service_extension.consumer import ReplyCache
+
+
+def test_reserve_new_request():
+    cache = ReplyCache()
+    future, is_new_request = cache.reserve('request-1')
+    assert is_new_request
+    assert not future.done()
+
+
+def test_reserve_duplicate_request():
+    cache = ReplyCache()
+    future, _ = cache.reserve('request-1')
+    duplicate_future, is_new_request = cache.reserve('request-1')
+    assert not is_new_request
+    assert duplicate_future is future
+
+    # The duplicate is answered once the original request is processed.
+    future.set_result({'statusCode': 200})
+    assert duplicate_future.result() == {'statusCode': 200}
+
+
+def test_reserve_after_discard():
+    cache = ReplyCache()
+    future, _ = cache.reserve('request-1')
+    cache.discard('request-1')
+    new_future, is_new_request = cache.reserve('request-1')
+    assert is_new_request
+    assert new_future is not future
+
+    # discarding unknown requests is a no-op
+    cache.discard('request-2')
+
+
+def test_reserve_max_size():
+    cache = ReplyCache(maxsize=2)
+    cache.reserve('request-1')
+    cache.reserve('request-2')
+    cache.reserve('request-3')
+    _, is_new_request = cache.reserve('request-3')
+    assert not is_new_request
+    _, is_new_request = cache.reserve('request-1')
+    assert is_new_request
+
+
+def test_reserve_ttl():
+    cache = ReplyCache(ttl=0.05)
+    cache.reserve('request-1')
+    time.sleep(0.1)
+    _, is_new_request = cache.reserve('request-1')
+    assert is_new_request
+
+
+def _consumer(**kwargs):
+    return MessageConsumer('localhost', 5672, False, '/', 'guest', 'guest',
+                           'cse-exchange', 'cse', **kwargs)
+
+
+def _body(method):
+    return json.dumps([{'id': 'request-1', 'method': method}]).encode()
+
+
+def test_acknowledged_on_receipt_without_late_ack():
+    consumer = _consumer(late_ack=False, late_ack_mutating_requests=True)
+    assert not consumer._is_acknowledged_late(_body('GET'))
+    assert not consumer._is_acknowledged_late(_body('POST'))
+
+
+def test_late_ack_only_get_requests_by_default():
+    consumer = _consumer(late_ack=True)
+    assert consumer._is_acknowledged_late(_body('GET'))
+    # Mutating requests would be processed again if redelivered after a
+    # restart.
+    assert not consumer._is_acknowledged_late(_body('POST'))
+    assert not consumer._is_acknowledged_late(_body('DELETE'))
+
+
+def test_late_ack_mutating_requests():
+    consumer = _consumer(late_ack=True, late_ack_mutating_requests=True)
+    assert consumer._is_acknowledged_late(_body('GET'))
+    assert consumer._is_acknowledged_late(_body('POST'))
@@ -0,0 +1,130 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+from lxml import objectify
+
+from container_service_extension.metadata_query import \
+    MAX_METADATA_FIELDS_PER_QUERY
+from container_service_extension.metadata_query import MetadataQuery
+from container_service_extension.metadata_query import split_metadata_keys
+import container_service_extension.pyvcloud_utils as vcd_utils
+
+
+def test_split_metadata_keys_empty():
+    assert split_metadata_keys([]) == []
+
+
+def test_split_metadata_keys_single_query():
+    keys = [f'key{i}' for i in range(MAX_METADATA_FIELDS_PER_QUERY)]
+    assert split_metadata_keys(keys) == [keys]
+
+
+def test_split_metadata_keys_several_queries():
+    keys = [f'key{i}' for i in range(MAX_METADATA_FIELDS_PER_QUERY + 1)]
+    assert split_metadata_keys(keys) == [
+        keys[:MAX_METADATA_FIELDS_PER_QUERY],
+        keys[MAX_METADATA_FIELDS_PER_QUERY:]
+    ]
+
+
+def test_split_metadata_keys_max_keys():
+    keys = ['a', 'b', 'c', 'd', 'e']
+    assert split_metadata_keys(keys, max_keys=2) == \
+        [['a', 'b'], ['c', 'd'], ['e']]
+
+
+def test_split_metadata_keys_drops_duplicates():
+    keys = ['a', 'b', 'a', 'c', 'b']
+    assert split_metadata_keys(keys, max_keys=2) == [['a', 'b'], ['c']]
+
+
+class FakeQuery:
+    def __init__(self, records, page_size):
+        self.records = records
+        self.page_size = page_size
+
+    def execute(self):
+        return iter(self.records)
+
+
+class FakeSession:
+    def __init__(self):
+        self.headers = {}
+
+
+class FakeClient:
+    """vCD client whose typed queries return @vapps."""
+
+    def __init__(self, vapps):
+        self.vapps = vapps
+        self.queries = []
+        self._session = FakeSession()
+        self._query_list_map = None
+
+    def get_typed_query(self, resource_type, query_result_format,
+                        page_size=None, qfilter=None, sort_asc=None,
+                        fields=None):
+        vapps = self.vapps
+        if qfilter is not None and qfilter.startswith('id=='):
+            ids = [f[len('id=='):] for f in qfilter.split(',')]
+            vapps = [vapp for vapp in vapps if vapp['id'] in ids]
+        # vCD doesn't break ties of the sort attribute, every other query
+        # returns tied records in another order.
+        if len(self.queries) % 2:
+            vapps = list(reversed(vapps))
+        if sort_asc is not None:
+            vapps = sorted(vapps, key=lambda vapp: vapp[sort_asc])
+        keys = [f[len('metadata:'):] for f in (fields or '').split(',') if f]
+        self.queries.append(qfilter)
+        return FakeQuery([_record(vapp, keys) for vapp in vapps], page_size)
+
+
+def _record(vapp, keys):
+    entries = ''.join(
+        f'<MetadataEntry><Key>{key}</Key>'
+        f'<TypedValue><Value>{vapp["metadata"][key]}</Value></TypedValue>'
+        '</MetadataEntry>'
+        for key in keys)
+    return objectify.fromstring(
+        f'<AdminVAppRecord id="{vapp["id"]}" name="{vapp["name"]}">'
+        f'<Metadata>{entries}</Metadata></AdminVAppRecord>')
+
+
+def _execute_typed_query_page(query, page):
+    start = (page - 1) * query.page_size
+    return query.records[start:start + query.page_size], len(query.records)
+
+
+def test_execute_page_merges_metadata_of_page_records(monkeypatch):
+    monkeypatch.setattr(vcd_utils, 'execute_typed_query_page',
+                        _execute_typed_query_page)
+    keys = [f'key{i}' for i in range(MAX_METADATA_FIELDS_PER_QUERY + 2)]
+    # names repeat, so pages of sub-queries sorted by name could differ
+    vapps = [{'id': f'urn:vcloud:vapp:{i}', 'name': f'cluster{i % 2}',
+              'metadata': {key: f'{key}-{i}' for key in keys}}
+             for i in range(5)]
+    client = FakeClient(vapps)
+    query = MetadataQuery(client, 'adminVApp', keys, sort_asc='name',
+                          page_size=2)
+
+    ids = []
+    for page in range(1, 4):
+        results, total = query.execute_page(page)
+        assert total == len(vapps)
+        assert len(results) == (2 if page < 3 else 1)
+        for record, metadata in results:
+            i = int(record.get('id').split(':')[-1])
+            assert metadata == vapps[i]['metadata']
+            ids.append(record.get('id'))
+    assert sorted(ids) == sorted(vapp['id'] for vapp in vapps)
+
+
+def test_execute_page_empty(monkeypatch):
+    monkeypatch.setattr(vcd_utils, 'execute_typed_query_page',
+                        _execute_typed_query_page)
+    keys = [f'key{i}' for i in range(MAX_METADATA_FIELDS_PER_QUERY + 1)]
+    client = FakeClient([])
+    query = MetadataQuery(client, 'adminVApp', keys, page_size=2)
+    assert query.execute_page(1) == ([], 0)
+    assert len(client.queries) == 1
@@ -0,0 +1,29 @@
+# container-service-extension
+# Copyright (c) 2020 VMware, Inc. All Rights Reserved.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import pytest
+
+from container_service_extension.utils import get_max_unavailable_count
+
+
+@pytest.mark.parametrize('max_unavailable, num_nodes, expected', [
+    (1, 10, 1),
+    (3, 10, 3),
+    (20, 10, 20),
+    ('20%', 10, 2),
+    ('25%', 10, 2),
+    ('100%', 10, 10),
+    ('1%', 10, 1),
+    ('20%', 0, 1),
+])
+def test_get_max_unavailable_count(max_unavailable, num_nodes, expected):
+    assert get_max_unavailable_count(max_unavailable, num_nodes) == expected
+
+
+@pytest.mark.parametrize('max_unavailable', [
+    0, -1, True, 1.5, '2', '0%', '101%', '-5%', 'x%', '%', None
+])
+def test_get_max_unavailable_count_invalid(max_unavailable):
+    with pytest.raises(ValueError):
+        get_max_unavailable_count(max_unavailable, 10)